@@ -0,0 +1,122 @@
+import datetime
+import logging
+import queue
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_STOP = object()
+
+
+class ActivityLogger:
+    """
+    Write-behind logger for recognition events into USER_ACTIVITY.
+
+    `log()` only puts the event on a bounded queue, so the frame loop never waits for SQLite. A
+    background thread writes events in one transaction per batch, whenever `batch_size` events are
+    pending or `flush_interval` seconds have passed. Repeat sightings of the same event (same
+    track, or same user when faces are not tracked) within `dedupe_window` seconds are dropped.
+    """
+
+    def __init__(self, db_operator, batch_size=100, flush_interval=1.0, dedupe_window=30.0, max_pending=10000):
+        self.db_operator = db_operator
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dedupe_window = dedupe_window
+        self.events = queue.Queue(maxsize=max_pending)
+        self.last_seen = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.written = 0
+        self.deduplicated = 0
+        self.dropped = 0
+
+    def start(self):
+        """
+        Start the background writer.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+            self.thread.start()
+        return self
+
+    def log(self, user_id, activity, detail=None, track_id=None, timestamp=None):
+        """
+        Queue an event. `activity` is the event kind used for de-duplication ("recognized",
+        "rejected", ...); `detail` is appended to the stored activity text.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        key = (track_id, activity) if track_id is not None else (user_id, activity)
+        with self.lock:
+            last = self.last_seen.get(key)
+            if last is not None and timestamp - last < self.dedupe_window:
+                self.deduplicated += 1
+                return False
+            self.last_seen[key] = timestamp
+        text = f"{activity} ({detail})" if detail else activity
+        date_time = datetime.datetime.fromtimestamp(timestamp).isoformat(sep=" ", timespec="seconds")
+        try:
+            self.events.put_nowait((user_id, text, date_time))
+            return True
+        except queue.Full:
+            self.dropped += 1  # Never block the frame loop on a stalled writer
+            return False
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                event = self.events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                event = None
+            if event is _STOP:
+                self._flush(batch)
+                return
+            if event is not None:
+                batch.append(event)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                self._prune()
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            self.db_operator.insert_activities(batch)
+            self.written += len(batch)
+        except Exception as e:
+            logging.error(f"Failed to write {len(batch)} activity events: {e}")
+
+    def _prune(self):
+        """
+        Forget de-duplication keys that are older than the window.
+        """
+        cutoff = time.time() - self.dedupe_window
+        with self.lock:
+            for key in [key for key, seen in self.last_seen.items() if seen < cutoff]:
+                del self.last_seen[key]
+
+    def close(self):
+        """
+        Flush all pending events and stop the background writer.
+        """
+        if self.thread is None:
+            return
+        self.events.put(_STOP)
+        self.thread.join()
+        self.thread = None
+        logging.info(f"Activity log: {self.written} events written, {self.deduplicated} repeat sightings "
+                     f"skipped, {self.dropped} dropped")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# path: backend/modules/activityLogger.py
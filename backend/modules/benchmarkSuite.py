@@ -0,0 +1,352 @@
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from .dbOperators import DBOperator, get_pool
+from .dsTrainer import DSTrainer
+from .detectorBackends import DetectorError, resolve_detector
+from .faceDetect import FaceDetector
+from .frameSource import SyntheticSource
+from .lbphModel import MODEL_EXTENSION
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BENCHMARK_VERSION = 1
+DEFAULT_RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+DEFAULT_FACE_COUNTS = (1, 4)
+DEFAULT_SUITES = ("detect", "train", "db")
+
+# Metrics compared between runs, and whether a larger value is the better one
+COMPARED_METRICS = {
+    "fps": True,
+    "images_per_sec": True,
+    "queries_per_sec": True,
+    "p50_ms": False,
+    "p95_ms": False,
+}
+
+
+class BenchmarkError(Exception):
+    """Custom exception for benchmark errors."""
+    pass
+
+
+def latency_summary(seconds):
+    """
+    Summarise a list of durations in seconds as milliseconds.
+    """
+    if not len(seconds):
+        return {"count": 0}
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    return {
+        "count": int(len(ms)),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+
+def parse_resolutions(text):
+    """
+    Parse "640x480,1280x720" into a tuple of (width, height) pairs.
+    """
+    try:
+        return tuple(tuple(int(v) for v in item.lower().split("x")) for item in text.split(",") if item)
+    except ValueError:
+        raise BenchmarkError(f"Invalid resolution list: {text}")
+
+
+class BenchmarkSuite:
+    """
+    Measures the detection, training and database paths on generated data, without a camera.
+
+    Everything runs in a throw-away workspace with its own database, images, cache and models, so
+    the user's data is never touched. Data is generated from fixed seeds, which keeps runs on the
+    same machine comparable:
+
+    - detect: FaceDetector fps and per-frame latency over synthetic frames at every resolution and
+      face count (and over `source`, e.g. a recorded video, when given)
+    - train: DSTrainer.train_recognizer images/sec with a cold and a warm sample cache, and once the
+      samples are packed into the sample store
+    - db: DBOperator query latencies against `db_users` users
+    """
+
+    def __init__(self, resolutions=DEFAULT_RESOLUTIONS, face_counts=DEFAULT_FACE_COUNTS, frames=60, users=10,
+                 samples_per_user=30, db_users=1000, repeats=200, source=None, strategy="full", seed=0,
+                 detector_backend=None, detector_model=None, adaptive=False):
+        self.resolutions = resolutions
+        self.face_counts = face_counts
+        self.frames = frames
+        self.users = users
+        self.samples_per_user = samples_per_user
+        self.db_users = db_users
+        self.repeats = repeats
+        self.source = source
+        self.strategy = strategy
+        self.seed = seed
+        self.adaptive = adaptive
+        try:
+            self.detector_spec = resolve_detector(detector_backend, detector_model)
+        except DetectorError as e:
+            raise BenchmarkError(e)
+        self.workspace = None
+
+    def _path(self, *parts):
+        return os.path.join(self.workspace, *parts).replace("\\", "/")
+
+    def setup(self):
+        """
+        Create the workspace: a database with `users` enrolled users, their face crops, and a
+        database padded to `db_users` users for the query benchmarks.
+        """
+        self.workspace = tempfile.mkdtemp(prefix="faceguard-bench-").replace("\\", "/")
+        self.db_path = self._path("database", "bench.db")
+        self.model_dir = self._path("recognizer")
+        self.gallery_path = self._path("recognizer", f"gallery{MODEL_EXTENSION}")
+        os.makedirs(self.model_dir)
+        self.db_operator = DBOperator(self.db_path)
+
+        rng = np.random.default_rng(self.seed)
+        users = [(user_id, f"Bench User {user_id}", 30, "bench") for user_id in range(1, self.db_users + 1)]
+        self.uuids = self.db_operator.upsert_users(users)
+        for user_id in range(1, self.users + 1):
+            user_dir = self._path("images", self.uuids[user_id])
+            os.makedirs(user_dir)
+            # A blurred noise texture per user, slightly rotated, scaled and noised per sample
+            base = cv2.GaussianBlur(rng.integers(0, 256, (100, 100)).astype(np.float32), (0, 0), 3)
+            base = cv2.normalize(base, None, 0, 255, cv2.NORM_MINMAX)
+            paths = []
+            for sample in range(self.samples_per_user):
+                matrix = cv2.getRotationMatrix2D((50, 50), rng.uniform(-5, 5), rng.uniform(0.95, 1.05))
+                face = cv2.warpAffine(base, matrix, (100, 100), borderMode=cv2.BORDER_REFLECT)
+                face = np.clip(face + rng.normal(0, 6, face.shape), 0, 255).astype(np.uint8)
+                path = f"{user_dir}/{user_id}.{sample}.jpg"
+                cv2.imwrite(path, face)
+                paths.append(path)
+            self.db_operator.insert_images(self.uuids[user_id], paths)
+        return self
+
+    def close(self):
+        """
+        Delete the workspace.
+        """
+        if self.workspace is not None:
+            get_pool(self.db_path).close()
+            shutil.rmtree(self.workspace, ignore_errors=True)
+            self.workspace = None
+
+    def __enter__(self):
+        return self.setup()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _trainer(self, cache_dir):
+        return DSTrainer(sql_db_path=self.db_path, trained_model_path=self.model_dir, gallery_path=self.gallery_path,
+                         cache_dir=cache_dir, store_dir=self._path("samples"))
+
+    def run_training(self):
+        """
+        Time DSTrainer.train_recognizer over every enrolled user, first with an empty sample cache,
+        then with a warm one and then from the packed sample store, and train the gallery model the
+        detection benchmark uses.
+        """
+        results = {}
+        cache_dir = self._path("cache")
+        images = self.users * self.samples_per_user
+        for name in ("cold_cache", "warm_cache", "packed"):
+            trainer = self._trainer(cache_dir)
+            if name == "packed":
+                trainer.sample_store.pack()
+            durations = []
+            for user_id in range(1, self.users + 1):
+                start = time.perf_counter()
+                if not trainer.train_recognizer(self.uuids[user_id], incremental=False):
+                    raise BenchmarkError(f"Training failed for benchmark user {user_id}")
+                durations.append(time.perf_counter() - start)
+            results[f"train/recognizer/{name}"] = dict(
+                latency_summary(durations), images=images, images_per_sec=images / sum(durations))
+        start = time.perf_counter()
+        self._trainer(cache_dir).train_gallery(incremental=False)
+        elapsed = time.perf_counter() - start
+        results["train/gallery"] = {"images": images, "images_per_sec": images / elapsed, "seconds": elapsed}
+        return results
+
+    def _run_detector(self, source):
+        detector = FaceDetector(sql_db_path=self.db_path, trained_model_path=self.model_dir, source=source,
+                                headless=True, output_path=os.devnull, strategy=self.strategy, log_activity=False,
+                                gallery_path=self.gallery_path, detector_backend=self.detector_spec[0],
+                                detector_model=self.detector_spec[1], adaptive=self.adaptive)
+        detector.detect_faces()
+        frame_times = detector.frame_times[1:]  # The first frame pays for start-up
+        if not frame_times:
+            raise BenchmarkError("The detector processed no frames.")
+        return dict(latency_summary(frame_times), frames=len(frame_times), fps=len(frame_times) / sum(frame_times))
+
+    def run_detection(self):
+        """
+        Time FaceDetector over synthetic frames at every resolution and face count.
+        """
+        if not os.path.exists(self.gallery_path):
+            self._trainer(self._path("cache")).train_gallery(incremental=False)
+        results = {}
+        for width, height in self.resolutions:
+            for faces in self.face_counts:
+                source = SyntheticSource(width, height, self.frames + 1, faces, seed=self.seed)
+                results[f"detect/{width}x{height}/{faces}faces"] = self._run_detector(source)
+        if self.source is not None:
+            results[f"detect/source/{os.path.basename(str(self.source).rstrip('/'))}"] = self._run_detector(self.source)
+        return results
+
+    def _time_query(self, query, prepare=None):
+        durations = []
+        for i in range(self.repeats):
+            if prepare is not None:
+                prepare(i)
+            start = time.perf_counter()
+            query(i)
+            durations.append(time.perf_counter() - start)
+        return dict(latency_summary(durations), queries_per_sec=len(durations) / sum(durations))
+
+    def run_database(self):
+        """
+        Time the DBOperator queries the frame loop and the trainer depend on.
+        """
+        db = self.db_operator
+        rng = np.random.default_rng(self.seed)
+        ids = rng.integers(1, self.db_users + 1, self.repeats)
+        batches = [rng.integers(1, self.db_users + 1, 50).tolist() for _ in range(self.repeats)]
+        enrolled = [self.uuids[user_id] for user_id in range(1, self.users + 1)]
+        events = [(int(user_id), "benchmark", "2000-01-01 00:00:00") for user_id in rng.integers(1, self.users + 1, 100)]
+
+        previous = logging.root.manager.disable
+        logging.disable(logging.INFO)  # Per-query info logging would dominate the timings
+        try:
+            results = {"db/get_profile/uncached": self._time_query(lambda i: db.get_profile(int(ids[i])),
+                                                                   lambda i: db.clear_profile_cache())}
+            db.get_profiles(ids.tolist())  # Warm the cache with every profile the next run looks up
+            results.update({
+                "db/get_profile/cached": self._time_query(lambda i: db.get_profile(int(ids[i]))),
+                "db/get_profiles/50_uncached": self._time_query(lambda i: db.get_profiles(batches[i]),
+                                                                lambda i: db.clear_profile_cache()),
+                "db/get_user_images": self._time_query(lambda i: db.get_user_images(enrolled[i % len(enrolled)])),
+                "db/get_images_since": self._time_query(lambda i: db.get_images_since(0)),
+                "db/insert_activities/100": self._time_query(lambda i: db.insert_activities(events)),
+            })
+        finally:
+            logging.disable(previous)
+        return results
+
+    def run(self, suites=DEFAULT_SUITES):
+        """
+        Run the selected suites and return the report.
+        """
+        unknown = set(suites) - set(DEFAULT_SUITES)
+        if unknown:
+            raise BenchmarkError(f"Unknown benchmark suites: {', '.join(sorted(unknown))}")
+        results = {}
+        # Training runs first so detection can use the gallery model it leaves behind
+        for name, method in (("train", self.run_training), ("detect", self.run_detection), ("db", self.run_database)):
+            if name in suites:
+                logging.info(f"Running the {name} benchmarks")
+                results.update(method())
+        return {
+            "benchmark_version": BENCHMARK_VERSION,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "environment": {
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "opencv": cv2.__version__,
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+            },
+            "config": {
+                "suites": list(suites),
+                "resolutions": [f"{w}x{h}" for w, h in self.resolutions],
+                "face_counts": list(self.face_counts),
+                "frames": self.frames,
+                "users": self.users,
+                "samples_per_user": self.samples_per_user,
+                "db_users": self.db_users,
+                "repeats": self.repeats,
+                "source": None if self.source is None else str(self.source),
+                "strategy": self.strategy,
+                "detector": self.detector_spec[0],
+                "adaptive": self.adaptive,
+                "seed": self.seed,
+            },
+            "results": results,
+        }
+
+
+def save_report(report, path):
+    """
+    Write a benchmark report as JSON.
+    """
+    output_dir = os.path.dirname(path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(path):
+    """
+    Read a benchmark report written by save_report().
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError) as e:
+        raise BenchmarkError(f"Could not read benchmark report {path}: {e}")
+    if report.get("benchmark_version") != BENCHMARK_VERSION:
+        raise BenchmarkError(f"{path} was written by an incompatible benchmark version.")
+    return report
+
+
+def compare_reports(baseline, current, tolerance=0.15):
+    """
+    Compare the results two reports share. Returns a list of (benchmark, metric, baseline value,
+    current value, relative change) for every metric that got worse by more than `tolerance`.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in result or not reference.get(metric):
+                continue
+            change = (result[metric] - reference[metric]) / reference[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((name, metric, reference[metric], result[metric], change))
+    return regressions
+
+
+def format_report(report):
+    """
+    Render the results of a report as a plain-text table.
+    """
+    lines = [f"{'benchmark':<36} {'throughput':>18} {'p50 ms':>9} {'p95 ms':>9}"]
+    for name, result in report["results"].items():
+        throughput = ""
+        for metric, unit in (("fps", "fps"), ("images_per_sec", "img/s"), ("queries_per_sec", "q/s")):
+            if metric in result:
+                throughput = f"{result[metric]:.1f} {unit}"
+        p50 = f"{result['p50_ms']:.2f}" if "p50_ms" in result else ""
+        p95 = f"{result['p95_ms']:.2f}" if "p95_ms" in result else ""
+        lines.append(f"{name:<36} {throughput:>18} {p50:>9} {p95:>9}")
+    return "\n".join(lines)
+
+# path: backend/modules/benchmarkSuite.py
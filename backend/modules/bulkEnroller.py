@@ -0,0 +1,203 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from .dbOperators import DBOperator
+from .detectorBackends import DetectorError, create_detector, resolve_detector
+from .dsTrainer import DSTrainer
+from .env_config import DATABASE_PATH as db_path
+from .frameSource import IMAGE_EXTENSIONS
+from .sampleLoader import normalize_face
+from .sampleStore import SampleStore, shard_name
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Photos are searched at no more than this size; the crop is cut from the original
+MAX_DETECTION_SIDE = 1280
+
+# Per-process face detector, created once by the pool initializer
+_worker_state = {}
+
+
+class EnrollmentError(Exception):
+    """Custom exception for bulk enrollment errors."""
+    pass
+
+
+def _init_worker(detector_spec):
+    cv2.setNumThreads(1)  # One core per worker; parallelism comes from the pool
+    _worker_state["detector"] = create_detector(detector_spec)
+
+
+def _crop_face(source_path):
+    """
+    Detect the largest face of a photo and cut out its normalised grayscale crop.
+    Returns (source_path, face or None).
+    """
+    try:
+        image = cv2.imread(source_path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            logging.warning(f"Skipping unreadable image {source_path}")
+            return source_path, None
+        scale = min(1.0, MAX_DETECTION_SIDE / max(image.shape[:2]))
+        search = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+        faces = _worker_state["detector"].detectMultiScale(search, 1.3, 5, minSize=(40, 40))
+        if len(faces) == 0:
+            return source_path, None
+        x, y, w, h = (int(v / scale) for v in max(faces, key=lambda face: face[2] * face[3]))
+        return source_path, normalize_face(image[y:y + h, x:x + w])
+    except Exception as e:
+        logging.error(f"Error processing image {source_path}: {e}")
+        return source_path, None
+
+
+class BulkEnroller:
+    """
+    Enrolls users from a directory tree laid out as `<root>/<user>/<images>`.
+
+    User directories are named `<id>` or `<id>_<name>` and may hold a `profile.json` with
+    "name", "age" and "role". Faces are detected and cropped on a process pool; every `batch_size`
+    results the crops are appended to the sample store and indexed in IMAGES in one transaction
+    together with an ENROLLMENT record per source image, so an interrupted run resumes where it
+    stopped. The models are trained once at the end.
+    """
+
+    def __init__(self, root_dir, workers=None, batch_size=500, default_age=0, default_role="unknown",
+                 detector_model=None, sql_db_path=db_path, train=True, detector_backend=None):
+        self.root_dir = root_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.default_age = default_age
+        self.default_role = default_role
+        try:
+            self.detector_spec = resolve_detector(detector_backend, detector_model)
+        except DetectorError as e:
+            raise EnrollmentError(e)
+        self.train = train
+        self.sql_db_path = sql_db_path
+        self.db_operator = DBOperator(sql_db_path)
+        self.sample_store = SampleStore(sql_db_path=sql_db_path)
+
+    def discover(self):
+        """
+        Walk the directory tree. Returns (users, images): users as (id, name, age, role) tuples and
+        images as (user_id, source_path) tuples.
+        """
+        if not os.path.isdir(self.root_dir):
+            raise EnrollmentError(f"Enrollment directory {self.root_dir} does not exist.")
+        users = []
+        images = []
+        for entry in sorted(os.listdir(self.root_dir)):
+            user_dir = os.path.join(self.root_dir, entry)
+            if not os.path.isdir(user_dir):
+                continue
+            user_id, _, name = entry.partition("_")
+            if not user_id.isdigit():
+                logging.warning(f"Skipping {user_dir}: directory names must start with a numeric user ID")
+                continue
+            profile = {"name": name.replace("_", " ") or entry, "age": self.default_age, "role": self.default_role}
+            profile_file = os.path.join(user_dir, "profile.json")
+            if os.path.exists(profile_file):
+                with open(profile_file, "r") as f:
+                    profile.update(json.load(f))
+            users.append((int(user_id), profile["name"], profile["age"], profile["role"]))
+            for dirpath, _, filenames in os.walk(user_dir):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        images.append((int(user_id), os.path.join(dirpath, filename).replace("\\", "/")))
+        return users, images
+
+    def record_batch(self, batch):
+        """
+        Store the faces of a batch of (source_path, user_id, user_uuid, face or None) results with
+        one append per user, then index them and record the sources in one transaction. The store's
+        write lock is held throughout, so a concurrent compaction cannot drop the appended records
+        before their rows commit. Records appended by a batch that never got recorded are dead space
+        until the store is compacted.
+        """
+        by_user = {}
+        for position, (_, _, user_uuid, face) in enumerate(batch):
+            if face is not None:
+                by_user.setdefault(user_uuid, []).append(position)
+        locations = [None] * len(batch)
+        with self.sample_store.writing():
+            for user_uuid, positions in by_user.items():
+                shard = self.db_operator.get_user_shard(user_uuid) or shard_name(user_uuid)
+                first_slot = self.sample_store.append(shard, [batch[position][3] for position in positions])
+                for offset, position in enumerate(positions):
+                    locations[position] = (shard, first_slot + offset)
+            self.db_operator.record_enrollment_batch([(source, user_id, user_uuid, location) for (source, user_id, user_uuid, _),
+                                                      location in zip(batch, locations)])
+
+    def run(self):
+        """
+        Enroll everything under the root directory. Returns a summary dict.
+        """
+        start = time.perf_counter()
+        users, images = self.discover()
+        done = self.db_operator.get_enrolled_sources()
+        pending = [(user_id, source) for user_id, source in images if source not in done]
+        logging.info(f"Found {len(users)} users and {len(images)} images; "
+                     f"{len(images) - len(pending)} already enrolled, {len(pending)} to process")
+
+        try:
+            create_detector(self.detector_spec)  # Fail here rather than in every worker
+        except DetectorError as e:
+            raise EnrollmentError(e)
+
+        uuids = self.db_operator.upsert_users(users)
+        tasks = [source for _, source in pending]
+        owners = {source: user_id for user_id, source in pending}
+
+        enrolled = 0
+        rejected = 0
+        batch = []
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(self.detector_spec,)) as executor:
+            for source, face in executor.map(_crop_face, tasks, chunksize=16):
+                user_id = owners[source]
+                batch.append((source, user_id, uuids[user_id], face))
+                if face is None:
+                    rejected += 1
+                else:
+                    enrolled += 1
+                if len(batch) >= self.batch_size:
+                    self.record_batch(batch)
+                    batch = []
+                    elapsed = time.perf_counter() - start
+                    logging.info(f"Processed {enrolled + rejected}/{len(tasks)} images "
+                                 f"({(enrolled + rejected) / elapsed:.1f} images/sec)")
+        if batch:
+            self.record_batch(batch)
+        crop_time = time.perf_counter() - start
+
+        if self.train:
+            # Incremental training skips models that are already up to date, which also finishes
+            # the training step of an interrupted run
+            trainer = DSTrainer(sql_db_path=self.sql_db_path, store_dir=self.sample_store.store_dir)
+            for user_id, _, _, _ in users:
+                trainer.train_recognizer(uuids[user_id])
+            trainer.train_gallery()
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            "users": len(users),
+            "images": len(tasks),
+            "enrolled": enrolled,
+            "no_face": rejected,
+            "skipped": len(images) - len(pending),
+            "images_per_sec": len(tasks) / crop_time if crop_time > 0 else 0.0,
+            "seconds": elapsed,
+        }
+        logging.info(f"Enrolled {enrolled} faces from {len(tasks)} images ({rejected} without a face) "
+                     f"at {summary['images_per_sec']:.1f} images/sec; total time {elapsed:.1f}s")
+        return summary
+
+# path: backend/modules/bulkEnroller.py
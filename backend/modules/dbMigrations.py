@@ -0,0 +1,109 @@
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Ordered schema migrations as (version, description, statements). The version a database is at is
+# kept in SQLite's `user_version` pragma; migrations above it run in order, each in its own transaction.
+# Never edit a released migration; append a new one instead.
+MIGRATIONS = [
+    (1, "Index the hot lookups and make the join key types consistent", [
+        # Lookups and the IMAGES join go through USERS.uuid
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_users_uuid ON USERS(uuid)",
+        # IMAGES.user_id holds the user's UUID, so it references USERS(uuid), not USERS(id)
+        '''CREATE TABLE IMAGES_NEW (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            image_path TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES USERS(uuid)
+        )''',
+        "INSERT INTO IMAGES_NEW (id, user_id, image_path) SELECT id, user_id, image_path FROM IMAGES",
+        "DROP TABLE IMAGES",
+        "ALTER TABLE IMAGES_NEW RENAME TO IMAGES",
+        "CREATE INDEX IF NOT EXISTS idx_images_user_id ON IMAGES(user_id, id)",
+        # USER_ACTIVITY.user_id references the integer USERS.id, so store it as one
+        '''CREATE TABLE USER_ACTIVITY_NEW (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            activity TEXT NOT NULL,
+            date_time TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES USERS(id)
+        )''',
+        '''INSERT INTO USER_ACTIVITY_NEW (id, user_id, activity, date_time)
+            SELECT id, CAST(user_id AS INTEGER), activity, date_time FROM USER_ACTIVITY''',
+        "DROP TABLE USER_ACTIVITY",
+        "ALTER TABLE USER_ACTIVITY_NEW RENAME TO USER_ACTIVITY",
+        "CREATE INDEX IF NOT EXISTS idx_user_activity_user_time ON USER_ACTIVITY(user_id, date_time)",
+        "CREATE INDEX IF NOT EXISTS idx_enrollment_user_id ON ENROLLMENT(user_id)",
+    ]),
+    (2, "Store packed face samples", [
+        # A sample is either a legacy image file or a record (slot) in a sample store shard
+        '''CREATE TABLE IMAGES_NEW (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            image_path TEXT,
+            shard TEXT,
+            slot INTEGER,
+            FOREIGN KEY (user_id) REFERENCES USERS(uuid),
+            CHECK (image_path IS NOT NULL OR (shard IS NOT NULL AND slot IS NOT NULL))
+        )''',
+        "INSERT INTO IMAGES_NEW (id, user_id, image_path) SELECT id, user_id, image_path FROM IMAGES",
+        "DROP TABLE IMAGES",
+        "ALTER TABLE IMAGES_NEW RENAME TO IMAGES",
+        "CREATE INDEX IF NOT EXISTS idx_images_user_id ON IMAGES(user_id, id)",
+        "CREATE INDEX IF NOT EXISTS idx_images_shard ON IMAGES(shard, slot)",
+    ]),
+    (3, "Add the background training job queue", [
+        # target is a user's UUID or "gallery"; requests counts the submissions coalesced into a job
+        '''CREATE TABLE IF NOT EXISTS TRAINING_JOBS (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            target TEXT NOT NULL,
+            status TEXT NOT NULL,
+            requests INTEGER NOT NULL DEFAULT 1,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        )''',
+        # At most one queued job per model, so new submissions join the waiting job
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_training_jobs_queued ON TRAINING_JOBS(target) WHERE status = 'queued'",
+        "CREATE INDEX IF NOT EXISTS idx_training_jobs_status ON TRAINING_JOBS(status, id)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """
+    Return the schema version stored in the database.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Apply every migration newer than the stored schema version. Returns the resulting version.
+    """
+    version = get_schema_version(conn)
+    for target, description, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        logging.info(f"Migrating database schema to version {target}: {description}")
+        conn.execute("BEGIN IMMEDIATE")  # Take the write lock so concurrent starters cannot interleave
+        try:
+            if get_schema_version(conn) >= target:  # Another process got there first
+                conn.rollback()
+                version = get_schema_version(conn)
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+    return version
+
+# path: backend/modules/dbMigrations.py
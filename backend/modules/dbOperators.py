@@ -1,8 +1,14 @@
+import contextlib
 import logging
 import os
+import queue
 import sqlite3
+import threading
+import time
 import uuid as uuid_module
+from collections import OrderedDict
 
+from .dbMigrations import migrate
 from .env_config import DATABASE_PATH as db_location
 
 # Configure logging
@@ -14,10 +20,203 @@ class DBError(Exception):
     pass
 
 
+# Pragmas applied to every pooled connection. WAL lets readers run concurrently with a writer,
+# and busy_timeout makes a blocked writer wait instead of failing with "database is locked".
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+)
+
+
+class ProfileCache:
+    """
+    A bounded LRU cache of USERS rows keyed by user ID, with a time-to-live so that changes made by
+    other processes are picked up eventually. Users that do not exist are cached as None as well.
+    IDs are normalised with key(), so the model's int labels and IDs typed in as strings share entries.
+    """
+
+    def __init__(self, max_size=1024, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(user_id):
+        try:
+            return int(user_id)
+        except (TypeError, ValueError):
+            return user_id
+
+    def get(self, user_id):
+        """
+        Return (found, profile). `found` is False when the user is not cached or the entry expired.
+        """
+        user_id = self.key(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                return True, entry[0]
+            if entry is not None:
+                del self.entries[user_id]
+            self.misses += 1
+            return False, None
+
+    def put(self, user_id, profile):
+        user_id = self.key(user_id)
+        with self.lock:
+            self.entries[user_id] = (profile, time.monotonic())
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_ids=None):
+        """
+        Drop the given user IDs, or every entry when `user_ids` is None.
+        """
+        with self.lock:
+            if user_ids is None:
+                self.entries.clear()
+                return
+            for user_id in user_ids:
+                self.entries.pop(self.key(user_id), None)
+
+    def stats(self):
+        """
+        Return a dict with the cache size and its hit, miss and eviction counters.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of long-lived SQLite connections to one database file.
+
+    Connections keep their prepared statement cache between calls. A thread that already holds a
+    connection gets the same one back for nested calls, so a method that calls other DBOperator
+    methods runs in a single transaction on a single connection.
+    """
+
+    def __init__(self, db_path, size=4, timeout=30.0, cached_statements=256):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.schema_lock = threading.Lock()
+        self.schema_version = None  # Set once the schema has been created and migrated
+        self.profile_cache = ProfileCache()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                try:
+                    return self._connect()
+                except sqlite3.Error as e:
+                    self.created -= 1
+                    raise DBError(e)
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise DBError(f"Timed out waiting for a database connection to {self.db_path}")
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Lend a connection to the calling thread. The outermost borrow commits on success and rolls
+        back on error, like `with sqlite3.connect(...)` did.
+        """
+        held = getattr(self.local, "conn", None)
+        if held is not None:
+            yield held
+            return
+        conn = self._acquire()
+        self.local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.local.conn = None
+            self.idle.put(conn)
+
+    def close(self):
+        """
+        Close every idle connection.
+        """
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.lock:
+                self.created -= 1
+
+
+# Pools are shared by every DBOperator of a process that uses the same database file
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path):
+    """
+    Return the connection pool of a database file for the current process.
+    """
+    key = (os.getpid(), db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(db_path)
+        return pool
+
+
+def close_pools():
+    """
+    Close all pooled connections and drop the cached profiles, e.g. before the database file is deleted.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+            pool.profile_cache.invalidate()
+        _pools.clear()
+
+
 # Decorator to provide a database connection to the wrapped function
 def with_connection(func):
     def inner(self, *args, **kwargs):
-        with sqlite3.connect(self.db_path) as conn:
+        with get_pool(self.db_path).connection() as conn:
             return func(self, conn, *args, **kwargs)
 
     return inner
@@ -31,6 +230,20 @@ class DBOperator:
         if not os.path.exists(db_dir):
             os.makedirs(db_dir)
             logging.info("Database directory created.")
+        self.ensure_schema()
+        self.profile_cache = get_pool(db_path).profile_cache  # Shared by all operators on this file
+
+    def ensure_schema(self):
+        """
+        Create missing tables and apply pending schema migrations, once per process and database file.
+        """
+        pool = get_pool(self.db_path)
+        with pool.schema_lock:
+            if pool.schema_version is not None:
+                return
+            self.initialize_db()
+            with pool.connection() as conn:
+                pool.schema_version = migrate(conn)
 
     @with_connection
     def execute_query(self, conn, query, parameters=None, commit=False):
@@ -84,6 +297,19 @@ class DBOperator:
                 activity TEXT NOT NULL,
                 date_time TEXT NOT NULL,
                 FOREIGN KEY (user_id) REFERENCES USERS(id)
+            )''',
+            '''CREATE TABLE IF NOT EXISTS MODELS (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                last_image_id INTEGER NOT NULL,
+                sample_count INTEGER NOT NULL,
+                updated_at TEXT NOT NULL
+            )''',
+            '''CREATE TABLE IF NOT EXISTS ENROLLMENT (
+                source_path TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                image_path TEXT,
+                date_time TEXT NOT NULL
             )'''
         ]
         for table_query in tables:
@@ -97,10 +323,9 @@ class DBOperator:
     def insert_or_update_user(self, user_id, user_name, user_age, user_role):
         """
         Insert a new user record or update an existing one without changing the UUID.
+        The cached profile is dropped once the write has committed, so a concurrent lookup cannot
+        cache the old row again.
         """
-        if not os.path.exists(db_location):
-            self.initialize_db()
-
         # Check if the user already exists
         existing_user = self.fetch_data("SELECT * FROM USERS WHERE id=?", (user_id,))
         if existing_user:
@@ -108,6 +333,7 @@ class DBOperator:
             query = "UPDATE USERS SET name=?, age=?, role=? WHERE id=?"
             try:
                 self.execute_query(query, (user_name, user_age, user_role, user_id), commit=True)
+                self.profile_cache.invalidate([user_id])
                 logging.info(f"User {user_id} updated successfully.")
                 return user_id
             except DBError:
@@ -118,26 +344,127 @@ class DBOperator:
             query = "INSERT INTO USERS (id, uuid, name, age, role) VALUES (?, ?, ?, ?, ?)"
             try:
                 self.execute_query(query, (user_id, unique_id, user_name, user_age, user_role), commit=True)
+                self.profile_cache.invalidate([user_id])
                 logging.info(f"User {user_id} with UUID {unique_id} inserted successfully.")
                 return user_id
             except DBError:
                 return None
 
+    def upsert_users(self, users):
+        """
+        Insert or update many (id, name, age, role) user records in one transaction, keeping the UUIDs
+        of existing users. Returns a dict mapping each user ID to its UUID.
+        """
+        uuids = self._upsert_users(users)
+        self.profile_cache.invalidate([user_id for user_id, _, _, _ in users])  # After the commit
+        return uuids
+
+    @with_connection
+    def _upsert_users(self, conn, users):
+        try:
+            conn.executemany(
+                "INSERT INTO USERS (id, uuid, name, age, role) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name=excluded.name, age=excluded.age, role=excluded.role",
+                [(user_id, str(uuid_module.uuid4()), name, age, role) for user_id, name, age, role in users]
+            )
+            ids = [user_id for user_id, _, _, _ in users]
+            uuids = {}
+            for start in range(0, len(ids), 500):  # Stay below SQLite's bound parameter limit
+                chunk = ids[start:start + 500]
+                rows = conn.execute(f"SELECT id, uuid FROM USERS WHERE id IN ({','.join('?' * len(chunk))})",
+                                    chunk).fetchall()
+                uuids.update(rows)
+            logging.info(f"{len(users)} users inserted or updated.")
+            return uuids
+        except sqlite3.Error as e:
+            logging.error(f"Failed to insert or update users: {e}")
+            raise DBError(e)
+
+    def get_enrolled_sources(self):
+        """
+        Return the set of source image paths that bulk enrollment has already processed.
+        """
+        try:
+            return {row[0] for row in self.fetch_data("SELECT source_path FROM ENROLLMENT")}
+        except DBError:
+            return set()
+
+    @with_connection
+    def record_enrollment_batch(self, conn, results):
+        """
+        Store a batch of bulk enrollment results in one transaction. `results` holds
+        (source_path, user_id, user_uuid, location) tuples, where location is the (shard, slot) the
+        face was stored at; it is None for sources in which no face was found, which are recorded so
+        they are not retried.
+        """
+        try:
+            conn.executemany(
+                "INSERT INTO IMAGES (user_id, shard, slot) VALUES (?, ?, ?)",
+                [(user_uuid, *location) for _, _, user_uuid, location in results if location is not None]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO ENROLLMENT (source_path, user_id, image_path, date_time) "
+                "VALUES (?, ?, ?, datetime('now'))",
+                [(source_path, user_id, f"{location[0]}#{location[1]}" if location is not None else None)
+                 for source_path, user_id, _, location in results]
+            )
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Failed to record enrollment batch: {e}")
+            raise DBError(e)
+
     def get_profile(self, user_id):
         """
-        Retrieve a user profile based on the user ID.
+        Retrieve a user profile based on the user ID, served from the profile cache when possible.
         """
+        found, profile = self.profile_cache.get(user_id)
+        if found:
+            return profile
         try:
             profiles = self.fetch_data("SELECT * FROM USERS WHERE id=?", (user_id,))
-            if profiles:
-                logging.info(f"Profile retrieved for user {user_id}.")
-                return profiles[0]  # Return the first profile if exists
-            else:
-                logging.info(f"No profile found for user {user_id}.")
-                return None
-        except sqlite3.Error as e:
+        except DBError as e:
             logging.error(f"Failed to retrieve profile for user {user_id}: {e}")
             return None
+        profile = profiles[0] if profiles else None
+        if profile is not None:
+            logging.info(f"Profile retrieved for user {user_id}.")
+        else:
+            logging.info(f"No profile found for user {user_id}.")
+        self.profile_cache.put(user_id, profile)
+        return profile
+
+    def get_profiles(self, user_ids):
+        """
+        Retrieve the profiles of many users. Cached profiles are served from the cache and the rest
+        are fetched with a single query. Returns a dict mapping each user ID to its profile or None.
+        """
+        profiles = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            found, profile = self.profile_cache.get(user_id)
+            if found:
+                profiles[user_id] = profile
+            else:
+                missing.append(user_id)
+        for start in range(0, len(missing), 500):  # Stay below SQLite's bound parameter limit
+            chunk = missing[start:start + 500]
+            try:
+                rows = self.fetch_data(f"SELECT * FROM USERS WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            except DBError as e:
+                logging.error(f"Failed to retrieve profiles for {len(chunk)} users: {e}")
+                rows = None
+            fetched = {row[0]: row for row in rows or []}
+            for user_id in chunk:
+                profiles[user_id] = fetched.get(ProfileCache.key(user_id))
+                if rows is not None:
+                    self.profile_cache.put(user_id, profiles[user_id])
+        return profiles
+
+    def clear_profile_cache(self):
+        """
+        Drop every cached profile, e.g. after the USERS table was changed outside this operator.
+        """
+        self.profile_cache.invalidate()
 
     @with_connection
     def insert_images(self, conn, user_id, image_paths):
@@ -146,8 +473,7 @@ class DBOperator:
         """
         query = "INSERT INTO IMAGES (user_id, image_path) VALUES (?, ?)"
         try:
-            for image_path in image_paths:
-                self.execute_query(query, (user_id, image_path), commit=False)
+            conn.executemany(query, [(user_id, image_path) for image_path in image_paths])
             conn.commit()  # Commit all inserts at once
             logging.info(f"{len(image_paths)} images for user {user_id} inserted successfully.")
         except sqlite3.Error as e:
@@ -169,22 +495,284 @@ class DBOperator:
             )
             images = cursor.fetchall()
             logging.info(f"Retrieved {len(images)} images for user {user_uuid}.")
-            ids = [int(os.path.splitext(os.path.basename(image_path))[0].split('.')[0]) for _, image_path in images]
+            ids = [user_id for user_id, _ in images]
             image_paths = [image_path for _, image_path in images]
             return ids, image_paths
         except sqlite3.Error as e:
             logging.error(f"Failed to retrieve images for user {user_uuid}: {e}")
             return [], []
 
+    @with_connection
+    def get_all_user_images(self, conn):
+        """
+        Retrieve the integer user ID and image path of every stored image, for training the gallery model.
+        """
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT u.id, ui.image_path FROM IMAGES ui JOIN USERS u ON ui.user_id = u.uuid ORDER BY u.id, ui.id"
+            )
+            images = cursor.fetchall()
+            logging.info(f"Retrieved {len(images)} images for the gallery.")
+            ids = [user_id for user_id, _ in images]
+            image_paths = [image_path for _, image_path in images]
+            return ids, image_paths
+        except sqlite3.Error as e:
+            logging.error(f"Failed to retrieve gallery images: {e}")
+            return [], []
+
+    def get_images_since(self, last_image_id, user_uuid=None):
+        """
+        Retrieve (image ID, user ID, image path, shard, slot) for every image added after `last_image_id`,
+        optionally restricted to a single user's UUID. Packed samples have no image path.
+        """
+        query = ("SELECT ui.id, u.id, ui.image_path, ui.shard, ui.slot FROM IMAGES ui JOIN USERS u ON ui.user_id = u.uuid "
+                 "WHERE ui.id > ?")
+        parameters = [last_image_id]
+        if user_uuid is not None:
+            query += " AND u.uuid = ?"
+            parameters.append(user_uuid)
+        try:
+            return self.fetch_data(query + " ORDER BY ui.id", parameters)
+        except DBError as e:
+            logging.error(f"Failed to retrieve images added after {last_image_id}: {e}")
+            return []
+
+    def get_user_shard(self, user_uuid):
+        """
+        Return the sample store shard a user's samples are currently appended to, or None.
+        """
+        try:
+            rows = self.fetch_data("SELECT shard FROM IMAGES WHERE user_id=? AND shard IS NOT NULL "
+                                   "ORDER BY id DESC LIMIT 1", (user_uuid,))
+            return rows[0][0] if rows else None
+        except DBError as e:
+            logging.error(f"Failed to retrieve the shard of user {user_uuid}: {e}")
+            return None
+
+    @with_connection
+    def insert_samples(self, conn, user_uuid, shard, slots):
+        """
+        Index samples stored in a sample store shard for a user. Returns the new image IDs.
+        """
+        try:
+            ids = []
+            for slot in slots:
+                cursor = conn.execute("INSERT INTO IMAGES (user_id, shard, slot) VALUES (?, ?, ?)",
+                                      (user_uuid, shard, slot))
+                ids.append(cursor.lastrowid)
+            conn.commit()
+            return ids
+        except sqlite3.Error as e:
+            conn.rollback()
+            logging.error(f"Failed to index samples for user {user_uuid}: {e}")
+            raise DBError(e)
+
+    def get_sample_locations(self, user_uuid=None):
+        """
+        Retrieve (image ID, user ID, UUID, shard, slot) for every packed sample, optionally restricted
+        to a single user's UUID. The user ID is None for samples whose user no longer exists.
+        """
+        query = ("SELECT ui.id, u.id, ui.user_id, ui.shard, ui.slot FROM IMAGES ui "
+                 "LEFT JOIN USERS u ON ui.user_id = u.uuid WHERE ui.shard IS NOT NULL")
+        parameters = []
+        if user_uuid is not None:
+            query += " AND ui.user_id = ?"
+            parameters.append(user_uuid)
+        return self.fetch_data(query + " ORDER BY ui.id", parameters)
+
+    @with_connection
+    def set_sample_locations(self, conn, locations):
+        """
+        Point many images at (shard, slot) locations in one transaction. `locations` holds
+        (shard, slot, image_id) tuples; the images no longer refer to an image file.
+        """
+        try:
+            conn.executemany("UPDATE IMAGES SET shard=?, slot=?, image_path=NULL WHERE id=?", locations)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to update {len(locations)} sample locations: {e}")
+            raise DBError(e)
+        return True
+
+    def get_unpacked_images(self):
+        """
+        Retrieve (image ID, UUID, image path) for every image still stored as an image file.
+        """
+        return self.fetch_data("SELECT id, user_id, image_path FROM IMAGES WHERE shard IS NULL ORDER BY id")
+
+    def delete_user(self, user_id):
+        """
+        Delete a user with their samples, enrollment records and model state in one transaction.
+        The sample records stay in the sample store until it is compacted. Returns the deleted
+        user's UUID, or None if there was no such user.
+        """
+        try:
+            user_uuid = self._delete_user(user_id)
+        finally:
+            self.profile_cache.invalidate([user_id])  # After the commit
+        if user_uuid is not None:
+            logging.info(f"User {user_id} deleted.")
+        return user_uuid
+
+    @with_connection
+    def _delete_user(self, conn, user_id):
+        try:
+            rows = conn.execute("SELECT uuid FROM USERS WHERE id=?", (user_id,)).fetchall()
+            if not rows:
+                return None
+            user_uuid = rows[0][0]
+            conn.execute("DELETE FROM IMAGES WHERE user_id=?", (user_uuid,))
+            conn.execute("DELETE FROM ENROLLMENT WHERE user_id=?", (user_id,))
+            conn.execute("DELETE FROM MODELS WHERE name=?", (f"user{user_id}",))
+            conn.execute("DELETE FROM USERS WHERE id=?", (user_id,))
+        except sqlite3.Error as e:
+            logging.error(f"Failed to delete user {user_id}: {e}")
+            raise DBError(e)
+        return user_uuid
+
+    def enqueue_training_job(self, target):
+        """
+        Queue a training job for a model ("gallery" or a user's UUID). A submission for a model that
+        already has a queued job is coalesced into it. Returns the job ID.
+        """
+        try:
+            self.execute_query(
+                "INSERT INTO TRAINING_JOBS (target, status, created_at) VALUES (?, 'queued', datetime('now')) "
+                "ON CONFLICT(target) WHERE status = 'queued' DO UPDATE SET requests = requests + 1",
+                (target,), commit=True
+            )
+            rows = self.fetch_data("SELECT id FROM TRAINING_JOBS WHERE target=? AND status='queued'", (target,))
+            return rows[0][0] if rows else None
+        except DBError as e:
+            logging.error(f"Failed to queue a training job for {target}: {e}")
+            raise
+
+    @with_connection
+    def claim_training_jobs(self, conn, stale_after=3600.0):
+        """
+        Mark every queued training job as running. Returns their (job ID, target) pairs.
+        Jobs whose model is already being trained by another process stay queued, unless that run
+        started more than `stale_after` seconds ago; claiming is one statement, so two processes
+        can never both claim the same model.
+        """
+        try:
+            return conn.execute(
+                "UPDATE TRAINING_JOBS SET status='running', started_at=datetime('now') WHERE status='queued' "
+                "AND target NOT IN (SELECT target FROM TRAINING_JOBS WHERE status='running' "
+                "AND started_at >= datetime('now', ?)) RETURNING id, target",
+                (f"-{int(stale_after)} seconds",)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to claim training jobs: {e}")
+            raise DBError(e)
+
+    @with_connection
+    def finish_training_jobs(self, conn, outcomes):
+        """
+        Record the outcome of many training jobs in one transaction. `outcomes` holds
+        (status, error, job_id) tuples with status "done" or "failed".
+        """
+        try:
+            conn.executemany("UPDATE TRAINING_JOBS SET status=?, error=?, finished_at=datetime('now') WHERE id=?",
+                             outcomes)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to record {len(outcomes)} training job outcomes: {e}")
+            raise DBError(e)
+        return True
+
+    @with_connection
+    def fail_stale_training_jobs(self, conn, max_age):
+        """
+        Mark jobs that have been running for more than `max_age` seconds as failed, e.g. after the
+        process running them was killed. Returns the targets of those jobs.
+        """
+        try:
+            rows = conn.execute(
+                "UPDATE TRAINING_JOBS SET status='failed', error='interrupted', finished_at=datetime('now') "
+                "WHERE status='running' AND started_at < datetime('now', ?) RETURNING target",
+                (f"-{int(max_age)} seconds",)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Failed to expire stale training jobs: {e}")
+            raise DBError(e)
+        return [target for target, in rows]
+
+    def get_training_jobs(self, limit=20):
+        """
+        Retrieve (id, target, status, requests, error, created_at, started_at, finished_at) of the
+        most recent training jobs, newest first.
+        """
+        try:
+            return self.fetch_data("SELECT id, target, status, requests, error, created_at, started_at, finished_at "
+                                   "FROM TRAINING_JOBS ORDER BY id DESC LIMIT ?", (limit,))
+        except DBError:
+            return []
+
+    def get_training_job_counts(self):
+        """
+        Return a dict mapping each training job status to the number of jobs in it.
+        """
+        try:
+            return dict(self.fetch_data("SELECT status, COUNT(*) FROM TRAINING_JOBS GROUP BY status"))
+        except DBError:
+            return {}
+
+    def get_last_finished_training_job(self):
+        """
+        Return the ID of the most recently finished successful training job, or 0.
+        """
+        try:
+            rows = self.fetch_data("SELECT MAX(id) FROM TRAINING_JOBS WHERE status='done'")
+            return rows[0][0] or 0
+        except DBError:
+            return 0
+
+    def get_model_state(self, model_name):
+        """
+        Retrieve (version, last_image_id, sample_count) of a trained model, or None if it was never trained.
+        """
+        try:
+            rows = self.fetch_data("SELECT version, last_image_id, sample_count FROM MODELS WHERE name=?",
+                                   (model_name,))
+            return rows[0] if rows else None
+        except DBError as e:
+            logging.error(f"Failed to retrieve state of model {model_name}: {e}")
+            return None
+
+    def set_model_state(self, model_name, version, last_image_id, sample_count):
+        """
+        Record the version of a trained model and the last image it was trained on.
+        """
+        query = ("INSERT OR REPLACE INTO MODELS (name, version, last_image_id, sample_count, updated_at) "
+                 "VALUES (?, ?, ?, ?, datetime('now'))")
+        try:
+            self.execute_query(query, (model_name, version, last_image_id, sample_count), commit=True)
+            return True
+        except DBError:
+            return False
+
+    @with_connection
+    def insert_activities(self, conn, activities):
+        """
+        Insert many (user_id, activity, date_time) activity records in one transaction.
+        """
+        try:
+            conn.executemany("INSERT INTO USER_ACTIVITY (user_id, activity, date_time) VALUES (?, ?, ?)", activities)
+        except sqlite3.Error as e:
+            logging.error(f"Failed to insert {len(activities)} activities: {e}")
+            raise DBError(e)
+        return True
+
     @with_connection
     def get_user_activity(self, conn, user_id):
         """
         Retrieve a user's activity log based on the user ID.
         """
         try:
-            activities = self.fetch_data(conn,
-                                         "SELECT activity, date_time FROM USER_ACTIVITY WHERE user_id=? ORDER BY date_time DESC",
-                                         (user_id,))
+            cursor = conn.cursor()
+            cursor.execute("SELECT activity, date_time FROM USER_ACTIVITY WHERE user_id=? ORDER BY date_time DESC",
+                           (user_id,))
+            activities = cursor.fetchall()
             logging.info(f"Retrieved {len(activities)} activities for user {user_id}.")
             return activities
         except sqlite3.Error as e:
@@ -0,0 +1,316 @@
+import collections
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from .faceTracker import box_iou
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DETECTION_STRATEGIES = ("full", "coarse")
+
+
+def pyramid_levels(frame_size, window_size, scale_factor, min_size, max_size=(0, 0)):
+    """
+    Count the image pyramid levels detectMultiScale scans for a (width, height) frame: every scale
+    at which the cascade's window fits into the frame and lies within min_size and max_size.
+    """
+    levels = 0
+    factor = 1.0
+    while True:
+        width, height = round(window_size[0] * factor), round(window_size[1] * factor)
+        if width > frame_size[0] or height > frame_size[1]:
+            break
+        if max_size[0] > 0 and (width > max_size[0] or height > max_size[1]):
+            break
+        if width >= min_size[0] and height >= min_size[1]:
+            levels += 1
+        factor *= scale_factor
+    return levels
+
+
+class ScaleTuner:
+    """
+    Learns the size band faces appear in and narrows a strategy's search to it.
+
+    A fixed camera sees faces within a narrow range of sizes, yet detectMultiScale scans every
+    pyramid level from minSize up to the whole frame, and the smallest sizes are by far the most
+    expensive levels. Every `update_interval` frames, once `min_samples` faces have been seen, the
+    tuner sets minSize and maxSize to the 5th to 95th percentile of the recent face sizes widened by
+    `margin`, and picks the scale step that still covers the band in `band_levels` levels (never
+    coarser than the configured one). After `miss_limit` frames in a row without a face the band is
+    widened by `widen_factor` on both sides until it is back to the configured parameters. Bands
+    within `tolerance` of the current one are not applied, so the parameters do not jitter.
+    """
+
+    def __init__(self, strategy, window=200, min_samples=20, update_interval=30, margin=0.3, band_levels=4,
+                 min_scale_factor=1.05, miss_limit=15, widen_factor=2.0, tolerance=0.1):
+        self.strategy = strategy
+        self.base = (strategy.scale_factor, strategy.min_size, strategy.max_size)
+        self.sizes = collections.deque(maxlen=window)
+        self.min_samples = min_samples
+        self.update_interval = update_interval
+        self.margin = margin
+        self.band_levels = band_levels
+        self.min_scale_factor = min_scale_factor
+        self.miss_limit = miss_limit
+        self.widen_factor = widen_factor
+        self.tolerance = tolerance
+        self.window_size = getattr(strategy.face_cascade, "window_size", None)
+        self.last_frame_size = None
+        self.frames = 0
+        self.misses = 0
+        self.updates = 0
+        self.widenings = 0
+        self.levels_scanned = 0
+        self.levels_saved = 0
+        self.level_counts = {}
+
+    def observe(self, gray, faces):
+        """
+        Record the faces found on a frame and adjust the strategy's parameters.
+        """
+        self.frames += 1
+        self._count_levels(gray.shape[1], gray.shape[0])
+        if len(faces):
+            self.misses = 0
+            self.sizes.extend(max(int(w), int(h)) for (x, y, w, h) in faces)
+        else:
+            self.misses += 1
+            if self.misses >= self.miss_limit:
+                self.misses = 0
+                self._widen()
+        if self.frames % self.update_interval == 0 and len(self.sizes) >= self.min_samples:
+            self._narrow()
+
+    def _narrow(self):
+        _, base_min, base_max = self.base
+        low, high = np.percentile(np.array(self.sizes), [5, 95])
+        low = max(base_min[0], int(low * (1 - self.margin)))
+        high = int(np.ceil(high * (1 + self.margin)))
+        if base_max[0] > 0:
+            high = min(high, base_max[0])
+        if high <= low:
+            return
+        current_min, current_max = self.strategy.min_size[0], self.strategy.max_size[0]
+        if current_max and abs(low - current_min) <= self.tolerance * current_min \
+                and abs(high - current_max) <= self.tolerance * current_max:
+            return  # Within the tolerance of the current band; not worth a change
+        self._apply(self._scale_factor(low, high), (low, low), (high, high))
+
+    def _widen(self):
+        base_scale, base_min, base_max = self.base
+        if (self.strategy.min_size, self.strategy.max_size) == (base_min, base_max):
+            return
+        self.sizes.clear()  # Sizes from before the misses must not narrow the band again right away
+        self.widenings += 1
+        low = max(base_min[0], int(self.strategy.min_size[0] / self.widen_factor))
+        high = int(self.strategy.max_size[0] * self.widen_factor) if self.strategy.max_size[0] > 0 else 0
+        if base_max[0] > 0:
+            high = min(high, base_max[0]) if high > 0 else base_max[0]
+        # A band that reaches the frame's shorter side is as good as unbounded
+        reaches_frame = self.last_frame_size is not None and high >= min(self.last_frame_size)
+        if low == base_min[0] and (high == base_max[0] or high == 0 or reaches_frame):
+            self._apply(base_scale, base_min, base_max)
+        else:
+            self._apply(self._scale_factor(low, high), (low, low), (high, high))
+
+    def _scale_factor(self, low, high):
+        """
+        The scale step that covers sizes low..high in `band_levels` levels, within the configured step.
+        """
+        base_scale = self.base[0]
+        return round(float(min(base_scale, max(self.min_scale_factor, (high / low) ** (1.0 / self.band_levels)))), 3)
+
+    def _apply(self, scale_factor, min_size, max_size):
+        strategy = self.strategy
+        if (strategy.scale_factor, strategy.min_size, strategy.max_size) == (scale_factor, min_size, max_size):
+            return
+        strategy.scale_factor, strategy.min_size, strategy.max_size = scale_factor, min_size, max_size
+        self.updates += 1
+        self.level_counts.clear()
+        message = (f"Adaptive detection: minSize {min_size[0]}, maxSize {max_size[0] or 'unbounded'}, "
+                   f"scaleFactor {scale_factor}")
+        if self.window_size is not None and self.last_frame_size is not None:
+            full, tuned = self._levels(self.last_frame_size)
+            message += f" ({tuned} of {full} pyramid levels at {self.last_frame_size[0]}x{self.last_frame_size[1]})"
+        logging.info(message)
+
+    def _levels(self, frame_size):
+        counts = self.level_counts.get(frame_size)
+        if counts is None:
+            base_scale, base_min, base_max = self.base
+            strategy = self.strategy
+            counts = self.level_counts[frame_size] = (
+                pyramid_levels(frame_size, self.window_size, base_scale, base_min, base_max),
+                pyramid_levels(frame_size, self.window_size, strategy.scale_factor, strategy.min_size,
+                               strategy.max_size))
+        return counts
+
+    def _count_levels(self, width, height):
+        self.last_frame_size = (width, height)
+        if self.window_size is None:
+            return
+        full, tuned = self._levels(self.last_frame_size)
+        self.levels_scanned += tuned
+        self.levels_saved += full - tuned
+
+    def log_summary(self):
+        if not self.frames:
+            return
+        message = (f"Adaptive detection: {self.updates} parameter changes ({self.widenings} widenings after misses) "
+                   f"over {self.frames} frames; final minSize {self.strategy.min_size[0]}, maxSize "
+                   f"{self.strategy.max_size[0] or 'unbounded'}, scaleFactor {self.strategy.scale_factor}")
+        if self.window_size is not None:
+            message += (f"; {self.levels_scanned / self.frames:.1f} pyramid levels scanned and "
+                        f"{self.levels_saved / self.frames:.1f} saved per frame")
+        logging.info(message)
+
+
+class DetectionStrategy:
+    """
+    Full-frame detection: one detectMultiScale pass over the whole grayscale frame.
+    With `adaptive` the size range and scale step are tuned to the faces seen (see ScaleTuner).
+    """
+    name = "full"
+
+    def __init__(self, face_cascade, scale_factor=1.3, min_neighbors=5, min_size=(40, 40), max_size=(0, 0),
+                 adaptive=False):
+        self.face_cascade = face_cascade
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.max_size = max_size
+        self.tuner = ScaleTuner(self) if adaptive else None
+
+    def detect(self, gray):
+        """
+        Return the (x, y, w, h) boxes of the faces in a grayscale frame.
+        """
+        return self._observed(gray, self.detect_full(gray))
+
+    def detect_full(self, gray):
+        return self.face_cascade.detectMultiScale(gray, self.scale_factor, self.min_neighbors,
+                                                  minSize=self.min_size, maxSize=self.max_size)
+
+    def _observed(self, gray, faces):
+        if self.tuner is not None:
+            self.tuner.observe(gray, faces)
+        return faces
+
+    def log_summary(self):
+        """
+        Log what the strategy measured during the session.
+        """
+        if self.tuner is not None:
+            self.tuner.log_summary()
+
+
+class CoarseToFineStrategy(DetectionStrategy):
+    """
+    Searches a downscaled copy of the frame for candidates and then re-runs the cascade at full
+    resolution only inside an enlarged region around each candidate.
+
+    `coarse_width` is the width the frame is scaled down to (frames that are not wider are searched
+    directly). The coarse pass uses fewer neighbours so it errs on the side of candidates; the full
+    resolution pass confirms them. Every `calibration_interval` frames the full-frame detector is
+    also timed on the same frame, so the measured speedup can be reported.
+    """
+    name = "coarse"
+
+    def __init__(self, face_cascade, scale_factor=1.3, min_neighbors=5, min_size=(40, 40), max_size=(0, 0),
+                 adaptive=False, coarse_width=640, coarse_neighbors=3, roi_margin=0.4, calibration_interval=50):
+        super().__init__(face_cascade, scale_factor, min_neighbors, min_size, max_size, adaptive)
+        self.coarse_width = coarse_width
+        self.coarse_neighbors = coarse_neighbors
+        self.roi_margin = roi_margin
+        self.calibration_interval = calibration_interval
+        self.frames = 0
+        self.coarse_time = 0.0
+        self.calibration_frames = 0
+        self.calibration_coarse_time = 0.0
+        self.calibration_full_time = 0.0
+
+    def detect(self, gray):
+        self.frames += 1
+        # Calibrate from the fifth frame on, so one-off warm-up costs do not skew the comparison
+        calibrate = (self.calibration_interval and self.frames >= 5
+                     and (self.frames - 5) % self.calibration_interval == 0)
+        start = time.perf_counter()
+        faces = self._detect_coarse_to_fine(gray)
+        elapsed = time.perf_counter() - start
+        self.coarse_time += elapsed
+        if calibrate:
+            start = time.perf_counter()
+            self.detect_full(gray)
+            self.calibration_full_time += time.perf_counter() - start
+            self.calibration_coarse_time += elapsed
+            self.calibration_frames += 1
+        return self._observed(gray, faces)
+
+    def _detect_coarse_to_fine(self, gray):
+        height, width = gray.shape[:2]
+        if width <= self.coarse_width:
+            return self.detect_full(gray)
+
+        scale = self.coarse_width / width
+        small = cv2.resize(gray, (self.coarse_width, int(round(height * scale))), interpolation=cv2.INTER_AREA)
+        # A cascade cannot find faces smaller than its training window; the DNN backend has none
+        window = getattr(self.face_cascade, "window_size", None) or (1, 1)
+        coarse_min = tuple(max(window[i], int(self.min_size[i] * scale)) for i in (0, 1))
+        coarse_max = (tuple(max(coarse_min[i], int(self.max_size[i] * scale)) for i in (0, 1))
+                      if self.max_size[0] > 0 else (0, 0))
+        candidates = self.face_cascade.detectMultiScale(small, self.scale_factor, self.coarse_neighbors,
+                                                        minSize=coarse_min, maxSize=coarse_max)
+        faces = []
+        for (cx, cy, cw, ch) in candidates:
+            x, y, w, h = (int(round(v / scale)) for v in (cx, cy, cw, ch))
+            margin_x = int(w * self.roi_margin)
+            margin_y = int(h * self.roi_margin)
+            x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+            x1, y1 = min(width, x + w + margin_x), min(height, y + h + margin_y)
+            # Only look for faces of about the candidate's size inside its region
+            min_side = max(self.min_size[0], int(w * 0.6))
+            max_side = int(max(w, h) * (1 + 2 * self.roi_margin))
+            for (fx, fy, fw, fh) in self.face_cascade.detectMultiScale(
+                    gray[y0:y1, x0:x1], self.scale_factor, self.min_neighbors,
+                    minSize=(min_side, min_side), maxSize=(max_side, max_side)):
+                box = (x0 + int(fx), y0 + int(fy), int(fw), int(fh))
+                # Regions of neighbouring candidates overlap; keep one box per face
+                if all(box_iou(box, other) < 0.5 for other in faces):
+                    faces.append(box)
+        return np.array(faces, dtype=np.int32).reshape(-1, 4)
+
+    def speedup(self):
+        """
+        Measured full-frame time over coarse-to-fine time on the calibration frames.
+        """
+        if not self.calibration_coarse_time:
+            return None
+        return self.calibration_full_time / self.calibration_coarse_time
+
+    def log_summary(self):
+        super().log_summary()
+        if not self.frames:
+            return
+        speedup = self.speedup()
+        message = f"Coarse-to-fine detection: {1000 * self.coarse_time / self.frames:.1f} ms/frame over {self.frames} frames"
+        if speedup is not None:
+            message += f", {speedup:.2f}x faster than full-frame on {self.calibration_frames} calibration frames"
+        logging.info(message)
+
+
+def create_strategy(name, face_cascade, **params):
+    """
+    Build a detection strategy by name ("full" or "coarse").
+    """
+    if name in (None, "full"):
+        return DetectionStrategy(face_cascade, **params)
+    if name == "coarse":
+        return CoarseToFineStrategy(face_cascade, **params)
+    raise ValueError(f"Unknown detection strategy: {name}")
+
+# path: backend/modules/detectStrategy.py
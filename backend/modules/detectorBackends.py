@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+
+import cv2
+import numpy as np
+
+from .env_config import CASCADE_CLASSIFIER_PATH as haar_cascade_path
+from .env_config import DETECTOR_CONFIG_FILE as CONFIG_FILE
+from .env_config import DNN_MODEL_PATH as dnn_model_path
+from .env_config import LBP_CASCADE_PATH as lbp_cascade_path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DETECTOR_BACKENDS = ("haar", "lbp", "dnn")
+DEFAULT_BACKEND = "haar"
+DEFAULT_MODEL_PATHS = {"haar": haar_cascade_path, "lbp": lbp_cascade_path, "dnn": dnn_model_path}
+
+# Configuration files of the DNN face detectors OpenCV publishes, by model file extension
+DNN_CONFIG_NAMES = {".caffemodel": ("deploy.prototxt",), ".pb": ("opencv_face_detector.pbtxt",)}
+
+
+class DetectorError(Exception):
+    """Custom exception for face detector backend errors."""
+    pass
+
+
+class CascadeBackend:
+    """
+    A Haar or LBP cascade classifier. LBP cascades evaluate integer features instead of Haar
+    rectangle sums and are several times cheaper per window, at some cost in accuracy.
+    """
+
+    def __init__(self, name, model_path):
+        self.name = name
+        self.model_path = model_path
+        if not os.path.exists(model_path):
+            raise DetectorError(f"Cascade file {model_path} not found. The {name} backend needs an OpenCV "
+                                f"{name.upper()} face cascade (see data/{name}cascades in the OpenCV sources).")
+        self.cascade = cv2.CascadeClassifier(model_path)
+        if self.cascade.empty():
+            raise DetectorError(f"Could not load the cascade classifier from {model_path}.")
+        self.window_size = tuple(self.cascade.getOriginalWindowSize())  # Smallest face the cascade finds
+
+    def detectMultiScale(self, image, scaleFactor=1.1, minNeighbors=3, minSize=(0, 0), maxSize=(0, 0)):
+        """
+        Return the (x, y, w, h) boxes of the faces in a grayscale image.
+        """
+        return self.cascade.detectMultiScale(image, scaleFactor, minNeighbors, minSize=minSize, maxSize=maxSize)
+
+
+class DNNBackend:
+    """
+    An SSD face detector run on the CPU with OpenCV's dnn module, loaded from local files: the
+    ResNet-10 Caffe model (res10_300x300_ssd_iter_140000.caffemodel with deploy.prototxt) or its
+    TensorFlow export (opencv_face_detector_uint8.pb with opencv_face_detector.pbtxt).
+
+    It exposes the cascade's detectMultiScale() so the detection strategies can use either. The
+    network searches all scales in one pass, so the scale factor and neighbour count are ignored;
+    faces are kept when their score reaches `confidence` and their size is within minSize/maxSize.
+    """
+    name = "dnn"
+    window_size = None  # No image pyramid; the whole frame is searched in one pass
+
+    def __init__(self, model_path, config_path=None, confidence=0.6, input_size=(300, 300),
+                 mean=(104.0, 177.0, 123.0)):
+        self.model_path = model_path
+        self.config_path = config_path or find_dnn_config(model_path)
+        self.confidence = confidence
+        self.input_size = tuple(input_size)
+        self.mean = tuple(mean)
+        if not os.path.exists(model_path):
+            raise DetectorError(f"DNN face model {model_path} not found.")
+        try:
+            self.net = cv2.dnn.readNet(model_path, self.config_path or "")
+        except cv2.error as e:
+            raise DetectorError(f"Could not load the DNN face model {model_path}: {e}")
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def detectMultiScale(self, image, scaleFactor=None, minNeighbors=None, minSize=(0, 0), maxSize=(0, 0)):
+        """
+        Return the (x, y, w, h) boxes of the faces in a grayscale or BGR image.
+        """
+        height, width = image.shape[:2]
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        self.net.setInput(cv2.dnn.blobFromImage(image, 1.0, self.input_size, self.mean, swapRB=False, crop=False))
+        detections = self.net.forward().reshape(-1, 7)  # [image, class, score, x1, y1, x2, y2] per detection
+        detections = detections[detections[:, 2] >= self.confidence]
+        corners = np.clip(detections[:, 3:7], 0.0, 1.0) * np.array([width, height, width, height], np.float32)
+        boxes = np.round(np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])).astype(np.int32)
+        keep = (boxes[:, 2] >= max(1, minSize[0])) & (boxes[:, 3] >= max(1, minSize[1]))
+        if maxSize[0] > 0 and maxSize[1] > 0:
+            keep &= (boxes[:, 2] <= maxSize[0]) & (boxes[:, 3] <= maxSize[1])
+        return boxes[keep].reshape(-1, 4)
+
+
+def find_dnn_config(model_path):
+    """
+    Look for the network configuration that belongs to a DNN model file next to it.
+    Returns None when there is none; single-file formats such as ONNX do not need one.
+    """
+    directory = os.path.dirname(model_path)
+    base, extension = os.path.splitext(model_path)
+    candidates = [base + ".prototxt", base + ".pbtxt"]
+    candidates += [os.path.join(directory, name) for name in DNN_CONFIG_NAMES.get(extension.lower(), ())]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return candidate.replace("\\", "/")
+    return None
+
+
+def load_detector_config(config_file=CONFIG_FILE):
+    """
+    Load the site's detector settings ({"backend": ..., "model_path": ..., ...}) from the
+    configuration file. Returns an empty dict when there is none.
+    """
+    if os.path.exists(config_file):
+        with open(config_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_detector_config(backend, model_path=None, config_file=CONFIG_FILE, **options):
+    """
+    Save the detector backend (and optionally its model file and options) as the site's default.
+    """
+    config_dir = os.path.dirname(config_file)
+    if config_dir and not os.path.exists(config_dir):
+        os.makedirs(config_dir)
+    config = {"backend": backend}
+    if model_path:
+        config["model_path"] = model_path
+    config.update(options)
+    with open(config_file, 'w') as f:
+        json.dump(config, f)
+
+
+def resolve_detector(backend=None, model_path=None, config_file=CONFIG_FILE):
+    """
+    Settle which detector to use: explicit arguments win over the configuration file, which wins
+    over the Haar cascade default. Returns a picklable (backend, model_path, options) tuple that
+    can be handed to worker processes and turned into a detector with create_detector().
+    """
+    config = load_detector_config(config_file)
+    if backend is None:
+        backend = config.get("backend", DEFAULT_BACKEND)
+        model_path = model_path or config.get("model_path")
+    elif backend == config.get("backend"):
+        model_path = model_path or config.get("model_path")
+    if backend not in DETECTOR_BACKENDS:
+        raise DetectorError(f"Unknown detector backend: {backend} (expected one of {', '.join(DETECTOR_BACKENDS)})")
+    options = {key: value for key, value in config.items()
+               if key not in ("backend", "model_path") and config.get("backend") == backend}
+    return backend, (model_path or DEFAULT_MODEL_PATHS[backend]).replace("\\", "/"), options
+
+
+def create_detector(backend=None, model_path=None, **options):
+    """
+    Build a face detector backend. `backend` is "haar", "lbp" or "dnn", or a (backend, model_path,
+    options) tuple from resolve_detector(); without one the configured backend is used.
+    """
+    if isinstance(backend, tuple):
+        backend, model_path, configured = backend
+        options = dict(configured, **options)
+    else:
+        backend, model_path, configured = resolve_detector(backend, model_path)
+        options = dict(configured, **options)
+    if backend == "dnn":
+        detector = DNNBackend(model_path, **options)
+    else:
+        detector = CascadeBackend(backend, model_path)
+    logging.info(f"Using the {backend} face detector from {model_path}")
+    return detector
+
+# path: backend/modules/detectorBackends.py
@@ -1,28 +1,56 @@
 import logging
-import os
+import time
 
 import cv2
 
 from .dbOperators import DBOperator
-from .dsTrainer import DSTrainer
-from .env_config import CASCADE_CLASSIFIER_PATH as cc_path
+from .detectStrategy import create_strategy
+from .detectorBackends import create_detector
 from .env_config import DATABASE_PATH as db_path
-from .env_config import TRAINING_DATA_PATH as dataset_location
 from .osCamera import Camera
+from .pipelineMetrics import MetricsExporter, MetricsRegistry
+from .resultWriter import ResultWriter
+from .sampleLoader import normalize_face
+from .sampleStore import SampleStore
+from .trainingQueue import TrainingQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 class DSCreator:
-    def __init__(self, cascade_path=cc_path):
+    def __init__(self, detector_model=None, source=None, headless=False, output_path=None, buffer_size=2,
+                 strategy="full", metrics_target=None, metrics_interval=10.0,
+                 detector_backend=None, adaptive=False, training_queue=None, wait_for_training=True,
+                 sample_interval=0.1):
         """
-        Initialize the DSCreator with paths to the cascade classifier, database, and dataset location.
+        Initialize the DSCreator with the face detector, database, and dataset location.
+        `detector_backend` ("haar", "lbp" or "dnn") and `detector_model` default to the site's
+        detector configuration.
+        `source` selects the frame source; in headless mode no windows are opened and per-frame
+        results are written as JSON lines to `output_path`. Frames are grabbed on a background
+        thread into a ring buffer of `buffer_size` frames. `strategy` selects how faces are searched
+        for ("full" frame or "coarse"-to-fine), and `adaptive` tunes the detector's size range and scale
+        step to the faces it sees. Per-stage timings are kept in `self.metrics` and exported
+        to `metrics_target` (a Prometheus text file or an HTTP endpoint) every `metrics_interval` seconds.
+        Training is submitted to `training_queue`, so the next capture can start right away; without
+        one the DSCreator runs its own queue and, with `wait_for_training`, waits for it on exit
+        (otherwise the jobs stay queued for the next training queue that runs). Outside headless mode
+        samples are taken at most every `sample_interval` seconds.
         """
-        self.face_detect = cv2.CascadeClassifier(cascade_path)
+        self.face_detector = create_detector(detector_backend, detector_model)
+        self.detector = create_strategy(strategy, self.face_detector, adaptive=adaptive)
         self.db_operator = DBOperator(db_path)
-        self.ds_trainer = DSTrainer()
-        self.camera = Camera()
+        self.sample_store = SampleStore()
+        self.owns_training_queue = training_queue is None
+        self.training_queue = training_queue or TrainingQueue()
+        self.wait_for_training = wait_for_training
+        self.sample_interval = sample_interval
+        self.metrics = MetricsRegistry("creator")
+        self.metrics_exporter = MetricsExporter(self.metrics, metrics_target, metrics_interval)
+        self.camera = Camera(source=source, threaded=True, buffer_size=buffer_size, metrics=self.metrics)
+        self.headless = headless
+        self.result_writer = ResultWriter(output_path) if headless else None
 
     def __enter__(self):
         """
@@ -35,7 +63,14 @@ class DSCreator:
         Exit the runtime context related to this object, ensuring resources are cleaned up.
         """
         self.camera.release()
-        cv2.destroyAllWindows()
+        self.metrics_exporter.close()
+        self.detector.log_summary()
+        if self.headless:
+            self.result_writer.close()
+        else:
+            cv2.destroyAllWindows()
+        if self.owns_training_queue:
+            self.training_queue.close(wait=self.wait_for_training)
 
     def insert_or_update_func(self, id, name, age, role):
         """
@@ -50,52 +85,90 @@ class DSCreator:
         self.insert_or_update_func(id, name, age, role)
         user_record = self.db_operator.fetch_data("SELECT id, uuid FROM USERS WHERE id=?", (id,))
         if not user_record:
-            print(f"No user found with ID: {id}")
+            logging.error(f"No user found with ID: {id}")
             return
 
         if user_record and len(user_record[0]) > 1:
             user_uuid = user_record[0][1]  # Retrieve the UUID from the second column
         else:
-            print(f"Unable to retrieve UUID for user ID: {id}")
+            logging.error(f"Unable to retrieve UUID for user ID: {id}")
             return
 
-        images_path = os.path.join(dataset_location, user_uuid)
-        images_path = images_path.replace("\\", "/")
-        os.makedirs(images_path, exist_ok=True)
-
         sample_num = 0
         capture_complete = False  # Flag to indicate when to stop capturing
-        image_paths = []  # Initialize a list to collect image paths
+        samples = []  # Normalised face crops, stored together once the capture ends
         try:
-            for mirrored_frame in self.camera.get_video_feed():  # Iterate over the frames from the generator
+            if self.wait_for_training or not self.owns_training_queue:
+                self.training_queue.start()
+            self.metrics_exporter.start()
+            last_frame = time.perf_counter()
+            last_sample = 0.0
+            for frame_index, mirrored_frame in enumerate(self.camera.get_video_feed()):  # Iterate over the frames from the generator
                 if mirrored_frame is None:
-                    print("Failed to grab frame")
+                    logging.error("Failed to grab frame")
                     break
+                start = time.perf_counter()
                 gray_image = cv2.cvtColor(mirrored_frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_detect.detectMultiScale(gray_image, 1.3, 5, minSize=(40, 40))
+                converted = time.perf_counter()
+                faces = self.detector.detect(gray_image)
+                detected = time.perf_counter()
+                self.metrics.observe("convert", converted - start)
+                self.metrics.observe("detect", detected - converted)
+                frame_samples = []
+                # Space the samples out without blocking the display
+                due = self.headless or detected - last_sample >= self.sample_interval
                 for (x, y, w, h) in faces:
-                    sample_num += 1
-                    face_image_path = os.path.join(images_path, f"{id}.{sample_num}.jpg")
-                    face_image_path = face_image_path.replace("\\", "/")
-                    cv2.imwrite(face_image_path, gray_image[y:y + h, x:x + w])
-                    image_paths.append(face_image_path)  # Collect the path
                     cv2.rectangle(mirrored_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                    if not due:
+                        continue
+                    sample_num += 1
+                    samples.append(normalize_face(gray_image[y:y + h, x:x + w]))
+                    frame_samples.append({"box": [int(x), int(y), int(w), int(h)], "sample": sample_num})
                     if sample_num >= 60:  # Check if the desired number of images has been captured
                         capture_complete = True
                         break  # Break out of the inner loop
-                    cv2.waitKey(100)
+                if frame_samples:
+                    last_sample = detected
+                saved = time.perf_counter()
+                self.metrics.observe("save", saved - detected)
+                self.metrics.increment("samples", len(frame_samples))
+                if self.headless:
+                    self.result_writer.write({
+                        "frame": frame_index,
+                        "source": self.camera.source.describe(),
+                        "user_id": id,
+                        "samples": frame_samples,
+                        "total_samples": sample_num,
+                    })
+                    self.metrics.observe("output", time.perf_counter() - saved)
+                    self._frame_done(last_frame, len(faces))
+                    last_frame = time.perf_counter()
+                    if capture_complete:
+                        break
+                    continue
                 # Display the frame with detected face rectangles
                 cv2.imshow("Create Face Dataset", mirrored_frame)
+                key = cv2.waitKey(1)
+                self.metrics.observe("display", time.perf_counter() - saved)
+                self._frame_done(last_frame, len(faces))
+                last_frame = time.perf_counter()
                 # Break the loop if 'q' is pressed or 60 images have been captured
-                if capture_complete or cv2.waitKey(1) & 0xFF == ord('q'):
+                if capture_complete or key & 0xFF == ord('q'):
                     break  # Break out of the outer loop
         except Exception as e:
             logging.error(f"An error occurred during face capture: {e}")
         finally:
-            if image_paths:  # Ensure there are paths to insert
-                self.db_operator.insert_images(user_uuid, image_paths)  # Insert all collected paths at once
-
-            self.ds_trainer.train_recognizer(user_uuid)  # Train the recognizer
+            if samples:
+                self.sample_store.add(user_uuid, samples)  # One append and one transaction
+                # Train the user's recognizer and the gallery in the background
+                self.training_queue.submit(user_uuid)
         logging.info("Dataset creation process completed.")
 
+    def _frame_done(self, last_frame, faces):
+        """
+        Record the loop time of a frame that started at `last_frame` and the faces found on it.
+        """
+        self.metrics.observe("frame", time.perf_counter() - last_frame)
+        self.metrics.frame_done(faces)
+
 # path: backend/modules/dsCreator.py
@@ -1,67 +1,190 @@
 import logging
 import os
 
-import cv2
-import numpy as np
-from PIL import Image
-
 from .dbOperators import DBOperator
-from .env_config import CASCADE_CLASSIFIER_PATH as cc_path
+from .env_config import DATABASE_PATH as db_path
+from .env_config import FACE_CACHE_PATH as cache_location
+from .env_config import GALLERY_MODEL_PATH as gallery_model_path
+from .env_config import SAMPLE_STORE_PATH as store_location
 from .env_config import TRAINED_MODEL_PATH as model_path
+from .galleryIndex import INDEX_MIN_SAMPLES, GalleryIndex, evaluate_index, index_file_path
+from .lbphModel import LEGACY_MODEL_EXTENSION, MODEL_EXTENSION, LBPHModel, load_model, model_exists
+from .sampleLoader import SampleLoader
+from .sampleStore import SampleStore, SampleStoreError, file_lock
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 class DSTrainer:
-    def __init__(self):
+    def __init__(self, sql_db_path=db_path, trained_model_path=model_path, gallery_path=gallery_model_path,
+                 cache_dir=cache_location, index_min_samples=INDEX_MIN_SAMPLES, store_dir=store_location):
         """
-        Initialize the DSTrainer with a face recognizer and database operator.
+        Initialize the DSTrainer with a database operator, the sample store and a loader for
+        samples that are still stored as image files.
+        A nearest-neighbour index is kept next to the gallery model once it holds
+        `index_min_samples` samples.
         """
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()
-        self.db_operator = DBOperator()
-        self.face_cascade = cv2.CascadeClassifier(cc_path)
+        self.db_operator = DBOperator(sql_db_path)
+        self.sample_loader = SampleLoader(cache_dir)
+        self.sample_store = SampleStore(store_dir, sql_db_path)
+        self.trained_model_path = trained_model_path
+        self.gallery_path = gallery_path
+        self.index_min_samples = index_min_samples
 
-    def train_recognizer(self, user_uuid):
+    def load_faces(self, rows):
         """
-        Train the face recognizer using images associated with the given user UUID.
+        Load the normalised faces of (image ID, user ID, image path, shard, slot) rows, paired with
+        their training labels. Packed samples are sliced out of the memory-mapped shards; samples
+        still stored as image files go through the sample loader.
         """
+        packed = [row for row in rows if row[3] is not None]
+        files = [row for row in rows if row[3] is None]
         faces = []
-        training_ids = []  # Separate variable for fetched IDs
-        user_id = None  # Variable to store the user ID
+        training_ids = []
+        if packed:
+            faces.extend(self.sample_store.load([(shard, slot) for _, _, _, shard, slot in packed]))
+            training_ids.extend(user_id for _, user_id, _, _, _ in packed)
+            logging.info(f"Loaded {len(packed)} packed faces")
+        if files:
+            file_faces, file_ids = self.sample_loader.load_faces([user_id for _, user_id, _, _, _ in files],
+                                                                 [image_path for _, _, image_path, _, _ in files])
+            faces.extend(file_faces)
+            training_ids.extend(file_ids)
+        return faces, training_ids
 
-        try:
-            ids, image_paths = self.db_operator.get_user_images(user_uuid)
-            logging.info(f"Fetched {len(ids)} IDs and {len(image_paths)} image paths for user UUID: {user_uuid}")
-            if ids:
-                user_id = ids[0]  # Assuming all images belong to the same user, get the first ID
-            for user_id, image_path in zip(ids, image_paths):
-                try:
-                    face_img = Image.open(image_path).convert('L')  # Convert to grayscale
-                    face_np = np.array(face_img, 'uint8')
-                    detected_faces = self.face_cascade.detectMultiScale(face_np)  # Detect faces in the image
-                    for (x, y, w, h) in detected_faces:
-                        faces.append(face_np[y:y + h, x:x + w])
-                        training_ids.append(user_id)  # Assign IDs to separate variable
-                except Exception as e:
-                    logging.error(f"Error processing image {image_path}: {e}")
-        except Exception as e:
-            logging.error(f"Error fetching user images from database: {e}")
+    def update_index(self, recognizer, incremental=True):
+        """
+        Bring the gallery index of a freshly saved model up to date. New samples are assigned to
+        the existing lists while they are fewer than half of the indexed ones; otherwise the index
+        is rebuilt. The index's recall against an exact scan is measured and logged.
+        """
+        index_path = index_file_path(recognizer.path)
+        if len(recognizer) < self.index_min_samples:
+            if os.path.exists(index_path):
+                os.remove(index_path)  # The gallery shrank below the size an index pays off at
+            return None
 
-        if len(training_ids) > 0 and len(faces) > 0:  # Use the separate variable for ID check
+        index = None
+        if incremental and os.path.exists(index_path):
             try:
-                self.recognizer.train(faces, np.array(training_ids))  # Use the separate variable for IDs
-                if user_id is not None:
-                    tmodel_path = os.path.join(model_path, f"user{user_id}.faceModel.yml")  # Use the retrieved user ID
-                    tmodel_path = tmodel_path.replace("\\", "/")  # Replace backslashes
-                    os.makedirs(os.path.dirname(tmodel_path), exist_ok=True)  # Create the directory if it doesn't exist
-                    self.recognizer.save(tmodel_path)  # Save the model with the retrieved user ID
-                    logging.info(f"Model trained successfully and saved at {tmodel_path}")  # Log the success message
-                else:
-                    logging.error("User ID could not be determined.")
+                index = GalleryIndex.load(index_path)
             except Exception as e:
-                logging.error(f"Error training recognizer: {e}")
+                logging.warning(f"Rebuilding unreadable gallery index {index_path}: {e}")
+            if index is not None and not (len(index) <= len(recognizer) < 1.5 * len(index)):
+                index = None
+        if index is not None and len(index) == len(recognizer):
+            return None  # Already covers every sample
+        if index is not None:
+            index.extend(recognizer.histograms)
         else:
+            index = GalleryIndex.build(recognizer.histograms)
+        index.save(index_path)
+
+        report = evaluate_index(recognizer, index)
+        logging.info(f"Gallery index with {len(index.centroids)} lists saved at {index_path}: "
+                     f"recall {report['recall']:.1%} (same label {report['label_recall']:.1%}) over "
+                     f"{report['queries']} queries, {report['candidates']:.0f} candidates per query, "
+                     f"{report['index_ms']:.1f} ms per query against {report['exact_ms']:.1f} ms exact")
+        return report
+
+    def train_model(self, model_name, tmodel_path, user_uuid=None, incremental=True, index=False):
+        """
+        Train or update a model on the images of one user, or of all users when no UUID is given.
+        With `index` the model's nearest-neighbour index is maintained as well.
+
+        The last image a model was trained on is recorded in the MODELS table. When the model file
+        exists and `incremental` is set, only images added since then are loaded and folded into the
+        existing model with LBPH's update(); otherwise the model is trained from scratch.
+        Models are saved in the binary LBPH format; a YAML model left by an older version is
+        converted when it is updated and then removed.
+        A lock file next to the model keeps other processes (the training queue, `train`, `enroll`)
+        from updating the same model at the same time.
+        """
+        tmodel_path = tmodel_path.replace("\\", "/")  # Replace backslashes
+        os.makedirs(os.path.dirname(tmodel_path) or ".", exist_ok=True)
+        with file_lock(f"{tmodel_path}.lock"):
+            return self._train_model(model_name, tmodel_path, user_uuid, incremental, index)
+
+    def _train_model(self, model_name, tmodel_path, user_uuid, incremental, index):
+        state = self.db_operator.get_model_state(model_name)
+        update = incremental and state is not None and model_exists(tmodel_path)
+        last_image_id = state[1] if update else 0
+
+        rows = self.db_operator.get_images_since(last_image_id, user_uuid)
+        logging.info(f"Fetched {len(rows)} new image paths for model {model_name}")
+        if update and not rows:
+            logging.info(f"Model {model_name} is up to date (version {state[0]}).")
+            if index:
+                try:
+                    self.update_index(load_model(tmodel_path, use_index=False))  # Build a missing index
+                except Exception as e:
+                    logging.error(f"Error updating the gallery index: {e}")
+            return True
+
+        image_ids = [image_id for image_id, _, _, _, _ in rows]
+        try:
+            faces, training_ids = self.load_faces(rows)
+        except SampleStoreError as e:
+            logging.error(f"Error loading samples: {e}")
+            return False
+        if len(training_ids) == 0 or len(faces) == 0:  # Use the separate variable for ID check
             logging.info("No data available for training.")
+            if update:
+                self.db_operator.set_model_state(model_name, state[0], max(image_ids), state[2])
+            return update
+
+        try:
+            if update:
+                recognizer = load_model(tmodel_path, use_index=False)
+                recognizer.update(faces, training_ids)  # Only the new samples are processed
+            else:
+                recognizer = LBPHModel()
+                recognizer.train(faces, training_ids)  # Use the separate variable for IDs
+            tmodel_path = recognizer.save(tmodel_path)
+            legacy_path = tmodel_path[:-len(MODEL_EXTENSION)] + LEGACY_MODEL_EXTENSION
+            if os.path.exists(legacy_path):
+                os.remove(legacy_path)  # Superseded by the binary model
+        except Exception as e:
+            logging.error(f"Error training recognizer: {e}")
+            return False
+        if index:
+            try:
+                self.update_index(recognizer, incremental=update)
+            except Exception as e:
+                # A stale index no longer matches the model and is ignored by the detector
+                logging.error(f"Error updating the gallery index: {e}")
+
+        version = state[0] + 1 if state else 1
+        sample_count = (state[2] if update else 0) + len(faces)
+        self.db_operator.set_model_state(model_name, version, max(image_ids), sample_count)
+        logging.info(f"Model {'updated' if update else 'trained'} successfully with {len(faces)} samples "
+                     f"(version {version}, {sample_count} samples in total) and saved at {tmodel_path}")
+        return True
+
+    def train_recognizer(self, user_uuid, incremental=True):
+        """
+        Train the face recognizer using images associated with the given user UUID.
+        """
+        try:
+            user_record = self.db_operator.fetch_data("SELECT id FROM USERS WHERE uuid=?", (user_uuid,))
+        except Exception as e:
+            logging.error(f"Error fetching user from database: {e}")
+            return False
+        if not user_record:
+            logging.error("User ID could not be determined.")
+            return False
+        user_id = user_record[0][0]
+        tmodel_path = os.path.join(self.trained_model_path, f"user{user_id}{MODEL_EXTENSION}")  # Use the retrieved user ID
+        return self.train_model(f"user{user_id}", tmodel_path, user_uuid, incremental)
+
+    def train_gallery(self, incremental=True):
+        """
+        Train a single gallery model over every enrolled user, labelled with the users' IDs,
+        so any face can be identified without selecting a user first. Incremental updates only
+        process images added since the last version, so enrolling a new user does not reprocess
+        anybody else.
+        """
+        return self.train_model("gallery", self.gallery_path, incremental=incremental, index=True)
 
 # Path: backend/modules/dsTrainer.py
@@ -12,17 +12,35 @@ CASCADE_CLASSIFIER_PATH = os.path.join(ROOT_DIR,
                                        "dataset/cascade_classifier/haarcascade_frontalface_default.xml")
 CASCADE_CLASSIFIER_PATH = CASCADE_CLASSIFIER_PATH.replace("\\", "/")
 #
+LBP_CASCADE_PATH = os.path.join(ROOT_DIR, "dataset/cascade_classifier/lbpcascade_frontalface.xml")
+LBP_CASCADE_PATH = LBP_CASCADE_PATH.replace("\\", "/")
+#
+DNN_MODEL_PATH = os.path.join(ROOT_DIR, "dataset/dnn/res10_300x300_ssd_iter_140000.caffemodel")
+DNN_MODEL_PATH = DNN_MODEL_PATH.replace("\\", "/")
+#
 DATABASE_PATH = os.path.join(ROOT_DIR, "database/vdbStore.db")
 DATABASE_PATH = DATABASE_PATH.replace("\\", "/")
 #
 TRAINING_DATA_PATH = os.path.join(ROOT_DIR, "dataset/images")
 TRAINING_DATA_PATH = TRAINING_DATA_PATH.replace("\\", "/")
 #
+SAMPLE_STORE_PATH = os.path.join(ROOT_DIR, "dataset/samples")
+SAMPLE_STORE_PATH = SAMPLE_STORE_PATH.replace("\\", "/")
+#
+FACE_CACHE_PATH = os.path.join(ROOT_DIR, "dataset/cache")
+FACE_CACHE_PATH = FACE_CACHE_PATH.replace("\\", "/")
+#
 TRAINED_MODEL_PATH = os.path.join(ROOT_DIR, "dataset/recognizer/")
 TRAINED_MODEL_PATH = TRAINED_MODEL_PATH.replace("\\", "/")
 #
+GALLERY_MODEL_PATH = os.path.join(TRAINED_MODEL_PATH, "gallery.faceModel.lbph")
+GALLERY_MODEL_PATH = GALLERY_MODEL_PATH.replace("\\", "/")
+#
 CAMERA_CONFIG_FILE = os.path.join(ROOT_DIR, "cam-config/camera_config.json")
 CAMERA_CONFIG_FILE = CAMERA_CONFIG_FILE.replace("\\", "/")
+#
+DETECTOR_CONFIG_FILE = os.path.join(ROOT_DIR, "cam-config/detector_config.json")
+DETECTOR_CONFIG_FILE = DETECTOR_CONFIG_FILE.replace("\\", "/")
 
 # paths for the face detection model and the camera configuration file.
 
@@ -1,25 +1,68 @@
 import logging
+import time
 import cv2
 import numpy as np
+from .activityLogger import ActivityLogger
 from .dbOperators import DBOperator
-from .env_config import CASCADE_CLASSIFIER_PATH as cc_path
 from .env_config import DATABASE_PATH as db_path
+from .env_config import GALLERY_MODEL_PATH as gallery_model_path
 from .env_config import TRAINED_MODEL_PATH as model_path
 from .osCamera import Camera
+from .overlayRenderer import OverlayRenderer
+from .pipelineMetrics import MetricsExporter, MetricsRegistry
+from .resultWriter import ResultWriter
+from .faceTracker import FaceTracker, IdentityCache
+from .lbphModel import MODEL_EXTENSION, ModelError, load_model, model_exists
+from .detectStrategy import create_strategy
+from .detectorBackends import create_detector, resolve_detector
+from .workerPool import DetectionWorkerPool, detect_and_predict, predict_boxes
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class FaceDetector:
-    def __init__(self, cascade_path=cc_path, sql_db_path=db_path, trained_model_path=model_path):
+    def __init__(self, detector_model=None, sql_db_path=db_path, trained_model_path=model_path,
+                 source=None, headless=False, output_path=None, buffer_size=2, strategy="full",
+                 log_activity=True, gallery_path=gallery_model_path, metrics_target=None, metrics_interval=10.0,
+                 render_thread=False, detector_backend=None, adaptive=False, reload_interval=2.0):
         """
-        Initialize the FaceDetector with paths to the cascade classifier, database, and trained model.
+        Initialize the FaceDetector with paths to the face detector model, database, and trained model.
+        `detector_backend` ("haar", "lbp" or "dnn") and `detector_model` default to the site's detector
+        configuration (see detectorBackends.resolve_detector).
+        `source` selects the frame source (see frameSource.open_frame_source); in headless mode no
+        windows are opened and per-frame results are written as JSON lines to `output_path`.
+        Frames are grabbed on a background thread into a ring buffer of `buffer_size` frames.
+        `strategy` selects how faces are searched for ("full" frame or "coarse"-to-fine); with `adaptive` the
+        detector's size range and scale step are tuned to the faces it sees.
+        With `log_activity` every recognition or rejection is written to USER_ACTIVITY in the background.
+        `gallery_path` is the model used to identify faces when no user is given.
+        Per-stage timings and frame counters are kept in `self.metrics`; `metrics_target` exports them
+        to a Prometheus text file or an HTTP endpoint every `metrics_interval` seconds.
+        With `render_thread` overlays are drawn on a background thread; nothing is drawn in headless mode.
+        Every `reload_interval` seconds the training job queue is checked and the recognizer is
+        reloaded when a training job finished, so new enrollments are recognised without a restart.
         """
-        self.face_cascade = cv2.CascadeClassifier(cascade_path)
-        self.camera = Camera()
+        self.detector_spec = resolve_detector(detector_backend, detector_model)
+        self.face_detector = create_detector(self.detector_spec)
+        self.strategy = strategy
+        self.adaptive = adaptive
+        self.detector = create_strategy(strategy, self.face_detector, adaptive=adaptive)
+        self.metrics = MetricsRegistry("detector")
+        self.metrics_exporter = MetricsExporter(self.metrics, metrics_target, metrics_interval)
+        self.camera = Camera(source=source, threaded=True, buffer_size=buffer_size, metrics=self.metrics)
         self.db_operator = DBOperator(sql_db_path)
-        self.recognizer = cv2.face.LBPHFaceRecognizer_create()  # Create a face recognizer object for LBPH algorithm
+        self.recognizer = None  # LBPH model, loaded by detect_faces
+        self.model_file = None
+        self.reload_interval = reload_interval
+        self.training_job = 0  # Last finished training job when the recognizer was loaded
         self.trained_model_path = trained_model_path
+        self.gallery_path = gallery_path
+        self.headless = headless
+        self.result_writer = ResultWriter(output_path) if headless else None
+        self.renderer = OverlayRenderer(threaded=render_thread) if not headless else None
+        self.threshold = 100  # Set a threshold for confidence level
+        self.activity_logger = ActivityLogger(self.db_operator) if log_activity else None
+        self.frame_times = []  # Seconds spent on each frame of the last detect_faces run
 
     def get_profile(self, user_id):
         """
@@ -31,68 +74,192 @@ class FaceDetector:
             logging.error(f"Error fetching profile from database: {e}")
             return None
 
-    def detect_faces(self, user_id):
+    def recognize_faces(self, gray, profile=None):
         """
-        Detect faces in the video feed and display the user profile.
+        Detect faces in a grayscale frame and check each one against the loaded recognizer.
+        Returns a list of (x, y, w, h, label, confidence, profile, track_id) tuples; see match_results.
         """
-        user_id_filepath = f'user{user_id}.faceModel.yml'
-        self.recognizer.read(f'{self.trained_model_path}/{user_id_filepath}')  # Load the pre-trained recognizer model
-        profile = self.get_profile(user_id)  # Fetch the profile for the user with the given ID
+        return self.match_results(detect_and_predict(self.detector, self.recognizer, gray), profile)
 
+    def match_results(self, predictions, profile=None):
+        """
+        Attach the matching profile to each (x, y, w, h, label, confidence, track_id) prediction.
+        With a profile (verification) a face matches when the confidence is within the threshold;
+        without one (identification) the predicted gallery label is resolved to its profile.
+        The profile is None for faces that do not match.
+        """
         if profile is None:
-            print("User does not exist")
-            return
+            # Resolve the labels of all matching faces of the frame in one lookup
+            profiles = self.resolve_labels([label for (_, _, _, _, label, conf, _) in predictions
+                                            if conf <= self.threshold])
+        results = []
+        for (x, y, w, h, label, conf, track_id) in predictions:
+            matched_profile = None
+            if conf <= self.threshold:
+                if profile is not None:
+                    matched_profile = profile if profile[0] is not None else None
+                else:
+                    matched_profile = profiles.get(label)
+            results.append((x, y, w, h, label, conf, matched_profile, track_id))
+        return results
 
+    def resolve_labels(self, labels):
+        """
+        Resolve gallery labels to user profiles through the database's profile cache.
+        Returns a dict mapping each label to its profile or None.
+        """
+        if not labels:
+            return {}
         try:
-            for frame in self.camera.get_video_feed():
-                video_stream = frame
-                gray = cv2.cvtColor(video_stream, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.3, 5, minSize=(40, 40))  # Detect faces in the frame
-
-                for (x, y, w, h) in faces:
-                    # Draw rectangle around the face
-                    cv2.rectangle(video_stream, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                    if profile:
-                        identifier = profile[1]  # Get the UUID from the profile
-                        label = profile[0]  # Get the integer label from the profile
-                        if label is not None:
-                            id, conf = self.recognizer.predict(gray[y:y + h, x:x + w])  # Predict the face
-                            threshold = 100  # Set a threshold for confidence level
-                            if conf > threshold:
-                                text = "Error: Face does not match"
-                                color = (0, 0, 255)
-                            else:
-                                # Prepare the text to display
-                                text = f"ID: {identifier}\nName: {profile[2]}\nAge: {profile[3]}"
-                                color = (0, 255, 127)
-                        else:
-                            text = "User does not exist"
-                            color = (0, 0, 255)
-
-                        # Draw text background
-                        text_lines = text.split('\n')
-                        text_height = 20 * len(text_lines)
-                        overlay = video_stream.copy()
-                        cv2.rectangle(overlay, (x, y - text_height - 10), (x + w, y), (0, 0, 0), -1)
-                        alpha = 0.6  # Transparency factor
-                        cv2.addWeighted(overlay, alpha, video_stream, 1 - alpha, 0, video_stream)
-
-                        # Draw text
-                        for i, line in enumerate(text_lines):
-                            cv2.putText(video_stream, line, (x + 5, y - text_height + (i * 20) + 15),
-                                        cv2.FONT_HERSHEY_COMPLEX, 0.6, color, 2)
-
-                        # Draw confidence level at the bottom right
-                        conf_text = f"Conf: {conf:.2f}"
-                        (text_width, text_height), baseline = cv2.getTextSize(conf_text, cv2.FONT_HERSHEY_COMPLEX, 0.5, 1)
-                        cv2.rectangle(video_stream, (video_stream.shape[1] - text_width - 10, video_stream.shape[0] - text_height - 10),
-                                      (video_stream.shape[1], video_stream.shape[0]), (0, 0, 0), -1)
-                        cv2.putText(video_stream, conf_text, (video_stream.shape[1] - text_width - 5, video_stream.shape[0] - 5),
-                                    cv2.FONT_HERSHEY_COMPLEX, 0.5, (255, 255, 255), 1)
-
-                cv2.imshow("Face Detector", video_stream)
-                if cv2.waitKey(1) == ord('q'):  # Press 'q' to exit
+            return self.db_operator.get_profiles(labels)
+        except Exception as e:
+            logging.error(f"Error fetching profiles from database: {e}")
+            return {}
+
+    def log_results(self, results, profile=None):
+        """
+        Queue a recognition or rejection event for every face. Rejections are only logged when
+        verifying a user, against that user; in identification mode an unknown face is not logged,
+        since the closest gallery match is not someone who was seen.
+        """
+        for (x, y, w, h, label, conf, matched_profile, track_id) in results:
+            if matched_profile is not None:
+                self.activity_logger.log(matched_profile[0], "recognized", f"confidence {conf:.1f}", track_id)
+            elif profile is not None and profile[0] is not None:
+                self.activity_logger.log(profile[0], "rejected", f"confidence {conf:.1f}", track_id)
+
+    def draw_results(self, video_stream, results):
+        """
+        Draw face rectangles, profile labels and the confidence level onto the frame.
+        """
+        (self.renderer or OverlayRenderer()).draw(video_stream, results)
+
+    def write_results(self, frame_index, results):
+        """
+        Write the results of a frame as a JSON line (headless mode).
+        """
+        self.result_writer.write({
+            "frame": frame_index,
+            "source": self.camera.source.describe(),
+            "faces": [
+                {
+                    "box": [x, y, w, h],
+                    "label": label,
+                    "confidence": conf,
+                    "matched": profile is not None,
+                    "user_id": profile[0] if profile is not None else None,
+                    "uuid": profile[1] if profile is not None else None,
+                    "name": profile[2] if profile is not None else None,
+                    "track_id": track_id,
+                }
+                for (x, y, w, h, label, conf, profile, track_id) in results
+            ],
+        })
+
+    def reload_model(self, worker_pool=None):
+        """
+        Reload the recognizer if a training job finished since it was loaded. Returns True if it was reloaded.
+        """
+        training_job = self.db_operator.get_last_finished_training_job()
+        if training_job <= self.training_job:
+            return False
+        try:
+            self.recognizer = load_model(self.model_file)
+        except ModelError as e:
+            logging.error(f"Could not reload the recognizer from {self.model_file}: {e}")
+            return False
+        finally:
+            self.training_job = training_job
+        if worker_pool is not None:
+            worker_pool.reload_model()
+        logging.info(f"Reloaded the recognizer from {self.model_file} after training job {training_job}")
+        return True
+
+    def detect_faces(self, user_id=None, workers=None, reorder_window=None, detect_interval=None):
+        """
+        Detect faces in the video feed and display the user profile.
+        With a `user_id` each face is verified against that user's model; without one every face is
+        identified against the gallery model of all enrolled users.
+        With `workers` > 1 detection and recognition run on a pool of worker processes and
+        results are reassembled in frame order within `reorder_window` frames.
+        With `detect_interval` the detector only runs every that many frames (or when tracking
+        confidence drops) and faces are followed by a template-matching tracker in between.
+        """
+        self.training_job = self.db_operator.get_last_finished_training_job()  # Read before the model is loaded
+        if user_id is not None:
+            user_id_filepath = f'user{user_id}{MODEL_EXTENSION}'
+            model_file = f'{self.trained_model_path}/{user_id_filepath}'
+            try:
+                self.recognizer = load_model(model_file)  # Load the pre-trained recognizer model
+            except ModelError:
+                logging.error("No model found for this user, create a dataset first")
+                return
+            profile = self.get_profile(user_id)  # Fetch the profile for the user with the given ID
+
+            if profile is None:
+                logging.error("User does not exist")
+                return
+        else:
+            model_file = self.gallery_path
+            if not model_exists(model_file):
+                logging.error("No gallery model found, enroll a user first")
+                return
+            self.recognizer = load_model(model_file)  # Load the multi-user gallery model
+            profile = None
+
+        self.model_file = model_file
+        worker_pool = None
+        self.frame_times = []
+        if self.activity_logger is not None:
+            self.activity_logger.start()
+        try:
+            self.metrics_exporter.start()
+            if self.renderer is not None:
+                self.renderer.start()
+            if detect_interval:
+                if workers and workers > 1:
+                    logging.warning("Tracking runs in-process; ignoring the worker pool.")
+                processed = self._process_tracked(self.camera.get_video_feed(), detect_interval)
+            elif workers and workers > 1:
+                worker_pool = DetectionWorkerPool(self.detector_spec, model_file, workers, reorder_window,
+                                                  self.strategy, self.adaptive)
+                processed = self._timed(worker_pool.process(self.camera.get_video_feed()), "pool")
+            else:
+                processed = self._process_locally(self.camera.get_video_feed())
+
+            last_frame = time.perf_counter()
+            next_reload_check = last_frame + self.reload_interval
+            for frame_index, (video_stream, gray, predictions) in enumerate(processed):
+                start = time.perf_counter()
+                results = self.match_results(predictions, profile)
+                if self.activity_logger is not None:
+                    self.log_results(results, profile)
+                self.metrics.observe("match", time.perf_counter() - start)
+
+                start = time.perf_counter()
+                if self.headless:
+                    self.write_results(frame_index, results)
+                    self.metrics.observe("output", time.perf_counter() - start)
+                    key = None
+                else:
+                    self.renderer.submit(video_stream, results)
+                    self.metrics.observe("draw", time.perf_counter() - start)
+                    start = time.perf_counter()
+                    rendered = self.renderer.latest()
+                    if rendered is not None:
+                        cv2.imshow("Face Detector", rendered)
+                    key = cv2.waitKey(1)
+                    self.metrics.observe("display", time.perf_counter() - start)
+
+                now = time.perf_counter()
+                self.frame_times.append(now - last_frame)
+                self.metrics.observe("frame", now - last_frame)
+                self.metrics.frame_done(len(results))
+                last_frame = now
+                if self.reload_interval and now >= next_reload_check:
+                    self.reload_model(worker_pool)
+                    next_reload_check = now + self.reload_interval
+                if key == ord('q'):  # Press 'q' to exit
                     break
 
         except Exception as e:
@@ -100,7 +267,86 @@ class FaceDetector:
 
         finally:
             # Release resources
+            if worker_pool is not None:
+                worker_pool.close()
+            if self.renderer is not None:
+                self.renderer.close()
+            self.metrics_exporter.close()  # Final export and summary
+            self.detector.log_summary()
+            stats = self.db_operator.profile_cache.stats()
+            logging.info(f"Profile cache: {stats['hits']} hits, {stats['misses']} misses "
+                         f"({stats['hit_ratio']:.0%} hit ratio), {stats['size']} cached")
+            if self.activity_logger is not None:
+                self.activity_logger.close()  # Flush pending events
             self.camera.release()
-            cv2.destroyAllWindows()
+            if self.headless:
+                self.result_writer.close()
+            else:
+                cv2.destroyAllWindows()
+
+    def _process_locally(self, frames):
+        """
+        Generator yielding (frame, gray, predictions) computed in this process.
+        """
+        for frame in frames:
+            start = time.perf_counter()
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            converted = time.perf_counter()
+            boxes = self.detector.detect(gray)
+            detected = time.perf_counter()
+            predictions = predict_boxes(self.recognizer, gray, boxes)
+            self.metrics.observe("convert", converted - start)
+            self.metrics.observe("detect", detected - converted)
+            self.metrics.observe("predict", time.perf_counter() - detected)
+            yield frame, gray, predictions
+
+    def _timed(self, frames, stage):
+        """
+        Pass the items of an iterator through, recording how long each one took to produce as `stage`.
+        """
+        iterator = iter(frames)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.metrics.observe(stage, time.perf_counter() - start)
+            yield item
+
+    def _process_tracked(self, frames, detect_interval):
+        """
+        Generator yielding (frame, gray, predictions) where faces are detected every `detect_interval`
+        frames and tracked under stable track IDs in between. Each track's identity is voted over
+        its first predictions and then served from the identity cache.
+        """
+        tracker = FaceTracker(detect_interval=detect_interval)
+        identities = IdentityCache()
+        try:
+            for frame in frames:
+                start = time.perf_counter()
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                converted = time.perf_counter()
+                tracks, detected = tracker.update(gray, self.detector.detect)
+                tracked = time.perf_counter()
+                if detected:
+                    identities.prune(tracks)
+                # Predict every track that needs a fresh vote in one batch
+                pending = [track for track in tracks if identities.needs_prediction(track)]
+                votes = predict_boxes(self.recognizer, gray, [track.box for track in pending])
+                self.metrics.observe("convert", converted - start)
+                self.metrics.observe("detect" if detected else "track", tracked - converted)
+                self.metrics.observe("predict", time.perf_counter() - tracked)
+                for track, (_, _, _, _, label, conf, _) in zip(pending, votes):
+                    identities.add_vote(track, label, conf)
+                predictions = []
+                for track in tracks:
+                    label, conf = identities.identity(track)
+                    x, y, w, h = track.box
+                    predictions.append((x, y, w, h, label, conf, track.track_id))
+                yield frame, gray, predictions
+        finally:
+            logging.info(f"Detector ran on {tracker.detection_ratio():.0%} of {tracker.frames} tracked frames; "
+                         f"{identities.hit_ratio():.0%} of {identities.lookups} identity lookups served from cache.")
 
 # path: backend/modules/faceDetect.py
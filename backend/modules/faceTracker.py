@@ -0,0 +1,211 @@
+import itertools
+import logging
+
+import cv2
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def box_iou(a, b):
+    """
+    Intersection over union of two (x, y, w, h) boxes.
+    """
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    ih = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = iw * ih
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class Track:
+    """
+    A face followed across frames under a stable track ID.
+    """
+
+    def __init__(self, track_id, box, template):
+        self.track_id = track_id
+        self.box = box
+        self.template = template
+        self.confidence = 1.0  # 1.0 right after a detection, template match score afterwards
+        self.frames_tracked = 0
+
+
+class FaceTracker:
+    """
+    Runs the (expensive) detector every `detect_interval` frames and follows the detected faces with
+    template matching in between.
+
+    The detector also runs early when a track's match score drops below `min_confidence`, which
+    is what happens when a face turns away, is occluded or leaves the frame.
+    """
+
+    def __init__(self, detect_interval=5, min_confidence=0.6, iou_threshold=0.3, search_margin=0.5):
+        self.detect_interval = max(1, detect_interval)
+        self.min_confidence = min_confidence
+        self.iou_threshold = iou_threshold
+        self.search_margin = search_margin
+        self.tracks = []
+        self.frames_since_detection = 0
+        self.track_ids = itertools.count(1)
+        self.frames = 0
+        self.detections = 0
+
+    def update(self, gray, detect):
+        """
+        Advance all tracks to the new grayscale frame. `detect(gray)` must return (x, y, w, h) boxes.
+        Returns (tracks, detected) where `detected` tells whether the detector ran on this frame.
+        """
+        self.frames += 1
+        needs_detection = (
+            not self.tracks
+            or self.frames_since_detection + 1 >= self.detect_interval
+            or any(track.confidence < self.min_confidence for track in self.tracks)
+        )
+        if needs_detection:
+            self._associate(gray, [tuple(int(v) for v in box) for box in detect(gray)])
+            self.frames_since_detection = 0
+            self.detections += 1
+        else:
+            for track in self.tracks:
+                self._follow(gray, track)
+            self.frames_since_detection += 1
+        return self.tracks, needs_detection
+
+    def _associate(self, gray, boxes):
+        """
+        Match detections to existing tracks by IoU; unmatched detections start new tracks and
+        unmatched tracks are dropped.
+        """
+        pairs = sorted(
+            ((box_iou(track.box, box), t, d) for t, track in enumerate(self.tracks) for d, box in enumerate(boxes)),
+            reverse=True,
+        )
+        matched_tracks = set()
+        matched_boxes = set()
+        updated = []
+        for iou, t, d in pairs:
+            if iou < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+            track = self.tracks[t]
+            track.box = boxes[d]
+            track.template = self._crop(gray, boxes[d])
+            track.confidence = 1.0
+            track.frames_tracked += 1
+            updated.append(track)
+        for d, box in enumerate(boxes):
+            if d not in matched_boxes:
+                updated.append(Track(next(self.track_ids), box, self._crop(gray, box)))
+        self.tracks = updated
+
+    def _follow(self, gray, track):
+        """
+        Move a track to the best template match inside a window around its previous box.
+        """
+        x, y, w, h = track.box
+        margin_x = int(w * self.search_margin)
+        margin_y = int(h * self.search_margin)
+        x0 = max(0, x - margin_x)
+        y0 = max(0, y - margin_y)
+        x1 = min(gray.shape[1], x + w + margin_x)
+        y1 = min(gray.shape[0], y + h + margin_y)
+        window = gray[y0:y1, x0:x1]
+        th, tw = track.template.shape[:2]
+        if window.shape[0] < th or window.shape[1] < tw:
+            track.confidence = 0.0  # Pushed against the frame border; let the detector decide
+            return
+        scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+        _, best_score, _, best_location = cv2.minMaxLoc(scores)
+        track.box = (x0 + best_location[0], y0 + best_location[1], w, h)
+        track.confidence = float(best_score)
+        track.frames_tracked += 1
+
+    @staticmethod
+    def _crop(gray, box):
+        x, y, w, h = box
+        return gray[y:y + h, x:x + w].copy()
+
+    def detection_ratio(self):
+        """
+        Fraction of frames on which the detector actually ran.
+        """
+        return self.detections / self.frames if self.frames else 0.0
+
+
+class IdentityCache:
+    """
+    Caches the recognised identity of every track so the recognizer is not run on every frame.
+
+    A new track is predicted on each of its first `initial_votes` frames and the predictions are
+    combined by a confidence-weighted vote (LBPH confidence is a distance, so closer matches weigh
+    more). After that the voted identity is reused and a fresh vote is only added every
+    `refresh_interval` frames or when the face box has changed by more than `box_change`
+    (1 - IoU) since the last prediction. Only the latest `max_votes` votes are kept.
+    """
+
+    def __init__(self, initial_votes=3, refresh_interval=30, box_change=0.4, max_votes=7):
+        self.initial_votes = initial_votes
+        self.refresh_interval = refresh_interval
+        self.box_change = box_change
+        self.max_votes = max_votes
+        self.entries = {}
+        self.predictions = 0
+        self.lookups = 0
+
+    def needs_prediction(self, track):
+        """
+        Whether the track's face should be run through the recognizer on this frame.
+        """
+        self.lookups += 1
+        entry = self.entries.get(track.track_id)
+        if entry is None or len(entry["votes"]) < self.initial_votes:
+            return True
+        if track.frames_tracked - entry["frame"] >= self.refresh_interval:
+            return True
+        return 1.0 - box_iou(track.box, entry["box"]) > self.box_change
+
+    def add_vote(self, track, label, confidence):
+        """
+        Record a prediction for the track.
+        """
+        self.predictions += 1
+        entry = self.entries.setdefault(track.track_id, {"votes": []})
+        entry["votes"].append((label, confidence))
+        del entry["votes"][:-self.max_votes]
+        entry["frame"] = track.frames_tracked
+        entry["box"] = track.box
+
+    def identity(self, track):
+        """
+        The voted (label, confidence) of a track, confidence being the mean over the winning votes.
+        """
+        weights = {}
+        confidences = {}
+        for label, confidence in self.entries[track.track_id]["votes"]:
+            weights[label] = weights.get(label, 0.0) + 1.0 / (1.0 + confidence)
+            confidences.setdefault(label, []).append(confidence)
+        label = max(weights, key=weights.get)
+        return label, sum(confidences[label]) / len(confidences[label])
+
+    def prune(self, tracks):
+        """
+        Forget the identities of tracks that no longer exist.
+        """
+        active = {track.track_id for track in tracks}
+        for track_id in list(self.entries):
+            if track_id not in active:
+                del self.entries[track_id]
+
+    def hit_ratio(self):
+        """
+        Fraction of face lookups that were served without running the recognizer.
+        """
+        return 1.0 - self.predictions / self.lookups if self.lookups else 0.0
+
+# path: backend/modules/faceTracker.py
@@ -0,0 +1,141 @@
+import collections
+import logging
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size, thread-safe frame buffer.
+
+    With `drop_oldest` a full buffer discards its oldest frame so the reader always gets the
+    newest one; otherwise the writer waits for space (used for recorded sources, where every
+    frame should be processed).
+    """
+
+    def __init__(self, capacity=2, drop_oldest=True):
+        if capacity < 1:
+            raise ValueError("Buffer capacity must be at least 1.")
+        self.capacity = capacity
+        self.drop_oldest = drop_oldest
+        self.frames = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.captured = 0
+        self.dropped = 0
+        self.consumed = 0
+
+    def put(self, frame):
+        """
+        Add a frame. Returns False once the buffer has been closed.
+        """
+        with self.condition:
+            if not self.drop_oldest:
+                while len(self.frames) >= self.capacity and not self.closed:
+                    self.condition.wait()
+            if self.closed:
+                return False
+            if len(self.frames) >= self.capacity:
+                self.frames.popleft()
+                self.dropped += 1
+            self.frames.append(frame)
+            self.captured += 1
+            self.condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Return the newest frame when dropping, else the oldest. Returns None once the buffer
+        is closed and empty, or when the timeout expires.
+        """
+        with self.condition:
+            while not self.frames and not self.closed:
+                if not self.condition.wait(timeout):
+                    return None
+            if not self.frames:
+                return None
+            if self.drop_oldest:
+                frame = self.frames.pop()
+                self.dropped += len(self.frames)
+                self.frames.clear()
+            else:
+                frame = self.frames.popleft()
+            self.consumed += 1
+            self.condition.notify_all()
+            return frame
+
+    def close(self):
+        """
+        Wake up all waiters; pending frames can still be read.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def stats(self):
+        """
+        Snapshot of the buffer counters.
+        """
+        with self.condition:
+            return {
+                "captured": self.captured,
+                "dropped": self.dropped,
+                "consumed": self.consumed,
+                "buffered": len(self.frames),
+            }
+
+
+class ThreadedCapture:
+    """
+    Reads a frame source on a background thread into a FrameRingBuffer.
+    """
+
+    def __init__(self, source, capacity=2):
+        self.source = source
+        self.buffer = FrameRingBuffer(capacity, drop_oldest=source.live)
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """
+        Start the grabber thread.
+        """
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._grab, name="frame-grabber", daemon=True)
+        self.thread.start()
+
+    def _grab(self):
+        try:
+            while not self.stop_event.is_set():
+                frame = self.source.read()
+                if frame is None or not self.buffer.put(frame):
+                    break
+        except Exception as e:
+            logging.error(f"Frame grabber stopped: {e}")
+        finally:
+            self.buffer.close()
+
+    def read(self):
+        """
+        Block until a frame is available. Returns None once the source is exhausted.
+        """
+        return self.buffer.get()
+
+    def stop(self):
+        """
+        Stop the grabber thread and wait for it to finish.
+        """
+        self.stop_event.set()
+        self.buffer.close()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def stats(self):
+        return self.buffer.stats()
+
+# path: backend/modules/frameBuffer.py
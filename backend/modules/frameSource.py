@@ -0,0 +1,304 @@
+import logging
+import os
+
+import cv2
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+
+class FrameSourceError(Exception):
+    """Custom exception for frame source errors."""
+    pass
+
+
+class FrameSource:
+    """
+    Base class for everything that can feed BGR frames to the detection loop.
+    """
+    # Live sources produce frames whether or not anybody reads them; recorded ones wait for the reader.
+    live = False
+    # Only the front-facing camera preview is mirrored.
+    mirror = False
+
+    def open(self):
+        """
+        Acquire the underlying resource.
+        """
+        pass
+
+    def read(self):
+        """
+        Return the next BGR frame, or None once the source is exhausted.
+        """
+        raise NotImplementedError
+
+    def release(self):
+        """
+        Release the underlying resource.
+        """
+        pass
+
+    def describe(self):
+        """
+        Short human readable description used in logs and headless output.
+        """
+        return self.__class__.__name__
+
+    def __iter__(self):
+        self.open()
+        while True:
+            frame = self.read()
+            if frame is None:
+                break
+            yield frame
+
+
+class DeviceSource(FrameSource):
+    """
+    Frames from a camera device opened through cv2.VideoCapture.
+    """
+    live = True
+    mirror = True
+
+    def __init__(self, camera_id=0):
+        self.camera_id = camera_id
+        self.capture = None
+
+    def open(self):
+        if self.capture is not None:
+            return
+        try:
+            self.capture = cv2.VideoCapture(self.camera_id)
+        except cv2.error as e:
+            raise FrameSourceError(f"OpenCV error: {e}")
+        if not self.capture.isOpened():
+            self.capture = None
+            raise FrameSourceError(f"Camera with ID {self.camera_id} could not be opened.")
+
+    def read(self):
+        if self.capture is None:
+            self.open()
+        success, frame = self.capture.read()
+        if not success:
+            logging.error("Failed to read frame from camera.")
+            return None
+        return frame
+
+    def release(self):
+        if self.capture is not None:
+            try:
+                self.capture.release()
+            except cv2.error as e:
+                logging.error(f"OpenCV error while releasing camera: {e}")
+            finally:
+                self.capture = None
+
+    def describe(self):
+        return f"device:{self.camera_id}"
+
+
+class VideoFileSource(FrameSource):
+    """
+    Frames decoded from a recorded video file.
+    """
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.capture = None
+
+    def open(self):
+        if self.capture is not None:
+            return
+        if not os.path.isfile(self.path):
+            raise FrameSourceError(f"Video file {self.path} does not exist.")
+        self.capture = cv2.VideoCapture(self.path)
+        if not self.capture.isOpened():
+            self.capture = None
+            raise FrameSourceError(f"Video file {self.path} could not be opened.")
+
+    def read(self):
+        if self.capture is None:
+            self.open()
+        success, frame = self.capture.read()
+        if not success and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read()
+        return frame if success else None
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def describe(self):
+        return f"video:{self.path}"
+
+
+class ImageFolderSource(FrameSource):
+    """
+    Frames read from the image files of a directory, in file name order.
+    """
+
+    def __init__(self, directory, loop=False):
+        self.directory = directory
+        self.loop = loop
+        self.files = []
+        self.position = 0
+
+    def open(self):
+        if self.files:
+            return
+        if not os.path.isdir(self.directory):
+            raise FrameSourceError(f"Image directory {self.directory} does not exist.")
+        self.files = sorted(
+            os.path.join(self.directory, name).replace("\\", "/")
+            for name in os.listdir(self.directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.files:
+            raise FrameSourceError(f"No images found in {self.directory}.")
+        self.position = 0
+
+    def read(self):
+        if not self.files:
+            self.open()
+        while True:
+            if self.position >= len(self.files):
+                if not self.loop:
+                    return None
+                self.position = 0
+            path = self.files[self.position]
+            self.position += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                return frame
+            logging.warning(f"Skipping unreadable image {path}")
+
+    def release(self):
+        self.files = []
+        self.position = 0
+
+    def describe(self):
+        return f"images:{self.directory}"
+
+
+class SyntheticSource(FrameSource):
+    """
+    Deterministic generated frames for repeatable throughput measurements.
+
+    When a face image is given it is pasted `faces` times per frame at drifting positions,
+    otherwise plain face-sized ellipses are drawn on a noisy background.
+    """
+
+    def __init__(self, width=640, height=480, count=300, faces=1, face_image=None, seed=0):
+        self.width = width
+        self.height = height
+        self.count = count
+        self.faces = faces
+        self.face_image = face_image
+        self.seed = seed
+        self.produced = 0
+        self.side = max(40, min(width, height) // 4)
+        self.template = None
+        self.background = None
+        self.positions = None
+        self.velocities = None
+
+    def open(self):
+        if self.background is not None:
+            return
+        rng = np.random.default_rng(self.seed)
+        self.background = rng.integers(60, 110, (self.height, self.width, 3), dtype=np.uint8)
+        if self.face_image is not None:
+            template = cv2.imread(self.face_image, cv2.IMREAD_COLOR)
+            if template is None:
+                raise FrameSourceError(f"Face image {self.face_image} could not be read.")
+            self.template = cv2.resize(template, (self.side, self.side), interpolation=cv2.INTER_AREA)
+        side = self.side
+        self.positions = rng.uniform(0, 1, (self.faces, 2)) * [max(1, self.width - side), max(1, self.height - side)]
+        self.velocities = rng.uniform(-3, 3, (self.faces, 2))
+        self.produced = 0
+
+    def read(self):
+        if self.background is None:
+            self.open()
+        if self.count is not None and self.produced >= self.count:
+            return None
+        frame = self.background.copy()
+        side = self.side
+        limits = np.array([max(1, self.width - side), max(1, self.height - side)])
+        for i in range(self.faces):
+            position = self.positions[i] + self.velocities[i]
+            bounced = (position < 0) | (position > limits)
+            self.velocities[i][bounced] *= -1
+            self.positions[i] = np.clip(position, 0, limits)
+            x, y = (int(v) for v in self.positions[i])
+            if self.template is not None:
+                frame[y:y + side, x:x + side] = self.template
+            else:
+                center = (x + side // 2, y + side // 2)
+                cv2.ellipse(frame, center, (side // 3, side // 2 - 2), 0, 0, 360, (170, 180, 200), -1)
+                cv2.circle(frame, (center[0] - side // 7, center[1] - side // 8), side // 14, (40, 40, 40), -1)
+                cv2.circle(frame, (center[0] + side // 7, center[1] - side // 8), side // 14, (40, 40, 40), -1)
+        self.produced += 1
+        return frame
+
+    def release(self):
+        self.background = None
+
+    def describe(self):
+        return f"synthetic:{self.width}x{self.height}:{self.count}:{self.faces}"
+
+
+def open_frame_source(spec, loop=False):
+    """
+    Build a frame source from a command line specification.
+
+    Accepted forms:
+      0, 1, ...                       camera device index
+      device:<index>                  camera device index
+      video:<path> / <video file>     recorded video file
+      images:<dir> / <directory>      directory of still images
+      synthetic[:WxH[:frames[:faces[:face_image]]]]  generated frames
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, int):
+        return DeviceSource(spec)
+
+    spec = str(spec)
+    kind, _, value = spec.partition(":")
+    if spec.isdigit():
+        return DeviceSource(int(spec))
+    if kind == "device":
+        return DeviceSource(int(value or 0))
+    if kind == "video":
+        return VideoFileSource(value, loop=loop)
+    if kind == "images":
+        return ImageFolderSource(value, loop=loop)
+    if kind == "synthetic":
+        parts = value.split(":") if value else []
+        width, height = 640, 480
+        if parts and parts[0]:
+            try:
+                width, height = (int(v) for v in parts[0].lower().split("x"))
+            except ValueError:
+                raise FrameSourceError(f"Invalid synthetic resolution: {parts[0]}")
+        count = int(parts[1]) if len(parts) > 1 and parts[1] else 300
+        faces = int(parts[2]) if len(parts) > 2 and parts[2] else 1
+        face_image = ":".join(parts[3:]) if len(parts) > 3 else None
+        return SyntheticSource(width, height, count=count, faces=faces, face_image=face_image)
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec, loop=loop)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, loop=loop)
+    raise FrameSourceError(f"Unrecognised frame source: {spec}")
+
+# path: backend/modules/frameSource.py
@@ -0,0 +1,201 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+INDEX_EXTENSION = ".faceIndex.npz"
+INDEX_VERSION = 1
+
+# Galleries smaller than this are scanned exactly; an index would not pay for itself
+INDEX_MIN_SAMPLES = 5000
+
+
+class GalleryIndexError(Exception):
+    """Custom exception for gallery index errors."""
+    pass
+
+
+def index_file_path(model_path):
+    """
+    Return the path of the index that belongs to a binary model file.
+    """
+    base, _ = os.path.splitext(model_path.replace("\\", "/"))
+    if base.endswith(".faceModel"):
+        base = base[:-len(".faceModel")]
+    return base + INDEX_EXTENSION
+
+
+def _squared_distances(points, centroids):
+    """
+    Squared Euclidean distances between every point and every centroid.
+    """
+    return ((points * points).sum(axis=1)[:, np.newaxis] - 2.0 * points @ centroids.T
+            + (centroids * centroids).sum(axis=1)[np.newaxis, :])
+
+
+def _assign(points, centroids, chunk=8192):
+    return np.concatenate([np.argmin(_squared_distances(points[start:start + chunk], centroids), axis=1)
+                           for start in range(0, len(points), chunk)]).astype(np.int32)
+
+
+class GalleryIndex:
+    """
+    An inverted-file (IVF) index over the histograms of a gallery model.
+
+    LBPH histograms are square-rooted, which turns the chi-square distance into approximately a
+    Euclidean one, and projected onto their leading principal components. K-means on the reduced
+    vectors splits the gallery into `lists`; a query only visits the samples of the `probe` lists
+    whose centroids are closest to it, and those candidates are then ranked with the exact
+    chi-square distance. With about 4 * sqrt(N) lists the candidates grow far slower than the gallery.
+    """
+
+    def __init__(self, mean, components, centroids, assignments, probe=8):
+        self.mean = mean
+        self.components = components
+        self.centroids = centroids
+        self.probe = probe
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self._build_lists()
+
+    def __len__(self):
+        return len(self.assignments)
+
+    def _build_lists(self):
+        # Samples grouped by list, with list k occupying rows[offsets[k]:offsets[k + 1]]
+        self.rows = np.argsort(self.assignments, kind="stable").astype(np.int32)
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    @classmethod
+    def build(cls, histograms, components=64, lists=None, probe=8, pca_samples=2000, kmeans_samples=50000,
+              iterations=10, seed=0):
+        """
+        Build an index over an (N, dims) array of LBPH histograms.
+        """
+        count = len(histograms)
+        if count < 2:
+            raise GalleryIndexError("An index needs at least two samples.")
+        rng = np.random.default_rng(seed)
+
+        # PCA through the eigenvectors of the sample Gram matrix, which is only pca_samples wide
+        sample = np.sort(rng.choice(count, min(count, pca_samples), replace=False))
+        vectors = np.sqrt(np.asarray(histograms[sample], dtype=np.float64))
+        mean = vectors.mean(axis=0)
+        vectors -= mean
+        eigenvalues, eigenvectors = np.linalg.eigh(vectors @ vectors.T)
+        keep = [i for i in np.argsort(eigenvalues)[::-1][:components] if eigenvalues[i] > 1e-9]
+        basis = (vectors.T @ eigenvectors[:, keep]) / np.sqrt(eigenvalues[keep])
+        index = cls(mean.astype(np.float32), basis.T.astype(np.float32), np.zeros((1, len(keep)), np.float32),
+                    np.zeros(0, np.int32), probe)
+
+        reduced = index.reduce(histograms)
+        lists = lists or max(1, min(count // 8, int(round(4 * np.sqrt(count)))))
+        training = reduced[rng.choice(count, min(count, max(kmeans_samples, lists)), replace=False)]
+        centroids = training[rng.choice(len(training), lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _assign(training, centroids)
+            sums = np.zeros_like(centroids, dtype=np.float64)
+            np.add.at(sums, labels, training)
+            sizes = np.bincount(labels, minlength=lists)
+            empty = sizes == 0
+            centroids[~empty] = (sums[~empty] / sizes[~empty, np.newaxis]).astype(np.float32)
+            if empty.any():  # Re-seed empty lists on random training points
+                centroids[empty] = training[rng.choice(len(training), int(empty.sum()), replace=False)]
+        index.centroids = centroids
+        index.assignments = _assign(reduced, centroids)
+        index._build_lists()
+        return index
+
+    def reduce(self, histograms, chunk=4096):
+        """
+        Project histograms onto the index's principal components.
+        """
+        return np.concatenate([
+            (np.sqrt(np.asarray(histograms[start:start + chunk], dtype=np.float32)) - self.mean) @ self.components.T
+            for start in range(0, len(histograms), chunk)
+        ]) if len(histograms) else np.empty((0, len(self.components)), np.float32)
+
+    def extend(self, histograms):
+        """
+        Assign gallery samples added after the index was built to their nearest lists.
+        `histograms` is the model's full histogram array.
+        """
+        if len(histograms) > len(self.assignments):
+            added = _assign(self.reduce(histograms[len(self.assignments):]), self.centroids)
+            self.assignments = np.concatenate([self.assignments, added])
+            self._build_lists()
+
+    def candidates(self, histograms, probe=None):
+        """
+        Gallery rows to rank exactly for a batch of query histograms: the members of each query's
+        `probe` nearest lists, merged over the batch. Returns a sorted array of row numbers.
+        """
+        probe = min(probe or self.probe, len(self.centroids))
+        distances = _squared_distances(self.reduce(histograms), self.centroids)
+        nearest = np.unique(np.argpartition(distances, probe - 1, axis=1)[:, :probe])
+        return np.sort(np.concatenate([self.rows[self.offsets[k]:self.offsets[k + 1]] for k in nearest]))
+
+    def save(self, path):
+        """
+        Write the index next to its model, replacing any previous version atomically.
+        """
+        path = path.replace("\\", "/")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, version=INDEX_VERSION, probe=self.probe, mean=self.mean, components=self.components,
+                 centroids=self.centroids, assignments=self.assignments)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved by save().
+        """
+        with np.load(path.replace("\\", "/")) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                raise GalleryIndexError(f"{path} has unsupported index version {int(data['version'])}.")
+            return cls(data["mean"], data["components"], data["centroids"], data["assignments"],
+                       int(data["probe"]))
+
+
+def evaluate_index(model, index, samples=50, seed=0):
+    """
+    Measure an index against the exact scan, leaving each sampled gallery histogram out of its own
+    search. Returns the fraction of queries whose exact nearest neighbour the index finds, the
+    fraction that get the same label, the mean number of candidates and both query latencies.
+    """
+    rng = np.random.default_rng(seed)
+    queries = np.sort(rng.choice(len(model), min(samples, len(model)), replace=False))
+    found = same_label = candidate_total = 0
+    exact_time = index_time = 0.0
+    for row in queries:
+        histogram = np.asarray(model.histograms[row:row + 1])
+        start = time.perf_counter()
+        exact = model.batch_distances(histogram)[0]
+        exact_time += time.perf_counter() - start
+        exact[row] = np.inf
+        start = time.perf_counter()
+        rows = index.candidates(histogram)
+        approximate = model.batch_distances(histogram, rows)[0]
+        index_time += time.perf_counter() - start
+        approximate[rows == row] = np.inf
+        candidate_total += len(rows)
+        best_exact = int(np.argmin(exact))
+        best_approximate = int(rows[np.argmin(approximate)]) if len(rows) > 1 else -1
+        found += best_approximate == best_exact
+        same_label += best_approximate >= 0 and model.labels[best_approximate] == model.labels[best_exact]
+    return {
+        "queries": len(queries),
+        "recall": found / len(queries),
+        "label_recall": same_label / len(queries),
+        "candidates": candidate_total / len(queries),
+        "exact_ms": 1000 * exact_time / len(queries),
+        "index_ms": 1000 * index_time / len(queries),
+    }
+
+# path: backend/modules/galleryIndex.py
@@ -0,0 +1,377 @@
+import json
+import logging
+import os
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+from .galleryIndex import GalleryIndex, index_file_path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MODEL_EXTENSION = ".faceModel.lbph"
+LEGACY_MODEL_EXTENSION = ".faceModel.yml"
+
+# File layout: magic, little-endian uint32 header length, JSON header, then the labels (int32),
+# the per-histogram sums (float64) and the histograms (float32, one row per sample), each starting
+# on a 64-byte boundary so the arrays can be memory-mapped in place
+MODEL_MAGIC = b"LBPHMDL1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+# Gallery rows compared per step. A block is reused for every face of a batch, so it should stay
+# small enough to remain in the CPU cache while the batch is scored against it
+DISTANCE_BLOCK_ROWS = 32
+
+
+class ModelError(Exception):
+    """Custom exception for recognizer model errors."""
+    pass
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def model_file_path(path):
+    """
+    Return the binary model path for a model path in either format.
+    """
+    if path.endswith(LEGACY_MODEL_EXTENSION):
+        return path[:-len(LEGACY_MODEL_EXTENSION)] + MODEL_EXTENSION
+    return path
+
+
+class LBPHModel:
+    """
+    An LBPH face recognizer that keeps its histograms as flat arrays.
+
+    Features and distances follow OpenCV's LBPHFaceRecognizer: extended LBP codes with bilinear
+    interpolation over `neighbors` points at `radius`, one normalised histogram per cell of a
+    `grid_x` x `grid_y` grid, and the nearest training histogram by the alternative chi-square
+    distance. A saved model is memory-mapped when loaded, so loading costs next to nothing and
+    processes serving the same model share its pages.
+    """
+
+    def __init__(self, radius=1, neighbors=8, grid_x=8, grid_y=8, threshold=np.finfo(np.float64).max):
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.threshold = threshold
+        self.labels = np.empty(0, dtype=np.int32)
+        self.sums = np.empty(0, dtype=np.float64)
+        self.histograms = np.empty((0, self.dims), dtype=np.float32)
+        self.path = None
+        self.index = None  # Optional GalleryIndex that narrows predictions down to candidate rows
+
+    @property
+    def patterns(self):
+        return 2 ** self.neighbors
+
+    @property
+    def dims(self):
+        return self.grid_x * self.grid_y * self.patterns
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _sample_offsets(self):
+        """
+        Integer corners and float32 bilinear weights of every sampling point, computed as OpenCV does.
+        """
+        points = []
+        for n in range(self.neighbors):
+            x = np.float32(self.radius * np.cos(2.0 * np.pi * n / np.float32(self.neighbors)))
+            y = np.float32(-self.radius * np.sin(2.0 * np.pi * n / np.float32(self.neighbors)))
+            fx, fy = int(np.floor(x)), int(np.floor(y))
+            cx, cy = int(np.ceil(x)), int(np.ceil(y))
+            ty = np.float32(y - fy)
+            tx = np.float32(x - fx)
+            one = np.float32(1)
+            weights = ((one - tx) * (one - ty), tx * (one - ty), (one - tx) * ty, tx * ty)
+            points.append((fx, fy, cx, cy, weights))
+        return points
+
+    def lbp_codes(self, faces):
+        """
+        Extended LBP codes of one (H, W) face or a stack of (N, H, W) faces of equal size.
+        """
+        faces = np.asarray(faces)
+        r = self.radius
+        height, width = faces.shape[-2:]
+        rows, cols = height - 2 * r, width - 2 * r
+        if rows <= 0 or cols <= 0:
+            raise ModelError(f"Face of {width}x{height} pixels is too small for LBP radius {r}.")
+        src = faces.astype(np.float32)
+        center = src[..., r:r + rows, r:r + cols]
+        codes = np.zeros(center.shape, dtype=np.int32)
+        epsilon = np.finfo(np.float32).eps
+
+        def window(dy, dx):
+            return src[..., r + dy:r + dy + rows, r + dx:r + dx + cols]
+
+        for n, (fx, fy, cx, cy, (w1, w2, w3, w4)) in enumerate(self._sample_offsets()):
+            t = w1 * window(fy, fx) + w2 * window(fy, cx) + w3 * window(cy, fx) + w4 * window(cy, cx)
+            codes |= ((t > center) | (np.abs(t - center) < epsilon)).astype(np.int32) << n
+        return codes
+
+    def compute_histograms(self, faces):
+        """
+        Spatial LBP histograms of a stack of (N, H, W) faces. Returns an (N, dims) float32 array.
+        """
+        codes = self.lbp_codes(faces)
+        if codes.ndim == 2:
+            codes = codes[np.newaxis]
+        count, rows, cols = codes.shape
+        cell_h, cell_w = rows // self.grid_y, cols // self.grid_x
+        if cell_h == 0 or cell_w == 0:
+            raise ModelError(f"Face is too small for a {self.grid_x}x{self.grid_y} histogram grid.")
+        cells = self.grid_x * self.grid_y
+        # Cut the code image into grid cells (pixels beyond the last full cell are ignored, as in OpenCV)
+        codes = codes[:, :cell_h * self.grid_y, :cell_w * self.grid_x]
+        codes = codes.reshape(count, self.grid_y, cell_h, self.grid_x, cell_w).transpose(0, 1, 3, 2, 4)
+        codes = codes.reshape(count, cells, cell_h * cell_w)
+        # Give every (sample, cell, code) its own bin and count them all in one pass
+        bins = codes + (np.arange(count * cells, dtype=np.int64) * self.patterns).reshape(count, cells, 1)
+        counts = np.bincount(bins.ravel(), minlength=count * self.dims).reshape(count, self.dims)
+        # OpenCV scales by the float32 reciprocal of the cell size; do the same so the bins match exactly
+        return counts.astype(np.float32) * (np.float32(1) / np.float32(cell_h * cell_w))
+
+    def compute_histogram(self, face):
+        """
+        Spatial LBP histogram of a single (H, W) face.
+        """
+        return self.compute_histograms(face[np.newaxis])[0]
+
+    def train(self, faces, labels):
+        """
+        Replace the model with histograms of the given faces.
+        """
+        self.labels = np.empty(0, dtype=np.int32)
+        self.sums = np.empty(0, dtype=np.float64)
+        self.histograms = np.empty((0, self.dims), dtype=np.float32)
+        self.update(faces, labels)
+
+    def update(self, faces, labels):
+        """
+        Add the histograms of the given faces to the model, like LBPHFaceRecognizer.update().
+        """
+        labels = np.asarray(labels, dtype=np.int32).ravel()
+        if len(faces) != len(labels):
+            raise ModelError(f"Got {len(faces)} faces but {len(labels)} labels.")
+        if len(faces) == 0:
+            return
+        histograms = np.concatenate([self.compute_histograms(np.stack(faces[start:start + 256]))
+                                     for start in range(0, len(faces), 256)])
+        self.labels = np.concatenate([self.labels, labels])
+        self.sums = np.concatenate([self.sums, histograms.sum(axis=1, dtype=np.float64)])
+        self.histograms = np.concatenate([self.histograms, histograms])
+
+    def distances(self, histogram):
+        """
+        Chi-square distance (OpenCV's HISTCMP_CHISQR_ALT) from one histogram to every training histogram.
+        """
+        return self.batch_distances(histogram[np.newaxis])[0]
+
+    def batch_distances(self, histograms, rows=None):
+        """
+        Chi-square distances from a batch of (Q, dims) histograms to every training histogram, or
+        only to the training histograms numbered in `rows`, returned as a (Q, count) array.
+
+        For non-negative bins (a - b)^2 / (a + b) = a + b - 4 / (1/a + 1/b), so the distance is the
+        two histogram sums minus a harmonic term that only the query's non-empty bins contribute to
+        (an empty training bin has an infinite reciprocal and adds nothing). The gallery is walked
+        once per batch in small blocks; each block's reciprocals are computed once and every query
+        of the batch is scored against them while they are still in cache.
+        """
+        histograms = np.asarray(histograms, dtype=np.float32)
+        count = len(self.labels) if rows is None else len(rows)
+        nonzero = [np.flatnonzero(histogram) for histogram in histograms]
+        reciprocals = [np.reciprocal(histogram[bins]) for histogram, bins in zip(histograms, nonzero)]
+        harmonic = np.empty((len(histograms), count), dtype=np.float64)
+        for start in range(0, count, DISTANCE_BLOCK_ROWS):
+            stop = min(count, start + DISTANCE_BLOCK_ROWS)
+            block = self.histograms[start:stop] if rows is None else self.histograms[rows[start:stop]]
+            with np.errstate(divide="ignore"):
+                block = np.reciprocal(block)
+            for row, (bins, reciprocal) in enumerate(zip(nonzero, reciprocals)):
+                terms = block[:, bins]
+                terms += reciprocal
+                np.reciprocal(terms, out=terms)
+                harmonic[row, start:stop] = terms.sum(axis=1, dtype=np.float64)
+        query_sums = histograms.sum(axis=1, dtype=np.float64)
+        sums = self.sums if rows is None else self.sums[rows]
+        return 2.0 * (query_sums[:, np.newaxis] + sums[np.newaxis, :] - 4.0 * harmonic)
+
+    def _best_match(self, distances, rows=None):
+        best = int(np.argmin(distances)) if len(distances) else -1
+        if best >= 0 and distances[best] < self.threshold:
+            return int(self.labels[best if rows is None else rows[best]]), float(distances[best])
+        return -1, float(np.finfo(np.float64).max)
+
+    def predict(self, face):
+        """
+        Predict the label of a grayscale face. Returns (label, confidence) like
+        LBPHFaceRecognizer.predict(): (-1, DBL_MAX) when no training sample is within the threshold.
+        """
+        return self.predict_batch([face])[0]
+
+    def predict_batch(self, faces):
+        """
+        Predict the labels of a batch of equally sized grayscale faces in one pass over the gallery.
+        With an index only the candidates it selects for the batch are compared.
+        Returns a list of (label, confidence) pairs with the same semantics as predict().
+        """
+        if len(self.labels) == 0:
+            raise ModelError("The model has not been trained.")
+        if len(faces) == 0:
+            return []
+        histograms = self.compute_histograms(np.stack(faces))
+        rows = self.index.candidates(histograms) if self.index is not None else None
+        distances = self.batch_distances(histograms, rows)
+        return [self._best_match(row, rows) for row in distances]
+
+    def save(self, path):
+        """
+        Write the model in the binary format. The file is replaced atomically, so processes that
+        still have the previous version mapped keep a consistent copy.
+        """
+        path = model_file_path(path.replace("\\", "/"))
+        header = {
+            "version": FORMAT_VERSION,
+            "radius": self.radius,
+            "neighbors": self.neighbors,
+            "grid_x": self.grid_x,
+            "grid_y": self.grid_y,
+            "threshold": float(self.threshold),
+            "count": len(self.labels),
+            "dims": self.dims,
+        }
+        prefix = len(MODEL_MAGIC) + 4
+        # The offsets are part of the header, so size the header with room for them first
+        header.update(labels_offset=0, sums_offset=0, histograms_offset=0)
+        header_size = len(json.dumps(header).encode("utf-8")) + 64
+        header["labels_offset"] = _align(prefix + header_size)
+        header["sums_offset"] = _align(header["labels_offset"] + 4 * len(self.labels))
+        header["histograms_offset"] = _align(header["sums_offset"] + 8 * len(self.labels))
+        encoded = json.dumps(header).encode("utf-8").ljust(header_size)
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MODEL_MAGIC + struct.pack("<I", header_size) + encoded)
+            for offset, array in ((header["labels_offset"], np.ascontiguousarray(self.labels, dtype="<i4")),
+                                  (header["sums_offset"], np.ascontiguousarray(self.sums, dtype="<f8")),
+                                  (header["histograms_offset"],
+                                   np.ascontiguousarray(self.histograms, dtype="<f4"))):
+                f.seek(offset)
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+        self.path = path
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map a model saved in the binary format.
+        """
+        path = path.replace("\\", "/")
+        with open(path, "rb") as f:
+            prefix = f.read(len(MODEL_MAGIC) + 4)
+            if len(prefix) < len(MODEL_MAGIC) + 4 or prefix[:len(MODEL_MAGIC)] != MODEL_MAGIC:
+                raise ModelError(f"{path} is not an LBPH model file.")
+            header_size, = struct.unpack("<I", prefix[len(MODEL_MAGIC):])
+            header = json.loads(f.read(header_size).decode("utf-8"))
+        if header.get("version") != FORMAT_VERSION:
+            raise ModelError(f"{path} has unsupported model format version {header.get('version')}.")
+
+        model = cls(header["radius"], header["neighbors"], header["grid_x"], header["grid_y"], header["threshold"])
+        count, dims = header["count"], header["dims"]
+        if dims != model.dims:
+            raise ModelError(f"{path} holds {dims}-bin histograms, expected {model.dims}.")
+        if count:
+            model.labels = np.memmap(path, dtype="<i4", mode="r", offset=header["labels_offset"], shape=(count,))
+            model.sums = np.memmap(path, dtype="<f8", mode="r", offset=header["sums_offset"], shape=(count,))
+            model.histograms = np.memmap(path, dtype="<f4", mode="r", offset=header["histograms_offset"],
+                                         shape=(count, dims))
+        model.path = path
+        return model
+
+    @classmethod
+    def from_recognizer(cls, recognizer):
+        """
+        Copy the histograms and labels of a trained cv2.face.LBPHFaceRecognizer.
+        """
+        model = cls(recognizer.getRadius(), recognizer.getNeighbors(), recognizer.getGridX(),
+                    recognizer.getGridY(), recognizer.getThreshold())
+        histograms = recognizer.getHistograms()
+        if len(histograms):
+            model.histograms = np.vstack([h.reshape(1, -1) for h in histograms]).astype(np.float32)
+            model.labels = np.asarray(recognizer.getLabels(), dtype=np.int32).ravel()
+            model.sums = model.histograms.sum(axis=1, dtype=np.float64)
+        return model
+
+
+def convert_legacy_model(yml_path):
+    """
+    Convert an OpenCV YAML model to the binary format next to it. Returns the new path.
+    """
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(yml_path)
+    path = LBPHModel.from_recognizer(recognizer).save(model_file_path(yml_path))
+    logging.info(f"Converted {yml_path} to {path}")
+    return path
+
+
+def model_exists(path):
+    """
+    Whether a model exists at `path` in either format.
+    """
+    binary_path = model_file_path(path.replace("\\", "/"))
+    return os.path.exists(binary_path) or os.path.exists(binary_path[:-len(MODEL_EXTENSION)] + LEGACY_MODEL_EXTENSION)
+
+
+def load_model(path, use_index=True):
+    """
+    Load a recognizer model in the binary format. `path` may name either format; when only the
+    YAML file of a model exists, or it is newer than the binary one, it is converted first.
+    With `use_index` a gallery index saved next to the model is attached when it covers the
+    model's samples.
+    """
+    path = path.replace("\\", "/")
+    binary_path = model_file_path(path)
+    yml_path = binary_path[:-len(MODEL_EXTENSION)] + LEGACY_MODEL_EXTENSION
+    if os.path.exists(yml_path) and (not os.path.exists(binary_path)
+                                     or os.path.getmtime(yml_path) > os.path.getmtime(binary_path)):
+        convert_legacy_model(yml_path)
+    if not os.path.exists(binary_path):
+        raise ModelError(f"No model found at {binary_path}")
+    model = LBPHModel.load(binary_path)
+    if use_index:
+        model.index = load_index(model)
+    return model
+
+
+def load_index(model):
+    """
+    Load the gallery index of a saved model, or None when there is none or it is out of date.
+    """
+    index_path = index_file_path(model.path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        index = GalleryIndex.load(index_path)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable gallery index {index_path}: {e}")
+        return None
+    if len(index) != len(model) or index.components.shape[1] != model.dims:
+        logging.warning(f"Ignoring gallery index {index_path}: it does not match the model, retrain to rebuild it")
+        return None
+    logging.info(f"Loaded gallery index with {len(index.centroids)} lists for {len(model)} samples")
+    return index
+
+# path: backend/modules/lbphModel.py
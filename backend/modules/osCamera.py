@@ -1,10 +1,13 @@
 import json
 import logging
 import os
+import time
 
 import cv2
 
 from .env_config import CAMERA_CONFIG_FILE as CONFIG_FILE
+from .frameBuffer import ThreadedCapture
+from .frameSource import DeviceSource, FrameSourceError, open_frame_source
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -16,9 +19,29 @@ class CameraError(Exception):
 
 
 class Camera:
-    def __init__(self, camera_id=None):
-        self.camera_id = camera_id if camera_id is not None else self.load_camera_id()
+    def __init__(self, camera_id=None, source=None, threaded=False, buffer_size=2, metrics=None):
+        """
+        Wrap a frame source. Without an explicit source the configured camera device is used.
+        With `threaded` a background thread grabs frames into a ring buffer of `buffer_size`
+        frames; for live sources the oldest frame is dropped so the reader always gets the newest.
+        With a pipelineMetrics.MetricsRegistry as `metrics` the time spent waiting for each frame
+        and the grabber's counters are recorded.
+        """
         self.camera = None
+        self.metrics = metrics
+        self.threaded = threaded
+        self.buffer_size = buffer_size
+        self.capture = None
+        self.capture_stats = {"captured": 0, "dropped": 0, "consumed": 0, "buffered": 0}
+        try:
+            self.source = open_frame_source(source)
+        except FrameSourceError as e:
+            raise CameraError(e)
+        if self.source is None:
+            self.camera_id = camera_id if camera_id is not None else self.load_camera_id()
+            self.source = DeviceSource(self.camera_id)
+        else:
+            self.camera_id = getattr(self.source, "camera_id", camera_id)
         try:
             self.initialize_camera()
         except CameraError as e:
@@ -29,42 +52,64 @@ class Camera:
         Initializes the camera resource.
         """
         try:
-            self.camera = cv2.VideoCapture(self.camera_id)
-            if not self.camera.isOpened():
-                raise CameraError(f"Camera with ID {self.camera_id} could not be opened.")
-            logging.info(f"Camera with ID {self.camera_id} initialized.")
-        except cv2.error as e:
-            raise CameraError(f"OpenCV error: {e}")
+            self.source.open()
+            self.camera = self.source
+            logging.info(f"Frame source {self.source.describe()} initialized.")
+        except FrameSourceError as e:
+            raise CameraError(e)
 
     def get_video_feed(self):
         """
-        Generator function that yields mirrored frames for live video feed.
+        Generator function that yields frames for the video feed, mirrored for camera devices.
         """
         if not self.camera:
             self.initialize_camera()
+        reader = self.camera
+        if self.threaded:
+            self.capture = ThreadedCapture(self.camera, self.buffer_size)
+            self.capture.start()
+            reader = self.capture
         while True:
-            success, i_frame = self.camera.read()
-            if not success:
-                logging.error("Failed to read frame from camera.")
+            start = time.perf_counter()
+            i_frame = reader.read()
+            if self.metrics is not None:
+                self.metrics.observe("capture", time.perf_counter() - start)
+                if self.capture is not None:
+                    stats = self.capture.stats()
+                    self.metrics.set_gauge("frames_captured", stats["captured"])
+                    self.metrics.set_gauge("frames_dropped", stats["dropped"])
+            if i_frame is None:
                 break
-            # Mirror the frame
-            mirrored_frame = cv2.flip(i_frame, 1)
-            yield mirrored_frame
-            # yield i_frame
+            if self.source.mirror:
+                # Mirror the frame
+                i_frame = cv2.flip(i_frame, 1)
+            yield i_frame
 
     def release(self):
         """
         Releases the camera resource.
         """
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture_stats = self.capture.stats()
+            self.capture = None
+            logging.info(f"Frames captured: {self.capture_stats['captured']}, "
+                         f"dropped: {self.capture_stats['dropped']}, consumed: {self.capture_stats['consumed']}")
         if self.camera:
             try:
                 self.camera.release()
-                logging.info(f"Camera with ID {self.camera_id} released.")
-            except cv2.error as e:
-                logging.error(f"OpenCV error while releasing camera: {e}")
+                logging.info(f"Frame source {self.source.describe()} released.")
             finally:
                 self.camera = None
 
+    def stats(self):
+        """
+        Captured, dropped and consumed frame counters of the threaded grabber.
+        """
+        if self.capture is None:
+            return dict(self.capture_stats)
+        return self.capture.stats()
+
     def __del__(self):
         """
         Ensures the camera resource is released when the object is destroyed.
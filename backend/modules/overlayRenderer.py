@@ -0,0 +1,147 @@
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+_STOP = object()
+
+LABEL_FONT = cv2.FONT_HERSHEY_COMPLEX
+LABEL_LINE_HEIGHT = 20
+LABEL_ALPHA = 0.6  # Opacity of the shading behind the profile text
+MATCH_COLOR = (0, 255, 127)
+MISMATCH_COLOR = (0, 0, 255)
+BOX_COLOR = (0, 255, 0)
+
+
+def shade_region(frame, x1, y1, x2, y2, alpha=LABEL_ALPHA):
+    """
+    Darken a rectangle of the frame in place, as blending a black box with opacity `alpha` would.
+    Only the pixels of the rectangle (clipped to the frame) are touched.
+    """
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = max(0, x1), max(0, y1), min(width, x2 + 1), min(height, y2 + 1)
+    if x1 >= x2 or y1 >= y2:
+        return
+    roi = frame[y1:y2, x1:x2]
+    cv2.convertScaleAbs(roi, roi, 1.0 - alpha)  # Writes through the view into the frame
+
+
+class OverlayRenderer:
+    """
+    Draws recognition results onto frames for display.
+
+    The label box behind each profile is shaded by scaling only its own pixels instead of blending
+    a copy of the whole frame, and the confidence box is drawn once per frame, so the cost grows
+    with the area of the labels rather than with the frame size times the number of faces.
+
+    With `threaded` frames are rendered on a background thread: `submit()` hands a frame and its
+    results over and returns immediately, and `latest()` returns the newest finished frame. When
+    the renderer falls behind, the frame still waiting to be rendered is replaced by the newer one.
+    """
+
+    def __init__(self, threaded=False):
+        self.threaded = threaded
+        self.condition = threading.Condition()
+        self.pending = None
+        self.rendered = None
+        self.thread = None
+        self.frames = 0
+        self.skipped = 0
+
+    def start(self):
+        """
+        Start the render thread (threaded mode only).
+        """
+        if self.threaded and self.thread is None:
+            self.pending = None
+            self.thread = threading.Thread(target=self._run, name="overlay-renderer", daemon=True)
+            self.thread.start()
+        return self
+
+    def draw(self, frame, results):
+        """
+        Draw face rectangles, profile labels and the confidence level onto the frame in place.
+        `results` are (x, y, w, h, label, confidence, profile, track_id) tuples.
+        """
+        for (x, y, w, h, label, conf, profile, track_id) in results:
+            # Draw rectangle around the face
+            cv2.rectangle(frame, (x, y), (x + w, y + h), BOX_COLOR, 2)
+
+            if profile is not None:
+                text_lines = [f"ID: {profile[1]}", f"Name: {profile[2]}", f"Age: {profile[3]}"]
+                color = MATCH_COLOR
+            else:
+                text_lines = ["Error: Face does not match"]
+                color = MISMATCH_COLOR
+
+            # Shade the text background
+            text_height = LABEL_LINE_HEIGHT * len(text_lines)
+            shade_region(frame, x, y - text_height - 10, x + w, y)
+
+            # Draw text
+            for i, line in enumerate(text_lines):
+                cv2.putText(frame, line, (x + 5, y - text_height + (i * LABEL_LINE_HEIGHT) + 15),
+                            LABEL_FONT, 0.6, color, 2)
+
+        if results:
+            # Draw the confidence level of the last face at the bottom right
+            conf_text = f"Conf: {results[-1][5]:.2f}"
+            (text_width, text_height), baseline = cv2.getTextSize(conf_text, LABEL_FONT, 0.5, 1)
+            cv2.rectangle(frame, (frame.shape[1] - text_width - 10, frame.shape[0] - text_height - 10),
+                          (frame.shape[1], frame.shape[0]), (0, 0, 0), -1)
+            cv2.putText(frame, conf_text, (frame.shape[1] - text_width - 5, frame.shape[0] - 5),
+                        LABEL_FONT, 0.5, (255, 255, 255), 1)
+        return frame
+
+    def submit(self, frame, results):
+        """
+        Render a frame: inline, or on the render thread when threaded.
+        """
+        if self.thread is None:
+            self.rendered = self.draw(frame, results)
+            self.frames += 1
+            return
+        with self.condition:
+            if self.pending is not None and self.pending is not _STOP:
+                self.skipped += 1
+            self.pending = (frame, results)
+            self.condition.notify()
+
+    def latest(self):
+        """
+        The most recently rendered frame, or None before the first one is done.
+        """
+        with self.condition:
+            return self.rendered
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                item, self.pending = self.pending, None
+            if item is _STOP:
+                return
+            frame = self.draw(*item)  # Drawing releases the GIL, so it overlaps the next detection
+            with self.condition:
+                self.rendered = frame
+                self.frames += 1
+
+    def close(self):
+        """
+        Stop the render thread after the frame it is working on.
+        """
+        if self.thread is None:
+            return
+        with self.condition:
+            self.pending = _STOP
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+        logging.info(f"Overlay renderer: {self.frames} frames rendered, {self.skipped} skipped")
+
+# path: backend/modules/overlayRenderer.py
@@ -0,0 +1,270 @@
+import bisect
+import collections
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+METRICS_PREFIX = "faceguard"
+# Upper bounds in seconds of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# Upper bounds of the faces-per-frame histogram buckets
+FACE_COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 8, 12, 16)
+
+
+class MetricsError(Exception):
+    """Custom exception for metrics export errors."""
+    pass
+
+
+class RollingHistogram:
+    """
+    A cumulative bucketed histogram, as Prometheus exposes it, plus the most recent `window`
+    observations for percentiles in log summaries.
+    """
+
+    def __init__(self, buckets, window=1024):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last slot is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+        self.recent = collections.deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentile(self, q):
+        """
+        The q-th percentile (0-100) of the recent observations, or None without observations.
+        """
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))]
+
+
+class MetricsRegistry:
+    """
+    Per-stage timers and counters of one frame loop (`component`, e.g. "detector").
+
+    Recording is a lock, a bisect and a few additions, so it can be done for every stage of
+    every frame. Stage names are used in the order they are first seen.
+    """
+
+    def __init__(self, component, window=1024):
+        self.component = component
+        self.window = window
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = collections.OrderedDict()
+        self.gauges = collections.OrderedDict()
+        self.faces = RollingHistogram(FACE_COUNT_BUCKETS, window)
+        self.frame_timestamps = collections.deque(maxlen=window)
+
+    def observe(self, stage, seconds):
+        """
+        Record the time a frame spent in a stage.
+        """
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = RollingHistogram(LATENCY_BUCKETS, self.window)
+            histogram.observe(seconds)
+
+    def increment(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def set_gauge(self, gauge, value):
+        with self.lock:
+            self.gauges[gauge] = value
+
+    def frame_done(self, faces):
+        """
+        Count a finished frame and the number of faces found on it.
+        """
+        with self.lock:
+            self.frame_timestamps.append(time.perf_counter())
+            self.counters["frames"] = self.counters.get("frames", 0) + 1
+            self.counters["faces"] = self.counters.get("faces", 0) + faces
+            self.faces.observe(faces)
+
+    def fps(self):
+        """
+        Frame rate over the recent frames.
+        """
+        with self.lock:
+            if len(self.frame_timestamps) < 2:
+                return 0.0
+            elapsed = self.frame_timestamps[-1] - self.frame_timestamps[0]
+            return (len(self.frame_timestamps) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def render_prometheus(self):
+        """
+        Render all metrics in the Prometheus text exposition format.
+        """
+        fps = self.fps()
+        label = f'component="{self.component}"'
+        lines = []
+        with self.lock:
+            lines += [f"# HELP {METRICS_PREFIX}_stage_seconds Time a frame spent in each pipeline stage.",
+                      f"# TYPE {METRICS_PREFIX}_stage_seconds histogram"]
+            for stage, histogram in self.stages.items():
+                lines += self._render_histogram(f"{METRICS_PREFIX}_stage_seconds", f'{label},stage="{stage}"',
+                                                histogram)
+            lines += [f"# HELP {METRICS_PREFIX}_faces_per_frame Faces found on each frame.",
+                      f"# TYPE {METRICS_PREFIX}_faces_per_frame histogram"]
+            lines += self._render_histogram(f"{METRICS_PREFIX}_faces_per_frame", label, self.faces)
+            for counter, value in self.counters.items():
+                lines += [f"# TYPE {METRICS_PREFIX}_{counter}_total counter",
+                          f"{METRICS_PREFIX}_{counter}_total{{{label}}} {value}"]
+            for gauge, value in self.gauges.items():
+                lines += [f"# TYPE {METRICS_PREFIX}_{gauge} gauge", f"{METRICS_PREFIX}_{gauge}{{{label}}} {value}"]
+        lines += [f"# TYPE {METRICS_PREFIX}_fps gauge", f"{METRICS_PREFIX}_fps{{{label}}} {fps:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(name, labels, histogram):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return lines
+
+    def summary(self):
+        """
+        A one-line summary of the frame rate, counters and recent per-stage latencies.
+        """
+        fps = self.fps()
+        with self.lock:
+            frames = self.counters.get("frames", 0)
+            parts = [f"{self.component}: {frames} frames at {fps:.1f} fps",
+                     f"{self.counters.get('faces', 0) / frames if frames else 0.0:.1f} faces/frame"]
+            if "frames_dropped" in self.gauges:
+                parts.append(f"{self.gauges['frames_dropped']} dropped")
+            stages = [f"{stage} {1000 * histogram.percentile(50):.1f}/{1000 * histogram.percentile(95):.1f}"
+                      for stage, histogram in self.stages.items() if histogram.recent]
+        message = ", ".join(parts)
+        if stages:
+            message += "; p50/p95 ms: " + ", ".join(stages)
+        return message
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a log line each
+
+
+def parse_metrics_target(target):
+    """
+    Split a --metrics value into ("http", (host, port)) or ("file", path). An integer, ":port",
+    "host:port" or an http:// URL serves the metrics over HTTP; anything else is a file path.
+    """
+    text = str(target)
+    address = text[len("http://"):].rstrip("/") if text.startswith("http://") else text
+    if address.startswith(":"):
+        address = "127.0.0.1" + address
+    host, _, port = address.rpartition(":")
+    if port.isdigit() and (host or text.isdigit()) and "/" not in host:
+        return "http", (host or "127.0.0.1", int(port))
+    if text.isdigit():
+        return "http", ("127.0.0.1", int(text))
+    return "file", text
+
+
+class MetricsExporter:
+    """
+    Publishes a MetricsRegistry in the background.
+
+    With a file `target` the Prometheus text is rewritten every `interval` seconds (for
+    node_exporter's textfile collector); with an HTTP target it is served on /metrics. Whatever
+    the target, a summary is logged every `log_interval` seconds and once more when closed.
+    """
+
+    def __init__(self, registry, target=None, interval=10.0, log_interval=60.0):
+        self.registry = registry
+        self.interval = interval
+        self.log_interval = log_interval
+        self.kind, self.destination = parse_metrics_target(target) if target is not None else (None, None)
+        self.server = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        if self.thread is not None:
+            return self
+        if self.kind == "http":
+            try:
+                self.server = ThreadingHTTPServer(self.destination, _MetricsHandler)
+            except OSError as e:
+                raise MetricsError(f"Could not serve metrics on {self.destination[0]}:{self.destination[1]}: {e}")
+            self.server.daemon_threads = True
+            self.server.registry = self.registry
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+            logging.info(f"Serving metrics on http://{self.destination[0]}:{self.destination[1]}/metrics")
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self.thread.start()
+        return self
+
+    def _write_file(self):
+        try:
+            directory = os.path.dirname(self.destination)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.destination}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.registry.render_prometheus())
+            os.replace(tmp_path, self.destination)  # Scrapers never see a half-written file
+        except OSError as e:
+            logging.error(f"Failed to write metrics to {self.destination}: {e}")
+
+    def _run(self):
+        next_log = time.monotonic() + self.log_interval
+        wait = min(self.interval, self.log_interval)
+        while not self.stop_event.wait(wait):
+            if self.kind == "file":
+                self._write_file()
+            if time.monotonic() >= next_log:
+                logging.info(self.registry.summary())
+                next_log = time.monotonic() + self.log_interval
+
+    def close(self):
+        """
+        Stop exporting, writing the final metrics and logging a last summary.
+        """
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread.join()
+        self.thread = None
+        if self.kind == "file":
+            self._write_file()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        logging.info(self.registry.summary())
+
+# path: backend/modules/pipelineMetrics.py
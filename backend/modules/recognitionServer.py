@@ -0,0 +1,390 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from .dbOperators import DBOperator
+from .detectStrategy import create_strategy
+from .detectorBackends import create_detector, resolve_detector
+from .env_config import DATABASE_PATH as db_path
+from .env_config import GALLERY_MODEL_PATH as gallery_model_path
+from .lbphModel import ModelError, load_model, model_exists
+from .pipelineMetrics import MetricsRegistry
+from .sampleLoader import normalize_face
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class ServerError(Exception):
+    """Custom exception for recognition server errors."""
+    pass
+
+
+def parse_listen_address(text):
+    """
+    Split a --listen value into ("unix", path) or ("tcp", (host, port)). "unix:/path/to.sock"
+    selects a Unix socket; "port", ":port" or "host:port" a TCP port on a loopback address.
+    """
+    text = str(text)
+    if text.startswith("unix:"):
+        if not hasattr(asyncio, "start_unix_server"):
+            raise ServerError("Unix sockets are not supported on this platform.")
+        return "unix", text[len("unix:"):]
+    host, _, port = text.rpartition(":")
+    host = host.strip("[]") or "127.0.0.1"
+    if not port.isdigit():
+        raise ServerError(f"Invalid listen address: {text}")
+    if host not in LOOPBACK_HOSTS:
+        raise ServerError(f"The recognition server only listens on localhost, not {host}.")
+    return "tcp", (host, int(port))
+
+
+class RecognitionService:
+    """
+    Recognises faces in still images with the detector and gallery model kept loaded.
+
+    Requests are queued and grouped into micro-batches: a batch is closed when it holds
+    `max_batch` images or `max_delay` seconds after its first image arrived, whichever comes
+    first, so `max_delay` bounds the latency batching adds. A batch is detected on a pool of
+    `workers` threads (each with its own detector; OpenCV releases the GIL), then every face of
+    the batch is predicted in a single pass over the gallery and the labels are resolved to
+    profiles with one database lookup. Batches run one at a time; requests that arrive meanwhile
+    form the next batch, so batches grow with the load. The gallery is reloaded when a
+    background training job finishes.
+    """
+
+    def __init__(self, sql_db_path=db_path, gallery_path=gallery_model_path, detector_backend=None,
+                 detector_model=None, strategy="full", adaptive=False, max_batch=16, max_delay=0.01,
+                 workers=None, threshold=100, reload_interval=2.0):
+        self.detector_spec = resolve_detector(detector_backend, detector_model)
+        create_detector(self.detector_spec)  # Fail at start-up rather than on the first request
+        self.strategy = strategy
+        self.adaptive = adaptive
+        self.db_operator = DBOperator(sql_db_path)
+        self.gallery_path = gallery_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+        self.reload_interval = reload_interval
+        self.recognizer = None
+        self.training_job = 0
+        self.next_reload_check = 0.0
+        self.local = threading.local()
+        self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="recognition")
+        self.batch_executor = ThreadPoolExecutor(1, thread_name_prefix="recognition-batch")
+        self.metrics = MetricsRegistry("server")
+        self.requests = None
+        self.batcher = None
+
+    def load_model(self):
+        """
+        Load the gallery model. Returns False when there is none yet.
+        """
+        self.training_job = self.db_operator.get_last_finished_training_job()  # Read before the model is loaded
+        self.next_reload_check = time.monotonic() + self.reload_interval
+        if not model_exists(self.gallery_path):
+            return False
+        try:
+            self.recognizer = load_model(self.gallery_path)
+        except ModelError as e:
+            logging.error(f"Could not load the gallery model from {self.gallery_path}: {e}")
+            return False
+        logging.info(f"Loaded the gallery model from {self.gallery_path} ({len(self.recognizer)} samples)")
+        return True
+
+    def _check_model(self):
+        now = time.monotonic()
+        if not self.reload_interval or now < self.next_reload_check:
+            return
+        self.next_reload_check = now + self.reload_interval
+        if self.recognizer is None or self.db_operator.get_last_finished_training_job() > self.training_job:
+            self.load_model()
+
+    def _detector(self):
+        detector = getattr(self.local, "detector", None)
+        if detector is None:
+            detector = self.local.detector = create_strategy(self.strategy, create_detector(self.detector_spec),
+                                                             adaptive=self.adaptive)
+        return detector
+
+    def _detect(self, gray):
+        start = time.perf_counter()
+        boxes = [tuple(int(v) for v in box) for box in self._detector().detect(gray)]
+        self.metrics.observe("detect", time.perf_counter() - start)
+        return boxes
+
+    @staticmethod
+    def decode(data):
+        """
+        Decode an encoded image (JPEG, PNG, ...) to grayscale. Returns None if it is not an image.
+        """
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+
+    def process_batch(self, grays):
+        """
+        Detect and recognise the faces of a batch of grayscale images. Returns one list of face
+        dicts per image.
+        """
+        self._check_model()
+        if self.recognizer is None:
+            raise ServerError("No gallery model found, enroll a user first.")
+        all_boxes = list(self.pool.map(self._detect, grays))
+        start = time.perf_counter()
+        faces = [normalize_face(gray[y:y + h, x:x + w]) for gray, boxes in zip(grays, all_boxes)
+                 for x, y, w, h in boxes]
+        predictions = self.recognizer.predict_batch(faces) if faces else []
+        predicted = time.perf_counter()
+        profiles = self.db_operator.get_profiles([int(label) for label, conf in predictions if conf <= self.threshold])
+        self.metrics.observe("predict", predicted - start)
+        self.metrics.observe("match", time.perf_counter() - predicted)
+
+        results = []
+        predictions = iter(predictions)
+        for boxes in all_boxes:
+            image_results = []
+            for (x, y, w, h), (label, conf) in zip(boxes, predictions):
+                profile = profiles.get(int(label)) if conf <= self.threshold else None
+                image_results.append({
+                    "box": [x, y, w, h],
+                    "label": int(label),
+                    "confidence": float(conf),
+                    "matched": profile is not None,
+                    "user_id": profile[0] if profile is not None else None,
+                    "uuid": profile[1] if profile is not None else None,
+                    "name": profile[2] if profile is not None else None,
+                    "age": profile[3] if profile is not None else None,
+                    "role": profile[4] if profile is not None else None,
+                })
+            results.append(image_results)
+        return results
+
+    async def start(self):
+        """
+        Load the model and start the batcher on the running event loop.
+        """
+        if not self.load_model():
+            logging.warning("No gallery model yet; requests fail until a user is enrolled")
+        self.requests = asyncio.Queue()
+        self.batcher = asyncio.get_running_loop().create_task(self._batch_loop())
+
+    async def recognize(self, data):
+        """
+        Recognise the faces in an encoded image. Returns a list of face dicts.
+        """
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        gray = await loop.run_in_executor(self.pool, self.decode, data)
+        self.metrics.observe("decode", time.perf_counter() - start)
+        if gray is None:
+            raise ValueError("The request body is not a supported image.")
+        result = loop.create_future()
+        await self.requests.put((gray, result))
+        faces = await result
+        self.metrics.observe("request", time.perf_counter() - start)
+        return faces
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.requests.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.requests.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self.batch_executor, self.process_batch,
+                                                     [gray for gray, _ in batch])
+            except Exception as e:
+                for _, result in batch:
+                    if not result.done():
+                        result.set_exception(e)
+                continue
+            for (_, result), faces in zip(batch, results):
+                if not result.done():  # The client may have gone away
+                    result.set_result(faces)
+            self.metrics.observe("batch", time.perf_counter() - start)
+            self.metrics.increment("batches")
+            self.metrics.set_gauge("batch_size", len(batch))
+            for faces in results:  # Every image counts as a frame
+                self.metrics.frame_done(len(faces))
+
+    async def close(self):
+        """
+        Stop the batcher and the worker threads.
+        """
+        if self.batcher is not None:
+            self.batcher.cancel()
+            try:
+                await self.batcher
+            except asyncio.CancelledError:
+                pass
+            self.batcher = None
+        self.batch_executor.shutdown()
+        self.pool.shutdown()
+        logging.info(self.metrics.summary())
+
+
+class RecognitionServer:
+    """
+    A small HTTP/1.1 front end for a RecognitionService on a loopback TCP port or a Unix socket.
+
+    POST /recognize takes an encoded image as the request body and answers with the faces found
+    in it; GET /health reports the loaded model and GET /metrics the service's metrics in the
+    Prometheus text format. Connections are kept alive between requests.
+    """
+
+    def __init__(self, service, address=DEFAULT_ADDRESS):
+        self.service = service
+        self.kind, self.address = parse_listen_address(address)
+        self.server = None
+
+    def describe(self):
+        if self.kind == "unix":
+            return f"unix:{self.address}"
+        return f"http://{self.address[0]}:{self.address[1]}"
+
+    async def _read_request(self, reader):
+        """
+        Read one request. Returns (method, path, headers, body), or None when the client closed
+        the connection. Raises ServerError for a malformed request and ValueError for one that is
+        too large.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ServerError("Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise ServerError("Malformed Content-Length header")
+        if length > MAX_REQUEST_BYTES:
+            raise ValueError(f"Request body larger than {MAX_REQUEST_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), urlsplit(target).path, headers, body
+
+    async def _respond(self, writer, status, payload, content_type="application/json", keep_alive=True):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _route(self, method, path, body):
+        if path == "/recognize":
+            if method != "POST":
+                return 405, {"error": "POST an encoded image to /recognize"}
+            try:
+                faces = await self.service.recognize(body)
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            except ServerError as e:
+                return 503, {"error": str(e)}
+            return 200, {"faces": faces}
+        if path == "/health" and method == "GET":
+            recognizer = self.service.recognizer
+            return 200, {"status": "ok" if recognizer is not None else "no_model",
+                         "model": self.service.gallery_path,
+                         "samples": len(recognizer) if recognizer is not None else 0,
+                         "detector": self.service.detector_spec[0],
+                         "max_batch": self.service.max_batch,
+                         "max_delay_ms": self.service.max_delay * 1000}
+        if path == "/metrics" and method == "GET":
+            return 200, self.service.metrics.render_prometheus().encode("utf-8")
+        return 404, {"error": f"No route for {method} {path}"}
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ServerError, ValueError) as e:
+                    await self._respond(writer, 413 if isinstance(e, ValueError) else 400, {"error": str(e)},
+                                        keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self._route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                content_type = "text/plain; version=0.0.4" if path == "/metrics" and status == 200 \
+                    else "application/json"
+                await self._respond(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # The client went away
+        finally:
+            writer.close()
+
+    async def serve(self, stop=None):
+        """
+        Serve until `stop` (an asyncio.Event) is set, or until SIGINT or SIGTERM is received.
+        """
+        if stop is None:
+            stop = asyncio.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+                except (NotImplementedError, RuntimeError):
+                    pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+        await self.service.start()
+        if self.kind == "unix":
+            if os.path.exists(self.address):
+                os.remove(self.address)  # Left behind by a previous run
+            self.server = await asyncio.start_unix_server(self._handle, path=self.address)
+        else:
+            host, port = self.address
+            self.server = await asyncio.start_server(self._handle, host, port)
+        logging.info(f"Recognition server listening on {self.describe()} (batches of up to "
+                     f"{self.service.max_batch} images within {self.service.max_delay * 1000:.0f} ms)")
+        try:
+            async with self.server:
+                await stop.wait()
+        finally:
+            await self.service.close()
+            if self.kind == "unix" and os.path.exists(self.address):
+                os.remove(self.address)
+
+    def run(self):
+        """
+        Serve until interrupted with Ctrl+C or terminated.
+        """
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+        logging.info("Recognition server stopped.")
+
+# path: backend/modules/recognitionServer.py
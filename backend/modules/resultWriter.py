@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import sys
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class ResultWriter:
+    """
+    Writes per-frame results as JSON lines, either to a file or to stdout.
+    """
+
+    def __init__(self, output_path=None):
+        self.output_path = output_path
+        self.stream = None
+        self.records = 0
+
+    def open(self):
+        """
+        Open the output stream. `None` or "-" writes to stdout.
+        """
+        if self.stream is not None:
+            return
+        if self.output_path in (None, "-"):
+            self.stream = sys.stdout
+        else:
+            output_dir = os.path.dirname(self.output_path)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+            self.stream = open(self.output_path, "a", encoding="utf-8")
+            logging.info(f"Writing headless results to {self.output_path}")
+
+    def write(self, record):
+        """
+        Write a single result record.
+        """
+        if self.stream is None:
+            self.open()
+        record.setdefault("timestamp", time.time())
+        self.stream.write(json.dumps(record, default=_to_builtin) + "\n")
+        self.records += 1
+
+    def close(self):
+        """
+        Flush and close the output stream.
+        """
+        if self.stream is None:
+            return
+        self.stream.flush()
+        if self.stream is not sys.stdout:
+            self.stream.close()
+        self.stream = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _to_builtin(value):
+    """
+    Convert NumPy scalars and arrays so they can be serialised.
+    """
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# path: backend/modules/resultWriter.py
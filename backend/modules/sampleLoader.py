@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .env_config import FACE_CACHE_PATH as cache_location
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Every face is normalised to this size before training and prediction
+FACE_SIZE = (100, 100)
+# Smallest crop DSCreator saves (the detector's minSize)
+MIN_FACE_SIZE = 40
+
+
+def normalize_face(gray_face):
+    """
+    Normalise a grayscale face crop to the fixed training size.
+    """
+    if gray_face.shape[:2] == (FACE_SIZE[1], FACE_SIZE[0]):
+        return np.ascontiguousarray(gray_face)
+    interpolation = cv2.INTER_AREA if gray_face.shape[0] > FACE_SIZE[1] else cv2.INTER_LINEAR
+    return cv2.resize(gray_face, FACE_SIZE, interpolation=interpolation)
+
+
+class SampleLoader:
+    """
+    Loads stored face crops for training.
+
+    Crops saved by DSCreator are already cut to the detected face, so they are trusted instead of
+    being run through the cascade again. Files are decoded on a thread pool (OpenCV releases the
+    GIL while decoding) and the normalised arrays are cached under the SHA-1 of the file contents,
+    so an image is only ever decoded once no matter how often the models are retrained.
+    """
+
+    def __init__(self, cache_dir=cache_location, workers=None, verify=False, use_cache=True):
+        self.cache_dir = cache_dir
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 2)
+        self.verify = verify
+        self.use_cache = use_cache
+        if self.use_cache:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _cache_file(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.{FACE_SIZE[0]}x{FACE_SIZE[1]}.npy").replace("\\", "/")
+
+    def _is_plausible_crop(self, face):
+        """
+        A stored crop is accepted when it looks like a detector box: at least the minimum face
+        size and close to square.
+        """
+        h, w = face.shape[:2]
+        return min(h, w) >= MIN_FACE_SIZE and 0.8 <= w / h <= 1.25
+
+    def load(self, image_path):
+        """
+        Load one normalised face, or None if the image cannot be used.
+        """
+        return self._load(image_path)[0]
+
+    def _load(self, image_path):
+        """
+        Returns (face or None, whether it came from the cache).
+        """
+        try:
+            with open(image_path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            logging.error(f"Error reading image {image_path}: {e}")
+            return None, False
+
+        cache_file = None
+        if self.use_cache:
+            digest = hashlib.sha1(data).hexdigest()
+            cache_file = self._cache_file(digest)
+            if os.path.exists(cache_file):
+                try:
+                    return np.load(cache_file), True
+                except (OSError, ValueError):
+                    logging.warning(f"Discarding unreadable cache entry {cache_file}")
+
+        face = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if face is None:
+            logging.error(f"Error decoding image {image_path}")
+            return None, False
+        if self.verify and not self._is_plausible_crop(face):
+            logging.warning(f"Skipping image {image_path}: {face.shape[1]}x{face.shape[0]} is not a face crop")
+            return None, False
+        face = normalize_face(face)
+
+        if cache_file is not None:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            temp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_file, "wb") as f:
+                    np.save(f, face)
+                os.replace(temp_file, cache_file)  # Atomic, so concurrent loaders never see a partial file
+            except OSError as e:
+                logging.warning(f"Could not cache {image_path}: {e}")
+        return face, False
+
+    def load_faces(self, ids, image_paths):
+        """
+        Load the faces of the given images in parallel, paired with their training labels.
+        Images that cannot be loaded are skipped.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            loaded = list(executor.map(self._load, image_paths))
+        faces = []
+        training_ids = []
+        cache_hits = 0
+        for user_id, (face, cached) in zip(ids, loaded):
+            if face is not None:
+                faces.append(face)
+                training_ids.append(user_id)
+                cache_hits += cached
+        logging.info(f"Loaded {len(faces)} of {len(image_paths)} faces "
+                     f"({cache_hits} from cache, {len(faces) - cache_hits} decoded)")
+        return faces, training_ids
+
+# path: backend/modules/sampleLoader.py
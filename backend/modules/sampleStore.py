@@ -0,0 +1,304 @@
+import contextlib
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import cv2
+import numpy as np
+
+from .dbOperators import DBOperator
+from .env_config import DATABASE_PATH as db_path
+from .env_config import SAMPLE_STORE_PATH as store_location
+from .sampleLoader import FACE_SIZE, SampleLoader, normalize_face
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SAMPLE_EXTENSION = ".faces"
+LOCK_FILENAME = ".lock"
+# One record is a normalised grayscale face, stored row-major without any header
+RECORD_SHAPE = (FACE_SIZE[1], FACE_SIZE[0])
+RECORD_SIZE = RECORD_SHAPE[0] * RECORD_SHAPE[1]
+
+
+class SampleStoreError(Exception):
+    """Custom exception for sample store errors."""
+    pass
+
+
+def shard_name(user_uuid, generation=0):
+    """
+    Name of a user's shard. Compaction writes the live samples to the next generation.
+    """
+    return f"{user_uuid}.{generation}"
+
+
+def shard_generation(shard):
+    _, _, generation = shard.rpartition(".")
+    return int(generation) if generation.isdigit() else 0
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on `path` that is respected by every process, not just this one.
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SampleStore:
+    """
+    Normalised face samples packed into one append-only file per user ("shard").
+
+    A shard is a flat array of fixed-size uint8 records, so it is read with np.memmap and sliced
+    without decoding anything. Which record ("slot") of which shard holds a sample is kept in the
+    IMAGES table next to the legacy image paths, so model versions and incremental training keep
+    working off the same image IDs. Records are never rewritten in place: deleting samples only
+    drops their IMAGES rows, and compact() later copies the live records of a shard into its next
+    generation, repoints the rows in one transaction and removes the old file.
+
+    Shards are written from more than one process (the capture process and the training worker),
+    so writers hold writing(), a lock file in the store directory, from the shard lookup through
+    the append to the IMAGES update; compaction holds it too, so it never sees records whose rows
+    are not committed yet. Readers never modify a shard.
+    """
+
+    def __init__(self, store_dir=store_location, sql_db_path=db_path):
+        self.store_dir = store_dir.replace("\\", "/").rstrip("/")
+        self.db_operator = DBOperator(sql_db_path)
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.local = threading.local()
+        self.lock_path = f"{self.store_dir}/{LOCK_FILENAME}"
+        self.maps = {}  # shard -> open read-only memmap
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def shard_path(self, shard):
+        return f"{self.store_dir}/{shard}{SAMPLE_EXTENSION}"
+
+    @contextlib.contextmanager
+    def writing(self):
+        """
+        Hold the store's write lock across processes. Re-entrant within a thread, so a caller can
+        hold it around append() and the IMAGES update that indexes the new records.
+        """
+        if getattr(self.local, "writing", False):
+            yield
+            return
+        with self.write_lock, file_lock(self.lock_path):
+            self.local.writing = True
+            try:
+                yield
+            finally:
+                self.local.writing = False
+
+    def _record_count(self, path):
+        """
+        Number of whole records in a shard file. A record still being appended is not counted.
+        """
+        try:
+            return os.path.getsize(path) // RECORD_SIZE
+        except OSError:
+            return 0
+
+    def append(self, shard, faces):
+        """
+        Append faces to a shard and return the slot of the first one. Faces are normalised to the
+        record size first. Index the records inside writing(), or compaction may drop them first.
+        """
+        records = np.ascontiguousarray(np.stack([normalize_face(face) for face in faces]), dtype=np.uint8)
+        path = self.shard_path(shard)
+        with self.writing():
+            with open(path, "ab") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size % RECORD_SIZE:  # Left by an interrupted append; no other writer holds the lock
+                    logging.warning(f"Truncating a partial record at the end of {path}")
+                    f.truncate(size - size % RECORD_SIZE)
+                first_slot = size // RECORD_SIZE
+                f.write(records.tobytes())
+                f.flush()
+                os.fsync(f.fileno())  # Records must be durable before IMAGES points at them
+        return first_slot
+
+    def add(self, user_uuid, faces):
+        """
+        Store a user's faces and index them in IMAGES. Returns the new image IDs.
+        """
+        if len(faces) == 0:
+            return []
+        with self.writing():
+            shard = self.db_operator.get_user_shard(user_uuid) or shard_name(user_uuid)
+            first_slot = self.append(shard, faces)
+            ids = self.db_operator.insert_samples(user_uuid, shard, range(first_slot, first_slot + len(faces)))
+        logging.info(f"Stored {len(faces)} samples for user {user_uuid} in shard {shard}")
+        return ids
+
+    def open(self, shard):
+        """
+        Memory-map a shard read-only as an (N, H, W) array. Maps are reused until the shard grows.
+        """
+        path = self.shard_path(shard)
+        with self.lock:
+            count = self._record_count(path)
+            mapped = self.maps.get(shard)
+            if mapped is None or len(mapped) != count:
+                if count == 0:
+                    raise SampleStoreError(f"Shard {shard} is missing or empty.")
+                mapped = self.maps[shard] = np.memmap(path, dtype=np.uint8, mode="r", shape=(count,) + RECORD_SHAPE)
+            return mapped
+
+    def load(self, locations):
+        """
+        Read the faces at a list of (shard, slot) locations into one (N, H, W) array, in order.
+        """
+        faces = np.empty((len(locations),) + RECORD_SHAPE, dtype=np.uint8)
+        by_shard = {}
+        for position, (shard, slot) in enumerate(locations):
+            by_shard.setdefault(shard, ([], []))
+            by_shard[shard][0].append(position)
+            by_shard[shard][1].append(slot)
+        for shard, (positions, slots) in by_shard.items():
+            mapped = self.open(shard)
+            slots = np.asarray(slots, dtype=np.int64)
+            if slots.size and slots.max() >= len(mapped):
+                raise SampleStoreError(f"Shard {shard} has {len(mapped)} records but slot {int(slots.max())} was requested.")
+            faces[positions] = mapped[slots]
+        return faces
+
+    def _release(self, shard):
+        with self.lock:
+            self.maps.pop(shard, None)
+
+    def compact(self):
+        """
+        Reclaim the space of deleted samples and users. Shards no sample points at are removed, and
+        shards with dead records are rewritten with only their live ones. Returns a summary dict.
+        """
+        with self.writing():
+            return self._compact()
+
+    def _compact(self):
+        live = {}
+        for image_id, _, _, shard, slot in self.db_operator.get_sample_locations():
+            live.setdefault(shard, []).append((slot, image_id))
+        removed = rewritten = reclaimed = 0
+        for filename in sorted(os.listdir(self.store_dir)):
+            if not filename.endswith(SAMPLE_EXTENSION):
+                continue
+            shard = filename[:-len(SAMPLE_EXTENSION)]
+            path = self.shard_path(shard)
+            records = self._record_count(path)
+            entries = sorted(live.get(shard, []))
+            if not entries:
+                self._release(shard)
+                reclaimed += records * RECORD_SIZE
+                os.remove(path)
+                removed += 1
+                continue
+            if len(entries) == records and all(slot == i for i, (slot, _) in enumerate(entries)):
+                continue  # Every record is live
+            target = shard_name(shard.rpartition(".")[0], shard_generation(shard) + 1)
+            target_path = self.shard_path(target)
+            if os.path.exists(target_path):
+                os.remove(target_path)  # Left behind by an interrupted compaction
+            source = self.open(shard)
+            slots = np.asarray([slot for slot, _ in entries], dtype=np.int64)
+            with open(target_path, "wb") as f:
+                for start in range(0, len(slots), 4096):
+                    f.write(np.ascontiguousarray(source[slots[start:start + 4096]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            # Repoint the rows first; until this commits the old shard stays authoritative
+            self.db_operator.set_sample_locations([(target, new_slot, image_id)
+                                                   for new_slot, (_, image_id) in enumerate(entries)])
+            self._release(shard)
+            del source
+            os.remove(path)
+            reclaimed += (records - len(entries)) * RECORD_SIZE
+            rewritten += 1
+        summary = {"shards_removed": removed, "shards_rewritten": rewritten, "bytes_reclaimed": reclaimed}
+        logging.info(f"Compacted the sample store: {removed} shards removed, {rewritten} rewritten, "
+                     f"{reclaimed / 1e6:.1f} MB reclaimed")
+        return summary
+
+    def pack(self, remove_images=False, batch_size=1000):
+        """
+        Move samples that are still stored as image files into the store. With `remove_images`
+        the image files are deleted once their samples are stored. Returns the number packed.
+        """
+        loader = SampleLoader(use_cache=False)
+        rows = self.db_operator.get_unpacked_images()
+        packed = 0
+        for start in range(0, len(rows), batch_size):
+            by_user = {}
+            for image_id, user_uuid, image_path in rows[start:start + batch_size]:
+                face = loader.load(image_path)
+                if face is not None:
+                    by_user.setdefault(user_uuid, []).append((image_id, image_path, face))
+            for user_uuid, samples in by_user.items():
+                with self.writing():
+                    shard = self.db_operator.get_user_shard(user_uuid) or shard_name(user_uuid)
+                    first_slot = self.append(shard, [face for _, _, face in samples])
+                    self.db_operator.set_sample_locations([(shard, first_slot + i, image_id)
+                                                           for i, (image_id, _, _) in enumerate(samples)])
+                packed += len(samples)
+                if remove_images:
+                    for _, image_path, _ in samples:
+                        try:
+                            os.remove(image_path)
+                        except OSError as e:
+                            logging.warning(f"Could not remove {image_path}: {e}")
+            logging.info(f"Packed {packed} of {len(rows)} image files")
+        return packed
+
+    def export(self, output_dir, user_uuid=None):
+        """
+        Write stored samples back out as JPEG files under `<output_dir>/<uuid>/<user id>.<image id>.jpg`.
+        Returns the number of files written.
+        """
+        rows = self.db_operator.get_sample_locations(user_uuid)
+        written = 0
+        for start in range(0, len(rows), 4096):
+            chunk = rows[start:start + 4096]
+            faces = self.load([(shard, slot) for _, _, _, shard, slot in chunk])
+            for (image_id, user_id, uuid, _, _), face in zip(chunk, faces):
+                user_dir = os.path.join(output_dir, uuid or "unknown").replace("\\", "/")
+                os.makedirs(user_dir, exist_ok=True)
+                if cv2.imwrite(f"{user_dir}/{user_id}.{image_id}.jpg", face):
+                    written += 1
+        logging.info(f"Exported {written} samples to {output_dir}")
+        return written
+
+    def stats(self):
+        """
+        Shard, record and live sample counts of the store.
+        """
+        shards = records = 0
+        for filename in os.listdir(self.store_dir):
+            if filename.endswith(SAMPLE_EXTENSION):
+                shards += 1
+                records += self._record_count(f"{self.store_dir}/{filename}")
+        live = len(self.db_operator.get_sample_locations())
+        return {"shards": shards, "records": records, "live_samples": live, "dead_records": records - live,
+                "bytes": records * RECORD_SIZE}
+
+# path: backend/modules/sampleStore.py
@@ -0,0 +1,170 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .dbOperators import DBOperator, DBError
+from .dsTrainer import DSTrainer
+from .env_config import DATABASE_PATH as db_path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+GALLERY_TARGET = "gallery"
+JOB_STATES = ("queued", "running", "done", "failed")
+
+
+class TrainingQueueError(Exception):
+    """Custom exception for training job queue errors."""
+    pass
+
+
+def _run_training(targets, trainer_options):
+    """
+    Train the models of a batch of claimed jobs in the worker process. User models are trained
+    before the gallery. Returns a dict mapping each target to None or an error message.
+    """
+    trainer = DSTrainer(**trainer_options)
+    errors = {}
+    for target in sorted(targets, key=lambda target: target == GALLERY_TARGET):
+        try:
+            if target == GALLERY_TARGET:
+                trained = trainer.train_gallery()
+            else:
+                trained = trainer.train_recognizer(target)
+            errors[target] = None if trained else "training failed, see the log"
+        except Exception as e:
+            logging.error(f"Training job for {target} failed: {e}")
+            errors[target] = str(e)
+    return errors
+
+
+class TrainingQueue:
+    """
+    Trains recognizer models in the background instead of on the caller's thread.
+
+    Jobs are kept in the TRAINING_JOBS table, so their status can be followed from any process and
+    jobs queued by a process that exited are picked up by the next queue that starts. There is at
+    most one queued job per model: submitting a model that is already waiting only bumps the job's
+    request count. A dispatcher thread waits `coalesce_delay` seconds after a submission, claims
+    every queued job and trains them in one run on a single worker process (training is
+    incremental, so one run covers every enrollment made in the meantime). Batches never overlap,
+    and jobs for a model another process is training stay queued until it finishes, which keeps
+    the model files single-writer; whatever is queued during a run forms the next batch.
+    Jobs queued by other processes are noticed every `poll_interval` seconds.
+    """
+
+    def __init__(self, sql_db_path=db_path, coalesce_delay=2.0, poll_interval=30.0, stale_after=3600.0,
+                 trainer_options=None):
+        self.db_operator = DBOperator(sql_db_path)
+        self.coalesce_delay = coalesce_delay
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.trainer_options = dict(trainer_options or {}, sql_db_path=sql_db_path)
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.drain = True  # Whether the dispatcher trains the queued jobs before it stops
+        self.executor = None
+        self.thread = None
+        self.runs = 0
+        self.trained = 0
+        self.failed = 0
+
+    def start(self):
+        """
+        Start the worker process and the dispatcher. Jobs left running by a process that died more
+        than `stale_after` seconds ago are failed and queued again.
+        """
+        if self.thread is not None:
+            return self
+        for target in self.db_operator.fail_stale_training_jobs(self.stale_after):
+            logging.warning(f"Re-queueing interrupted training job for {target}")
+            self.db_operator.enqueue_training_job(target)
+        context = multiprocessing.get_context("spawn")  # Do not fork the capture threads into the worker
+        self.executor = ProcessPoolExecutor(1, mp_context=context)
+        self.stopping.clear()
+        self.wakeup.set()  # Pick up jobs queued before the start
+        self.thread = threading.Thread(target=self._run, name="training-dispatcher", daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, user_uuid=None, gallery=True):
+        """
+        Queue training of a user's model and, with `gallery`, of the gallery model. Returns the job IDs.
+        """
+        targets = ([user_uuid] if user_uuid is not None else []) + ([GALLERY_TARGET] if gallery else [])
+        try:
+            job_ids = [self.db_operator.enqueue_training_job(target) for target in targets]
+        except DBError as e:
+            raise TrainingQueueError(e)
+        logging.info(f"Queued training jobs {job_ids} for {', '.join(targets)}")
+        self.wakeup.set()
+        return job_ids
+
+    def pending(self):
+        """
+        Number of jobs that are queued or running.
+        """
+        counts = self.db_operator.get_training_job_counts()
+        return counts.get("queued", 0) + counts.get("running", 0)
+
+    def _run(self):
+        while True:
+            if not self.stopping.is_set() and self.wakeup.wait(self.poll_interval):
+                # Let submissions that arrive close together join the same run; closing cuts the wait short
+                self.stopping.wait(self.coalesce_delay)
+            self.wakeup.clear()
+            if self.stopping.is_set() and not self.drain:
+                return
+            try:
+                jobs = self.db_operator.claim_training_jobs(self.stale_after)
+            except DBError as e:
+                logging.error(f"Could not claim training jobs: {e}")
+                jobs = []
+            if jobs:
+                self._train(jobs)
+            elif self.stopping.is_set():
+                return
+
+    def _train(self, jobs):
+        targets = sorted({target for _, target in jobs})
+        logging.info(f"Training {len(targets)} models for {len(jobs)} jobs in the background")
+        try:
+            errors = self.executor.submit(_run_training, targets, self.trainer_options).result()
+        except Exception as e:  # The worker process died
+            logging.error(f"Training worker failed: {e}")
+            errors = {target: str(e) for target in targets}
+        outcomes = [("failed" if errors.get(target) else "done", errors.get(target), job_id) for job_id, target in jobs]
+        try:
+            self.db_operator.finish_training_jobs(outcomes)
+        except DBError as e:
+            logging.error(f"Could not record the outcome of training jobs: {e}")
+        self.runs += 1
+        self.failed += sum(1 for status, _, _ in outcomes if status == "failed")
+        self.trained += len(outcomes)
+
+    def close(self, wait=True):
+        """
+        Stop the dispatcher. With `wait` every queued job is trained first; otherwise queued jobs
+        stay in the table for the next queue to pick up (a run in progress is still finished).
+        """
+        if self.thread is None:
+            return
+        if wait and self.pending():
+            logging.info(f"Waiting for {self.pending()} training jobs to finish")
+        self.drain = wait
+        self.stopping.set()
+        self.wakeup.set()
+        self.thread.join()
+        self.executor.shutdown()
+        self.thread = None
+        self.executor = None
+        logging.info(f"Training queue: {self.trained} jobs in {self.runs} runs, {self.failed} failed")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# path: backend/modules/trainingQueue.py
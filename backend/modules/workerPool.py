@@ -0,0 +1,146 @@
+import collections
+import logging
+import multiprocessing
+
+import cv2
+
+from .detectStrategy import create_strategy
+from .detectorBackends import create_detector
+from .lbphModel import load_model
+from .sampleLoader import normalize_face
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Per-process detector and recognizer, created once by the pool initializer
+_worker_state = {}
+
+
+class WorkerPoolError(Exception):
+    """Custom exception for detection worker pool errors."""
+    pass
+
+
+def predict_boxes(recognizer, gray, boxes, track_ids=None):
+    """
+    Predict the labels of the faces inside several boxes with one batched recognizer call.
+    Returns a list of (x, y, w, h, label, confidence, track_id) tuples.
+    """
+    boxes = [tuple(int(v) for v in box) for box in boxes]
+    if not boxes:
+        return []
+    track_ids = track_ids if track_ids is not None else [None] * len(boxes)
+    faces = [normalize_face(gray[y:y + h, x:x + w]) for x, y, w, h in boxes]
+    return [(x, y, w, h, int(label), float(conf), track_id)
+            for (x, y, w, h), (label, conf), track_id in zip(boxes, recognizer.predict_batch(faces), track_ids)]
+
+
+def detect_and_predict(detector, recognizer, gray):
+    """
+    Detect faces in a grayscale frame with a detection strategy and predict a label for each of them.
+    Returns a list of (x, y, w, h, label, confidence, track_id) tuples; track_id is None here.
+    """
+    return predict_boxes(recognizer, gray, detector.detect(gray))
+
+
+def _init_worker(detector_spec, model_file, strategy, adaptive):
+    """
+    Load a face detector and an LBPH recognizer into the worker process.
+    """
+    cv2.setNumThreads(1)  # One core per worker; parallelism comes from the pool
+    _worker_state["detector"] = create_strategy(strategy, create_detector(detector_spec), adaptive=adaptive)
+    _worker_state["recognizer"] = load_model(model_file)  # Memory-mapped, so workers share the model's pages
+    _worker_state["model_file"] = model_file
+    _worker_state["model_version"] = 0
+
+
+def _process_frame(gray, model_version=0):
+    if model_version != _worker_state["model_version"]:  # The model was retrained since it was loaded
+        _worker_state["recognizer"] = load_model(_worker_state["model_file"])
+        _worker_state["model_version"] = model_version
+    return detect_and_predict(_worker_state["detector"], _worker_state["recognizer"], gray)
+
+
+class DetectionWorkerPool:
+    """
+    Runs detection and recognition on a pool of worker processes and hands results back in frame order.
+
+    At most `reorder_window` frames are in flight at once. Results that finish early wait in the
+    window until every earlier frame is done, and the caller's frame iterator is not advanced
+    while the window is full, which gives natural backpressure on the capture side.
+    """
+
+    def __init__(self, detector_spec, model_file, workers=None, reorder_window=None, strategy="full",
+                 adaptive=False):
+        self.detector_spec = detector_spec  # (backend, model_path, options) from resolve_detector()
+        self.model_file = model_file
+        self.strategy = strategy
+        self.adaptive = adaptive  # Each worker tunes its own detector
+        self.workers = workers or multiprocessing.cpu_count()
+        self.reorder_window = reorder_window or 2 * self.workers
+        if self.reorder_window < 1:
+            raise WorkerPoolError("The reorder window must hold at least one frame.")
+        self.pool = None
+        self.model_version = 0  # Sent with every frame; workers reload the model when it changes
+
+    def start(self):
+        """
+        Start the worker processes.
+        """
+        if self.pool is not None:
+            return
+        context = multiprocessing.get_context("spawn")  # Do not fork the capture thread into the workers
+        self.pool = context.Pool(self.workers, initializer=_init_worker,
+                                 initargs=(self.detector_spec, self.model_file, self.strategy, self.adaptive))
+        logging.info(f"Started {self.workers} detection workers (reorder window: {self.reorder_window}).")
+
+    def process(self, frames):
+        """
+        Generator that submits BGR frames to the pool and yields (frame, gray, results) in input order.
+        Frames are converted to grayscale before submission so only one channel is sent to the workers.
+        """
+        if self.pool is None:
+            self.start()
+        pending = collections.deque()
+        for frame in frames:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            pending.append((frame, gray, self.pool.apply_async(_process_frame, (gray, self.model_version))))
+            # Block on the oldest frame while the window is full, otherwise hand back whatever is ready
+            while pending and (len(pending) >= self.reorder_window or pending[0][2].ready()):
+                yield self._collect(pending.popleft())
+        while pending:
+            yield self._collect(pending.popleft())
+
+    def reload_model(self):
+        """
+        Make the workers reload the model file before their next frame.
+        """
+        self.model_version += 1
+
+    @staticmethod
+    def _collect(entry):
+        frame, gray, async_result = entry
+        try:
+            results = async_result.get()
+        except Exception as e:
+            logging.error(f"Detection worker failed: {e}")
+            results = []
+        return frame, gray, results
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+# path: backend/modules/workerPool.py
@@ -2,13 +2,27 @@ import argparse
 import logging
 import os
 import shutil
+import sys
 
 import cv2
 
+from backend.modules.benchmarkSuite import BenchmarkError, BenchmarkSuite, DEFAULT_SUITES, compare_reports, \
+    format_report, load_report, parse_resolutions, save_report
+from backend.modules.bulkEnroller import BulkEnroller, EnrollmentError
+from backend.modules.dbOperators import close_pools
+from backend.modules.detectStrategy import DETECTION_STRATEGIES
+from backend.modules.detectorBackends import DEFAULT_MODEL_PATHS, DETECTOR_BACKENDS, DetectorError, create_detector, \
+    resolve_detector, save_detector_config
 from backend.modules.dsCreator import DSCreator
-from backend.modules.env_config import DATABASE_PATH, TRAINED_MODEL_PATH, TRAINING_DATA_PATH, CAMERA_CONFIG_FILE
+from backend.modules.dsTrainer import DSTrainer
+from backend.modules.env_config import DATABASE_PATH, TRAINED_MODEL_PATH, TRAINING_DATA_PATH, CAMERA_CONFIG_FILE, \
+    FACE_CACHE_PATH, SAMPLE_STORE_PATH
 from backend.modules.faceDetect import FaceDetector
+from backend.modules.lbphModel import LEGACY_MODEL_EXTENSION, MODEL_EXTENSION
 from backend.modules.osCamera import setup_camera, CameraError
+from backend.modules.recognitionServer import DEFAULT_ADDRESS, RecognitionServer, RecognitionService, ServerError
+from backend.modules.sampleStore import SampleStore, SampleStoreError
+from backend.modules.trainingQueue import TrainingQueue
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -45,7 +59,9 @@ def reset_files():
     """
     Delete all user files including the database, recognizer models, images, and camera config.
     """
-    paths_to_delete = [DATABASE_PATH, TRAINED_MODEL_PATH, TRAINING_DATA_PATH, CAMERA_CONFIG_FILE]
+    close_pools()  # Release pooled connections before the database file goes away
+    paths_to_delete = [DATABASE_PATH, f"{DATABASE_PATH}-wal", f"{DATABASE_PATH}-shm",
+                       TRAINED_MODEL_PATH, TRAINING_DATA_PATH, SAMPLE_STORE_PATH, FACE_CACHE_PATH, CAMERA_CONFIG_FILE]
     for path in paths_to_delete:
         if os.path.exists(path):
             if os.path.isfile(path):
@@ -57,11 +73,197 @@ def reset_files():
     print(f"{YELLOW}🗑️ All user files have been reset.{ENDC}")
 
 
+def train_models(user_id=None, full=False, index=False):
+    """
+    Bring the gallery model, and optionally one user's model, up to date with the stored images.
+    With `index` the gallery's nearest-neighbour index is built whatever the gallery's size.
+    """
+    trainer = DSTrainer(index_min_samples=2) if index else DSTrainer()
+    if user_id is not None:
+        user_record = trainer.db_operator.fetch_data("SELECT uuid FROM USERS WHERE id=?", (user_id,))
+        if not user_record:
+            print(f"{RED}❌ No user found with ID: {user_id}{ENDC}")
+            return
+        trainer.train_recognizer(user_record[0][0], incremental=not full)
+    trainer.train_gallery(incremental=not full)
+    print(f"{GREEN}🧠 Training complete.{ENDC}")
+
+
+def show_training_jobs(limit=20):
+    """
+    Print the most recent background training jobs.
+    """
+    queue = TrainingQueue()
+    jobs = queue.db_operator.get_training_jobs(limit)
+    if not jobs:
+        print(f"{YELLOW}No training jobs.{ENDC}")
+        return
+    colors = {"queued": YELLOW, "running": BLUE, "done": GREEN, "failed": RED}
+    print(f"{'job':>6}  {'model':<38} {'status':<8} {'requests':>8}  {'queued at':<19}  {'finished at':<19}")
+    for job_id, target, status, requests, error, created_at, _, finished_at in jobs:
+        print(f"{job_id:>6}  {target:<38} {colors.get(status, '')}{status:<8}{ENDC} {requests:>8}  "
+              f"{created_at:<19}  {finished_at or '':<19}" + (f"  {RED}{error}{ENDC}" if error else ""))
+    counts = queue.db_operator.get_training_job_counts()
+    print(", ".join(f"{counts.get(status, 0)} {status}" for status in ("queued", "running", "done", "failed")))
+
+
+def run_training_jobs():
+    """
+    Train every queued job in the foreground and wait until the queue is empty.
+    """
+    queue = TrainingQueue(coalesce_delay=0.0)
+    queue.start()
+    queue.close(wait=True)
+    print(f"{GREEN}🧠 {queue.trained} training jobs finished ({queue.failed} failed).{ENDC}")
+
+
+def manage_samples(args):
+    """
+    Pack image files into the sample store, compact it, export it as JPEG files or show its size.
+    """
+    store = SampleStore()
+    if args.action == "pack":
+        packed = store.pack(remove_images=args.remove_images)
+        print(f"{GREEN}📦 Packed {packed} images into the sample store.{ENDC}")
+    elif args.action == "compact":
+        summary = store.compact()
+        print(f"{GREEN}📦 Removed {summary['shards_removed']} and rewrote {summary['shards_rewritten']} shards, "
+              f"reclaiming {summary['bytes_reclaimed'] / 1e6:.1f} MB.{ENDC}")
+    elif args.action == "export":
+        if not args.directory:
+            print(f"{RED}❌ export needs --directory{ENDC}")
+            return
+        user_uuid = None
+        if args.user_id is not None:
+            user_record = store.db_operator.fetch_data("SELECT uuid FROM USERS WHERE id=?", (args.user_id,))
+            if not user_record:
+                print(f"{RED}❌ No user found with ID: {args.user_id}{ENDC}")
+                return
+            user_uuid = user_record[0][0]
+        written = store.export(args.directory, user_uuid)
+        print(f"{GREEN}📦 Exported {written} samples to {args.directory}{ENDC}")
+    else:
+        stats = store.stats()
+        print(f"{GREEN}📦 {stats['live_samples']} samples in {stats['shards']} shards "
+              f"({stats['dead_records']} dead records, {stats['bytes'] / 1e6:.1f} MB).{ENDC}")
+
+
+def delete_user(user_id):
+    """
+    Delete a user with their samples and model, compact the sample store and retrain the gallery.
+    """
+    store = SampleStore()
+    if store.db_operator.delete_user(user_id) is None:
+        print(f"{RED}❌ No user found with ID: {user_id}{ENDC}")
+        return
+    for extension in (MODEL_EXTENSION, LEGACY_MODEL_EXTENSION):
+        model_file = os.path.join(TRAINED_MODEL_PATH, f"user{user_id}{extension}").replace("\\", "/")
+        if os.path.exists(model_file):
+            os.remove(model_file)
+    store.compact()
+    DSTrainer().train_gallery(incremental=False)  # The gallery still holds the user's samples
+    print(f"{YELLOW}🗑️ User {user_id} deleted.{ENDC}")
+
+
+def run_benchmarks(args):
+    """
+    Run the benchmark suites, save the report and check it against a baseline report.
+    Returns False when a benchmark regressed.
+    """
+    suite = BenchmarkSuite(resolutions=parse_resolutions(args.resolutions),
+                           face_counts=tuple(int(v) for v in args.faces.split(",") if v),
+                           frames=args.frames, source=args.source, strategy=args.strategy,
+                           detector_backend=args.detector, detector_model=args.detector_model,
+                           adaptive=args.adaptive)
+    with suite:
+        report = suite.run(tuple(v for v in args.suites.split(",") if v))
+    print(format_report(report))
+    if args.output:
+        save_report(report, args.output)
+        print(f"{GREEN}📊 Benchmark report saved to {args.output}{ENDC}")
+    if args.baseline:
+        regressions = compare_reports(load_report(args.baseline), report, args.tolerance)
+        for name, metric, before, after, change in regressions:
+            print(f"{RED}❌ {name} {metric}: {before:.2f} -> {after:.2f} ({change:+.0%}){ENDC}")
+        if regressions:
+            return False
+        print(f"{GREEN}✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}{ENDC}")
+    return True
+
+
+def get_user_details(args=None):
+    """
+    Collect the user details for dataset creation, prompting for anything not given on the command line.
+    """
+    print(f"{YELLOW}\nPlease enter the following details:{ENDC}")
+    prompts = [("user_id", "Enter User ID: "), ("name", "Enter User Name: "),
+               ("age", "Enter User Age: "), ("role", "Enter User Role: ")]
+    details = []
+    for field, prompt in prompts:
+        value = getattr(args, field, None) if args is not None else None
+        if value is None:
+            value = input(f"{RED}{prompt}{ENDC}")
+        details.append(value)
+    return details
+
+
+def add_source_arguments(sub_parser):
+    """
+    Add the frame source and headless output options shared by the capture sub-commands.
+    """
+    sub_parser.add_argument("--source", default=None,
+                            help="Frame source: camera index, video file, image directory, "
+                                 "or synthetic[:WxH[:frames[:faces[:face_image]]]] (default: configured camera)")
+    sub_parser.add_argument("--headless", action="store_true",
+                            help="Do not open any windows; write per-frame results as JSON lines")
+    sub_parser.add_argument("--output", default=None,
+                            help="JSON lines file for headless results (default: stdout)")
+    sub_parser.add_argument("--metrics", default=None,
+                            help="Export per-stage timings and frame counters: a Prometheus text file, "
+                                 "or [host:]port to serve them over HTTP on /metrics")
+    sub_parser.add_argument("--metrics_interval", type=float, default=10.0,
+                            help="Seconds between metrics file updates (default: 10)")
+
+
+def add_detection_arguments(sub_parser):
+    """
+    Add the face detection options shared by the capture sub-commands.
+    """
+    sub_parser.add_argument("--strategy", choices=DETECTION_STRATEGIES, default="full",
+                            help="Search the full frame, or a downscaled frame refined at full resolution (coarse)")
+    sub_parser.add_argument("--adaptive", action="store_true",
+                            help="Learn the size range of the faces seen and skip the detector's other scales")
+    add_detector_arguments(sub_parser)
+
+
+def add_detector_arguments(sub_parser):
+    """
+    Add the face detector backend options.
+    """
+    sub_parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default=None,
+                            help="Face detector: Haar cascade, LBP cascade (faster, less accurate) or OpenCV DNN "
+                                 "(default: the configured detector, or haar)")
+    sub_parser.add_argument("--detector_model", default=None,
+                            help="Cascade XML or DNN model file for the detector (default: the backend's standard file)")
+
+
+def setup_detector(backend, model_path=None):
+    """
+    Check that a detector backend loads and save it as the default for every command.
+    """
+    backend, model_path, _ = resolve_detector(backend, model_path)
+    create_detector(backend, model_path)
+    model_path = os.path.abspath(model_path).replace("\\", "/")  # The commands may run from any directory
+    save_detector_config(backend, model_path if model_path != DEFAULT_MODEL_PATHS[backend] else None)
+    print(f"{GREEN}✅ Face detector set to {backend} ({model_path}){ENDC}")
+
+
 def interactive_menu():
     """
     Interactive menu for executing different parts of the program.
     """
     # display_banner()
+    training_queue = TrainingQueue().start()  # Enrollments are trained in the background
     while True:
         print(f"{BLUE}<------------------------------>{ENDC}")
         print(f"{YELLOW}\nSelect an option:{ENDC}")
@@ -86,28 +288,27 @@ def interactive_menu():
 
         elif choice == "2":
             print(f"{GREEN}📸 Capture and process faces{ENDC}")
-            print(f"{YELLOW}\nPlease enter the following details:{ENDC}")
-            user_id = input(f"{RED}Enter User ID: {ENDC}")
-            name = input(f"{RED}Enter User Name: {ENDC}")
-            age = input(f"{RED}Enter User Age: {ENDC}")
-            role = input(f"{RED}Enter User Role: {ENDC}")
+            user_id, name, age, role = get_user_details()
 
-            ds_creator = DSCreator()
+            ds_creator = DSCreator(training_queue=training_queue)
             with ds_creator:
                 ds_creator.capture_and_process_faces(user_id, name, age, role)
 
         elif choice == "3":
             print(f"{GREEN}🔍 Detecting faces{ENDC}")
-            user_id = input(f"{RED}Enter User ID: {ENDC}")
+            user_id = input(f"{RED}Enter User ID (leave empty to identify any enrolled user): {ENDC}") or None
             face_detector = FaceDetector()
             face_detector.detect_faces(user_id)
 
         elif choice == "4":
             print(f"{YELLOW}🗑️ Resetting all user files...{ENDC}")
+            training_queue.close(wait=False)
             reset_files()
+            training_queue = TrainingQueue().start()
 
         elif choice == "5":
             print(f"{GREEN}👋 Exiting...{ENDC}")
+            training_queue.close()  # Finish the training of the last enrollments
             break
 
         else:
@@ -115,7 +316,6 @@ def interactive_menu():
 
 
 def main():
-    display_banner()
     parser = argparse.ArgumentParser(description="Face Detection and Recognition System")
 
     subparsers = parser.add_subparsers(dest="command", help="Sub-command help")
@@ -123,12 +323,100 @@ def main():
     # Sub-command for setting up the camera
     parser_camera = subparsers.add_parser("setup_camera", help="Setup the camera")
 
+    # Sub-command for choosing the face detector
+    parser_detector = subparsers.add_parser("setup_detector", help="Choose the face detector used by every command")
+    parser_detector.add_argument("detector", choices=DETECTOR_BACKENDS, help="Face detector backend")
+    parser_detector.add_argument("--detector_model", default=None,
+                                 help="Cascade XML or DNN model file (default: the backend's standard file)")
+
     # Sub-command for creating a dataset
     parser_create = subparsers.add_parser("create_dataset", help="Create a dataset")
+    parser_create.add_argument("--user_id", default=None, help="User ID (prompted if omitted)")
+    parser_create.add_argument("--name", default=None, help="User name (prompted if omitted)")
+    parser_create.add_argument("--age", default=None, help="User age (prompted if omitted)")
+    parser_create.add_argument("--role", default=None, help="User role (prompted if omitted)")
+    parser_create.add_argument("--no_wait", action="store_true",
+                               help="Exit without waiting for training; the jobs stay queued for 'jobs run'")
+    add_source_arguments(parser_create)
+    add_detection_arguments(parser_create)
 
     # Sub-command for detecting faces
     parser_detect = subparsers.add_parser("detect_faces", help="Detect faces")
-    parser_detect.add_argument("--user_id", required=True, help="User ID")
+    parser_detect.add_argument("--user_id", default=None,
+                               help="User ID to verify against (default: identify against all enrolled users)")
+    parser_detect.add_argument("--workers", type=int, default=None,
+                               help="Run detection and recognition on this many worker processes")
+    parser_detect.add_argument("--reorder_window", type=int, default=None,
+                               help="Maximum frames in flight in the worker pool (default: 2 x workers)")
+    parser_detect.add_argument("--detect_interval", type=int, default=None,
+                               help="Run the detector every N frames and track faces in between")
+    parser_detect.add_argument("--no_activity_log", action="store_true",
+                               help="Do not record recognition events in USER_ACTIVITY")
+    parser_detect.add_argument("--render_thread", action="store_true",
+                               help="Draw the overlays on a background thread (ignored with --headless)")
+    add_source_arguments(parser_detect)
+    add_detection_arguments(parser_detect)
+
+    # Sub-command for bulk enrollment from a directory tree
+    parser_enroll = subparsers.add_parser("enroll", help="Enroll users from a <user>/<images> directory tree")
+    parser_enroll.add_argument("directory", help="Root directory with one sub-directory per user (<id> or <id>_<name>)")
+    parser_enroll.add_argument("--workers", type=int, default=None, help="Face cropping processes (default: all cores)")
+    parser_enroll.add_argument("--batch_size", type=int, default=500, help="Images per database transaction")
+    parser_enroll.add_argument("--age", type=int, default=0, help="Age for users without a profile.json")
+    parser_enroll.add_argument("--role", default="unknown", help="Role for users without a profile.json")
+    parser_enroll.add_argument("--no_train", action="store_true", help="Skip training the models afterwards")
+    add_detector_arguments(parser_enroll)
+
+    # Sub-command for training the recognizer models
+    parser_train = subparsers.add_parser("train", help="Update the recognizer models with newly added images")
+    parser_train.add_argument("--user_id", default=None, help="Also update this user's own model")
+    parser_train.add_argument("--full", action="store_true", help="Retrain from scratch instead of updating")
+    parser_train.add_argument("--index", action="store_true",
+                              help="Build the gallery's nearest-neighbour index even for a small gallery")
+
+    # Sub-command for benchmarking the detection, training and database paths
+    parser_benchmark = subparsers.add_parser("benchmark", help="Benchmark detection, training and database queries")
+    parser_benchmark.add_argument("--suites", default=",".join(DEFAULT_SUITES),
+                                  help="Comma-separated suites to run (default: detect,train,db)")
+    parser_benchmark.add_argument("--resolutions", default="640x480,1280x720,1920x1080",
+                                  help="Comma-separated frame resolutions for the detection benchmark")
+    parser_benchmark.add_argument("--faces", default="1,4", help="Comma-separated faces per frame")
+    parser_benchmark.add_argument("--frames", type=int, default=60, help="Frames per detection benchmark")
+    parser_benchmark.add_argument("--source", default=None,
+                                  help="Also benchmark detection on a recorded video or image folder")
+    parser_benchmark.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser_benchmark.add_argument("--baseline", default=None, help="JSON report to check for regressions against")
+    parser_benchmark.add_argument("--tolerance", type=float, default=0.15,
+                                  help="Relative slowdown tolerated before a metric counts as a regression")
+    add_detection_arguments(parser_benchmark)
+
+    # Sub-command for serving recognition to other local programs
+    parser_serve = subparsers.add_parser("serve", help="Serve face recognition over a local HTTP API")
+    parser_serve.add_argument("--listen", default=DEFAULT_ADDRESS,
+                              help="Loopback [host:]port or unix:/path/to.sock to listen on (default: 127.0.0.1:8765)")
+    parser_serve.add_argument("--max_batch", type=int, default=16, help="Most images recognised in one batch")
+    parser_serve.add_argument("--batch_delay_ms", type=float, default=10.0,
+                              help="Longest a request waits for others to join its batch (default: 10)")
+    parser_serve.add_argument("--workers", type=int, default=None, help="Detection threads (default: CPU count)")
+    add_detection_arguments(parser_serve)
+
+    # Sub-command for the background training jobs
+    parser_jobs = subparsers.add_parser("jobs", help="Show or run the background training jobs")
+    parser_jobs.add_argument("action", nargs="?", choices=("status", "run"), default="status",
+                             help="Show the recent jobs (default) or train the queued ones now")
+    parser_jobs.add_argument("--limit", type=int, default=20, help="Number of jobs to show")
+
+    # Sub-command for maintaining the packed sample store
+    parser_samples = subparsers.add_parser("samples", help="Maintain the packed face sample store")
+    parser_samples.add_argument("action", choices=("pack", "compact", "export", "stats"),
+                                help="pack image files, reclaim deleted samples, export JPEG files or show the size")
+    parser_samples.add_argument("--remove_images", action="store_true", help="Delete image files once packed")
+    parser_samples.add_argument("--directory", default=None, help="Directory to export the samples to")
+    parser_samples.add_argument("--user_id", type=int, default=None, help="Only export this user's samples")
+
+    # Sub-command for deleting a user
+    parser_delete = subparsers.add_parser("delete_user", help="Delete a user with their samples and model")
+    parser_delete.add_argument("--user_id", type=int, required=True, help="ID of the user to delete")
 
     # Sub-command for resetting all user files
     parser_reset = subparsers.add_parser("reset", help="Reset all user files")
@@ -137,6 +425,10 @@ def main():
     parser_interactive = subparsers.add_parser("interactive", help="Interactive mode")
 
     args = parser.parse_args()
+    headless = getattr(args, "headless", False)
+    if not headless:  # Headless results may be piped from stdout as JSON lines
+        display_banner()
+    status_stream = sys.stderr if headless else sys.stdout
 
     if args.command == "setup_camera":
         try:
@@ -150,22 +442,94 @@ def main():
                 camera.release()
             cv2.destroyAllWindows()
 
+    elif args.command == "setup_detector":
+        try:
+            setup_detector(args.detector, args.detector_model)
+        except DetectorError as e:
+            print(f"{RED}❌ Detector error: {e}{ENDC}", file=sys.stderr)
+            sys.exit(1)
+
     elif args.command == "create_dataset":
-        print(f"{GREEN}📸 Capture and process faces{ENDC}")
-        print(f"{YELLOW}\nPlease enter the following details:{ENDC}")
-        user_id = input(f"{RED}Enter User ID: {ENDC}")
-        name = input(f"{RED}Enter User Name: {ENDC}")
-        age = input(f"{RED}Enter User Age: {ENDC}")
-        role = input(f"{RED}Enter User Role: {ENDC}")
-
-        ds_creator = DSCreator()
+        print(f"{GREEN}📸 Capture and process faces{ENDC}", file=status_stream)
+        user_id, name, age, role = get_user_details(args)
+
+        try:
+            ds_creator = DSCreator(source=args.source, headless=args.headless, output_path=args.output,
+                                   strategy=args.strategy, metrics_target=args.metrics,
+                                   metrics_interval=args.metrics_interval, detector_backend=args.detector,
+                                   detector_model=args.detector_model, adaptive=args.adaptive,
+                                   wait_for_training=not args.no_wait)
+        except DetectorError as e:
+            print(f"{RED}❌ Detector error: {e}{ENDC}", file=sys.stderr)
+            sys.exit(1)
         with ds_creator:
             ds_creator.capture_and_process_faces(user_id, name, age, role)
 
     elif args.command == "detect_faces":
-        print(f"{GREEN}🔍 Detecting faces{ENDC}")
-        face_detector = FaceDetector()
-        face_detector.detect_faces(args.user_id)
+        print(f"{GREEN}🔍 Detecting faces{ENDC}", file=status_stream)
+        try:
+            face_detector = FaceDetector(source=args.source, headless=args.headless, output_path=args.output,
+                                         strategy=args.strategy, log_activity=not args.no_activity_log,
+                                         metrics_target=args.metrics, metrics_interval=args.metrics_interval,
+                                         render_thread=args.render_thread, detector_backend=args.detector,
+                                         detector_model=args.detector_model, adaptive=args.adaptive)
+        except DetectorError as e:
+            print(f"{RED}❌ Detector error: {e}{ENDC}", file=sys.stderr)
+            sys.exit(1)
+        face_detector.detect_faces(args.user_id, workers=args.workers, reorder_window=args.reorder_window,
+                                   detect_interval=args.detect_interval)
+
+    elif args.command == "enroll":
+        print(f"{GREEN}📥 Enrolling users from {args.directory}{ENDC}")
+        try:
+            summary = BulkEnroller(args.directory, workers=args.workers, batch_size=args.batch_size,
+                                   default_age=args.age, default_role=args.role, train=not args.no_train,
+                                   detector_backend=args.detector, detector_model=args.detector_model).run()
+            print(f"{GREEN}📥 Enrolled {summary['enrolled']} faces for {summary['users']} users "
+                  f"({summary['images_per_sec']:.1f} images/sec).{ENDC}")
+        except EnrollmentError as e:
+            print(f"{RED}❌ Enrollment error: {e}{ENDC}")
+
+    elif args.command == "train":
+        print(f"{GREEN}🧠 Training recognizer models{ENDC}")
+        train_models(args.user_id, args.full, args.index)
+
+    elif args.command == "benchmark":
+        print(f"{GREEN}📊 Running benchmarks{ENDC}")
+        try:
+            if not run_benchmarks(args):
+                sys.exit(1)
+        except BenchmarkError as e:
+            print(f"{RED}❌ Benchmark error: {e}{ENDC}")
+            sys.exit(1)
+
+    elif args.command == "serve":
+        print(f"{GREEN}🌐 Starting the recognition server{ENDC}")
+        try:
+            service = RecognitionService(detector_backend=args.detector, detector_model=args.detector_model,
+                                         strategy=args.strategy, adaptive=args.adaptive, max_batch=args.max_batch,
+                                         max_delay=args.batch_delay_ms / 1000, workers=args.workers)
+            RecognitionServer(service, args.listen).run()
+        except (DetectorError, ServerError, OSError) as e:
+            print(f"{RED}❌ Server error: {e}{ENDC}")
+            sys.exit(1)
+
+    elif args.command == "jobs":
+        if args.action == "run":
+            print(f"{GREEN}🧠 Running queued training jobs{ENDC}")
+            run_training_jobs()
+        else:
+            show_training_jobs(args.limit)
+
+    elif args.command == "samples":
+        try:
+            manage_samples(args)
+        except SampleStoreError as e:
+            print(f"{RED}❌ Sample store error: {e}{ENDC}")
+            sys.exit(1)
+
+    elif args.command == "delete_user":
+        delete_user(args.user_id)
 
     elif args.command == "reset":
         print(f"{YELLOW}🗑️ Resetting all user files...{ENDC}")